@@ -0,0 +1,280 @@
+# archive.py
+
+"""
+Compact binary archive of games and positions.
+
+Moves are stored in 16 bits each (utils.encode_move) and positions in 34
+bytes: the 64 squares as 4-bit piece values (0 for empty, else 1 + the
+piece code), a byte with the side to move and castling rights and a
+byte with the en passant column + 1. Everything is little-endian.
+
+    header   magic 'PCGA', version (u16), block size (u16),
+             game count (u64), index offset (u64)
+    games    flags (u8: 1 = own start position), result (u8),
+             move count (u16), [start position], moves (u16 each)
+    index    file offset (u64) of the first game of every block
+
+The block index lets a reader jump to game N by seeking to its block and
+skipping at most block size - 1 games. ArchiveReader maps the file, so
+only the games read are paged in; each game's moves are copied out of the
+mapping into a small array('H'), which stays valid after the reader is
+closed.
+A position on its own is stored as a game without moves.
+
+    python archive.py games.pgn --out games.pga
+    python archive.py --info games.pga
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+from board import Board
+from pgn import read_games
+from san import parse_san
+from utils import encode_move, decode_move
+
+MAGIC = b'PCGA'
+VERSION = 1
+# Games per index entry
+BLOCK_SIZE = 64
+POSITION_SIZE = 34
+RESULTS = ('*', '1-0', '0-1', '1/2-1/2')
+_HEADER = struct.Struct('<4sHHQQ')
+_GAME = struct.Struct('<BBH')
+_OFFSET = struct.Struct('<Q')
+_OWN_START = 1
+
+# start: packed start position (bytes), or None for the standard one;
+# moves: the encoded moves as an array('H')
+ArchivedGame = namedtuple('ArchivedGame', ['start', 'moves', 'result'])
+Conversion = namedtuple('Conversion', ['written', 'skipped'])
+
+
+def pack_position(board):
+    """
+    The 34-byte form of the position on board.
+    """
+    packed = board.pack()
+    side, castling, en_passant = packed[64:]
+    squares = bytes((packed[i] << 4) | packed[i + 1] for i in range(0, 64, 2))
+    return squares + bytes((side | castling << 1, en_passant))
+
+
+def unpack_position(data):
+    """
+    Board from the output of pack_position.
+    """
+    squares = bytearray(64)
+    for i in range(32):
+        squares[2 * i] = data[i] >> 4
+        squares[2 * i + 1] = data[i] & 15
+    flags, en_passant = data[32], data[33]
+    return Board.unpack(bytes(squares) + bytes((flags & 1, flags >> 1, en_passant)))
+
+
+class ArchiveWriter:
+    """
+    Writes an archive; use as a context manager or call close() to write
+    the index.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(bytes(_HEADER.size))
+        self._offset = _HEADER.size
+        self._blocks = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_game(self, moves, result='*', start=None):
+        """
+        Append a game given as move tuples from start (a Board, by default
+        the standard start position). Raises ValueError for an unknown
+        result.
+        """
+        if result not in RESULTS:
+            raise ValueError(f"Invalid result: {result!r}")
+        if self.count % BLOCK_SIZE == 0:
+            self._blocks.append(self._offset)
+        codes = struct.pack(f'<{len(moves)}H', *map(encode_move, moves))
+        record = _GAME.pack(_OWN_START if start is not None else 0, RESULTS.index(result), len(moves))
+        if start is not None:
+            record += pack_position(start)
+        record += codes
+        self._file.write(record)
+        self._offset += len(record)
+        self.count += 1
+
+    def add_board(self, board, result='*'):
+        """
+        Append the game played on board through make_move. The moves are
+        taken back to find the start position and then played again.
+        """
+        moves = [record[0] for record in board.undo_stack]
+        for _ in moves:
+            board.unmake_move()
+        start = None if board.pack() == Board().pack() else Board.unpack(board.pack())
+        for move in moves:
+            board.make_move(move)
+        self.add_game(moves, result, start)
+
+    def add_position(self, board):
+        """
+        Append a single position, as a game without moves.
+        """
+        self.add_game([], '*', board)
+
+    def close(self):
+        if self._file.closed:
+            return
+        for offset in self._blocks:
+            self._file.write(_OFFSET.pack(offset))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, BLOCK_SIZE, self.count, self._offset))
+        self._file.close()
+
+
+class ArchiveReader:
+    """
+    Reads an archive through mmap. Use as a context manager or call
+    close(); the games returned do not refer to the mapping.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if len(self._view) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Not a game archive: {path!r}")
+        magic, version, self.block_size, self.count, self._index = _HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a game archive: {path!r}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def _read(self, offset):
+        """
+        (ArchivedGame, offset of the next game) for the game at offset.
+        """
+        flags, result, length = _GAME.unpack_from(self._view, offset)
+        offset += _GAME.size
+        start = None
+        if flags & _OWN_START:
+            start = bytes(self._view[offset:offset + POSITION_SIZE])
+            offset += POSITION_SIZE
+        moves = array('H')
+        moves.frombytes(self._view[offset:offset + 2 * length])
+        if sys.byteorder == 'big':
+            moves.byteswap()
+        return ArchivedGame(start, moves, RESULTS[result]), offset + 2 * length
+
+    def _next(self, offset):
+        """
+        Offset of the game after the one at offset, without reading it.
+        """
+        flags, _, length = _GAME.unpack_from(self._view, offset)
+        return offset + _GAME.size + (POSITION_SIZE if flags & _OWN_START else 0) + 2 * length
+
+    def __iter__(self):
+        offset = _HEADER.size
+        for _ in range(self.count):
+            game, offset = self._read(offset)
+            yield game
+
+    def __getitem__(self, number):
+        """
+        Game number (from 0) through the block index.
+        """
+        if number < 0:
+            number += self.count
+        if not 0 <= number < self.count:
+            raise IndexError("Game number out of range")
+        block, skip = divmod(number, self.block_size)
+        offset = _OFFSET.unpack_from(self._view, self._index + block * _OFFSET.size)[0]
+        for _ in range(skip):
+            offset = self._next(offset)
+        return self._read(offset)[0]
+
+    def replay(self, number):
+        """
+        Yield the Board of game number at its start and after every move;
+        the same Board object is updated in place.
+        """
+        game = self[number]
+        board = unpack_position(game.start) if game.start is not None else Board()
+        yield board
+        for code in game.moves:
+            board.make_move(decode_move(code))
+            yield board
+
+
+def convert_pgn(source, path):
+    """
+    Write every game of a PGN file to an archive at path; games stop at
+    the first move that cannot be parsed, and games whose FEN tag cannot
+    be loaded are skipped. Returns a Conversion with both counts.
+    """
+    skipped = 0
+    with ArchiveWriter(path) as writer:
+        for game in read_games(source):
+            try:
+                start = Board.from_fen(game.headers['FEN']) if 'FEN' in game.headers else None
+            except ValueError:
+                skipped += 1
+                continue
+            board = Board.unpack(start.pack()) if start is not None else Board()
+            moves = []
+            try:
+                for san in game.moves:
+                    move = parse_san(board, san)
+                    board.make_move(move)
+                    moves.append(move)
+            except ValueError:
+                pass
+            writer.add_game(moves, game.result if game.result in RESULTS else '*', start)
+        return Conversion(writer.count, skipped)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PGN to the binary game archive, or describe one.")
+    parser.add_argument('pgn', nargs='?', help="PGN file to convert")
+    parser.add_argument('--out', help="archive to write")
+    parser.add_argument('--info', metavar='ARCHIVE', help="print the size of an archive")
+    args = parser.parse_args(argv)
+
+    if args.info:
+        with ArchiveReader(args.info) as reader:
+            plies = sum(len(game.moves) for game in reader)
+            print(f"{len(reader)} games, {plies} plies")
+        return 0
+    if not args.pgn or not args.out:
+        parser.error("give a PGN file and --out, or --info ARCHIVE")
+    written, skipped = convert_pgn(args.pgn, args.out)
+    print(f"{written} games written to {args.out}, {skipped} skipped for an invalid FEN tag")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# attacks.py
+
+"""
+Precomputed attack tables.
+
+Knight, king and pawn attacks are plain per-square lookups. Sliding pieces
+use ray tables: the attack set along a ray is the ray itself minus
+everything behind the first blocker, so a lookup costs one bit scan per
+direction instead of a walk over the board.
+"""
+
+from bitboard import (
+    KNIGHT_OFFSETS, KING_OFFSETS, BISHOP_DIRECTIONS, ROOK_DIRECTIONS,
+    shift, step_attacks, sliding_attacks,
+)
+
+KNIGHT_ATTACKS = [step_attacks(1 << square, KNIGHT_OFFSETS) for square in range(64)]
+KING_ATTACKS = [step_attacks(1 << square, KING_OFFSETS) for square in range(64)]
+
+# PAWN_ATTACKS[color][square]: squares a pawn of that color on square attacks
+PAWN_ATTACKS = {
+    'white': [shift(1 << square, -1, -1) | shift(1 << square, -1, 1) for square in range(64)],
+    'black': [shift(1 << square, 1, -1) | shift(1 << square, 1, 1) for square in range(64)],
+}
+
+# RAYS[direction][square]: every square from square (exclusive) to the edge
+RAYS = {
+    direction: [sliding_attacks(1 << square, 0, [direction]) for square in range(64)]
+    for direction in BISHOP_DIRECTIONS + ROOK_DIRECTIONS
+}
+
+# Rays that run towards higher square indices find their first blocker with
+# the lowest set bit, the others with the highest set bit
+_BISHOP_RAYS = [(RAYS[d], d[0] * 8 + d[1] > 0) for d in BISHOP_DIRECTIONS]
+_ROOK_RAYS = [(RAYS[d], d[0] * 8 + d[1] > 0) for d in ROOK_DIRECTIONS]
+
+
+def _ray_attacks(square, occupied, rays):
+    attacks = 0
+    for ray_table, positive in rays:
+        ray = ray_table[square]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= ray_table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(square, occupied):
+    return _ray_attacks(square, occupied, _BISHOP_RAYS)
+
+
+def rook_attacks(square, occupied):
+    return _ray_attacks(square, occupied, _ROOK_RAYS)
+
+
+def _between(start, end):
+    for ray_table in RAYS.values():
+        if ray_table[start] >> end & 1:
+            return ray_table[start] & ~ray_table[end] & ~(1 << end)
+    return 0
+
+
+# BETWEEN[a][b]: squares strictly between a and b on a shared line, else 0
+BETWEEN = [[_between(start, end) for end in range(64)] for start in range(64)]
@@ -0,0 +1,146 @@
+# benchmark.py
+
+"""
+Move generation benchmark.
+
+Runs Board.perft on standard reference positions, compares the node
+counts against the published values and reports nodes per second:
+
+    python benchmark.py --depth 3
+    python benchmark.py --depth 4 --positions startpos kiwipete --json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from board import Board
+from parallel import parallel_perft
+from utils import move_to_notation
+
+# name -> (FEN, known perft node counts for depth 1, 2, ...)
+POSITIONS = {
+    'startpos': (
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+        [20, 400, 8902, 197281, 4865609],
+    ),
+    'kiwipete': (
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        [48, 2039, 97862, 4085603],
+    ),
+    # En passant captures that expose the king, and discovered checks
+    'en_passant': (
+        '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        [14, 191, 2812, 43238, 674624],
+    ),
+    # Promotions with and without capture, castling rights lost by capture
+    'promotion': (
+        'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+        [6, 264, 9467, 422333],
+    ),
+    'underpromotion': (
+        'n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1',
+        [24, 496, 9483, 182838, 3605103],
+    ),
+    # Promotion with check and a knight attacking the castling path
+    'talkchess': (
+        'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+        [44, 1486, 62379, 2103487],
+    ),
+}
+
+
+def run_position(name, depth, workers=None, split_depth=1):
+    """
+    Run perft on one reference position and return a result dict. With
+    workers set, the tree is counted by parallel.parallel_perft.
+    """
+    fen, expected = POSITIONS[name]
+    board = Board.from_fen(fen)
+    start = time.perf_counter()
+    if workers:
+        nodes = parallel_perft(board, depth, workers, split_depth=split_depth)
+    else:
+        nodes = board.perft(depth)
+    seconds = time.perf_counter() - start
+    known = expected[depth - 1] if depth <= len(expected) else None
+    return {
+        'position': name,
+        'depth': depth,
+        'nodes': nodes,
+        'expected': known,
+        'ok': known is None or nodes == known,
+        'seconds': round(seconds, 4),
+        'nps': int(nodes / seconds) if seconds > 0 else None,
+        'workers': workers or 1,
+    }
+
+
+def run(names=None, max_depth=3, workers=None, split_depth=1):
+    """
+    Run every named position (all by default) at depths 1..max_depth.
+    """
+    results = []
+    for name in names or POSITIONS:
+        for depth in range(1, max_depth + 1):
+            results.append(run_position(name, depth, workers, split_depth))
+    return results
+
+
+def summarize(results):
+    nodes = sum(result['nodes'] for result in results)
+    seconds = sum(result['seconds'] for result in results)
+    return {
+        'python': platform.python_version(),
+        'results': results,
+        'total_nodes': nodes,
+        'total_seconds': round(seconds, 4),
+        'nps': int(nodes / seconds) if seconds > 0 else None,
+        'ok': all(result['ok'] for result in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark")
+    parser.add_argument('--depth', type=int, default=3, help="maximum perft depth")
+    parser.add_argument('--positions', nargs='+', choices=sorted(POSITIONS),
+                        help="positions to run (default: all)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--divide', action='store_true',
+                        help="print per-root-move node counts at --depth instead")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="count subtrees in this many worker processes")
+    parser.add_argument('--split-depth', type=int, default=1,
+                        help="plies below the root at which parallel work is split")
+    args = parser.parse_args(argv)
+
+    if args.divide:
+        for name in args.positions or POSITIONS:
+            counts = Board.from_fen(POSITIONS[name][0]).divide(args.depth)
+            divided = {move_to_notation(move): nodes for move, nodes in counts.items()}
+            if args.json:
+                print(json.dumps({'position': name, 'depth': args.depth, 'divide': divided}))
+            else:
+                print(f"{name} depth {args.depth}")
+                for notation, nodes in sorted(divided.items()):
+                    print(f"  {notation}: {nodes}")
+                print(f"  total: {sum(divided.values())}")
+        return 0
+
+    report = summarize(run(args.positions, args.depth, args.workers, args.split_depth))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for result in report['results']:
+            status = 'ok' if result['ok'] else f"MISMATCH (expected {result['expected']})"
+            print(f"{result['position']:<15} depth {result['depth']}  {result['nodes']:>10} nodes"
+                  f"  {result['seconds']:>8.3f}s  {result['nps'] or 0:>8} nps  {status}")
+        print(f"total {report['total_nodes']} nodes in {report['total_seconds']:.3f}s"
+              f" ({report['nps'] or 0} nps)")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
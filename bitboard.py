@@ -0,0 +1,92 @@
+# bitboard.py
+
+"""
+Bitboard helpers shared by the board and the move generators.
+
+Squares are numbered the same way Board.grid is laid out: square 0 is a8,
+square 7 is h8 and square 63 is h1, so square = row * 8 + col.
+"""
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+
+# ROWS[row] holds the eight squares of that grid row (row 0 is rank 8)
+ROWS = [0xFF << (8 * row) for row in range(8)]
+
+PIECE_SYMBOLS = 'PNBRQKpnbrqk'
+SYMBOL_INDEX = {symbol: index for index, symbol in enumerate(PIECE_SYMBOLS)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+COLOR_OFFSET = {'white': 0, 'black': 6}
+OTHER_COLOR = {'white': 'black', 'black': 'white'}
+
+# (row, col) tuple for every square, so hot loops avoid calling divmod
+POSITIONS = [divmod(square, 8) for square in range(64)]
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                  (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1),
+                (0, 1), (1, -1), (1, 0), (1, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# Squares that must be cleared before shifting by a column delta, so that
+# pieces on the edge files do not wrap around onto the other side
+_WRAP_MASKS = {
+    -2: FULL & ~(FILE_A | FILE_B),
+    -1: FULL & ~FILE_A,
+    0: FULL,
+    1: FULL & ~FILE_H,
+    2: FULL & ~(FILE_G | FILE_H),
+}
+
+
+def iter_bits(bb):
+    """
+    Yield the square index of every set bit, lowest first.
+    """
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def shift(bb, dr, dc):
+    """
+    Move every bit of bb by dr rows and dc columns, dropping bits that
+    would leave the board.
+    """
+    bb &= _WRAP_MASKS[dc]
+    amount = dr * 8 + dc
+    if amount > 0:
+        return (bb << amount) & FULL
+    return bb >> -amount
+
+
+def step_attacks(bb, offsets):
+    """
+    Squares reached by a single step from bb along each offset
+    (knight and king patterns).
+    """
+    attacks = 0
+    for dr, dc in offsets:
+        attacks |= shift(bb, dr, dc)
+    return attacks
+
+
+def sliding_attacks(bb, occupied, directions):
+    """
+    Squares reached by sliding from bb along each direction, stopping at
+    (and including) the first occupied square.
+    """
+    empty = ~occupied & FULL
+    attacks = 0
+    for dr, dc in directions:
+        ray = shift(bb, dr, dc)
+        while ray:
+            attacks |= ray
+            ray = shift(ray & empty, dr, dc)
+    return attacks
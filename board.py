@@ -1,11 +1,234 @@
 # board.py
 
+from collections import namedtuple
+
 from pieces import Pawn, Knight, Bishop, Rook, Queen, King
+from bitboard import (
+    FULL, ROWS, POSITIONS, COLOR_OFFSET, OTHER_COLOR,
+    PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    iter_bits, shift,
+)
+from attacks import (
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN,
+    bishop_attacks, rook_attacks,
+)
+from evaluation import MG_SCORES, EG_SCORES, PHASES
+from zobrist import (
+    PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS,
+    WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE,
+)
+from utils import notation_to_move
+from movepick import pick_moves, PIECE_VALUES, PROMOTION_VALUES
+
+# Piece classes a pawn can promote to, keyed by the promotion letter
+PROMOTION_PIECES = {'Q': Queen, 'R': Rook, 'B': Bishop, 'N': Knight}
+# Every piece class, keyed by its white symbol
+PIECE_CLASSES = dict(PROMOTION_PIECES, P=Pawn, K=King)
+
+# (castling right, row, rook column) for each of the four castling rights
+CASTLING_HOMES = ((WHITE_KINGSIDE, 7, 7), (WHITE_QUEENSIDE, 7, 0),
+                  (BLACK_KINGSIDE, 0, 7), (BLACK_QUEENSIDE, 0, 0))
+
+# King destination column -> (rook start column, rook end column)
+CASTLING_ROOK_COLS = {6: (7, 5), 2: (0, 3)}
+
+# FEN castling letters and the castling rights they stand for
+FEN_CASTLING = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Result of Board.apply_move: captured is the captured piece's symbol or None,
+# error explains why ok is False
+MoveResult = namedtuple('MoveResult', ['ok', 'move', 'captured', 'status', 'error'])
+# Result of Board.game_status: state is 'ongoing', 'checkmate', 'stalemate' or
+# a draw by repetition or the move rules, winner the winning color or None
+GameStatus = namedtuple('GameStatus', ['state', 'winner', 'in_check'])
+# Readable reason for each drawn GameStatus state
+DRAW_REASONS = {
+    'stalemate': 'stalemate',
+    'threefold_repetition': 'threefold repetition',
+    'fivefold_repetition': 'fivefold repetition',
+    'fifty_moves': '50-move rule',
+    'seventyfive_moves': '75-move rule',
+}
+
+# Home squares of the kings and rooks; changing one may change castling rights
+CASTLING_SQUARES = (1 << 0) | (1 << 4) | (1 << 7) | (1 << 56) | (1 << 60) | (1 << 63)
+
+# CASTLING_MASK[square]: castling rights kept when a move starts or ends on square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 & ~BLACK_QUEENSIDE
+CASTLING_MASK[4] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[7] = 15 & ~BLACK_KINGSIDE
+CASTLING_MASK[56] = 15 & ~WHITE_QUEENSIDE
+CASTLING_MASK[60] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[63] = 15 & ~WHITE_KINGSIDE
+
+# Piece classes by kind (bitboard.PAWN .. bitboard.KING)
+PIECE_TYPES = (Pawn, Knight, Bishop, Rook, Queen, King)
+
+
+# FEN rank string -> eight (piece class, color) pairs, (None, None) for empty
+_FEN_RANKS = {}
+
+
+def _parse_fen_rank(rank, fen):
+    layout = []
+    for char in rank:
+        if char in '12345678':
+            layout.extend([(None, None)] * int(char))
+        elif char.upper() in PIECE_CLASSES:
+            layout.append((PIECE_CLASSES[char.upper()], 'white' if char.isupper() else 'black'))
+        else:
+            raise ValueError(f"Invalid FEN piece {char!r}: {fen!r}")
+    if len(layout) != 8:
+        raise ValueError(f"Invalid FEN rank {rank!r}: {fen!r}")
+    # Real datasets repeat a small set of rank strings over and over
+    if len(_FEN_RANKS) < 100000:
+        _FEN_RANKS[rank] = layout
+    return layout
+
 
 class Board:
-    def __init__(self):
-        self.grid = self.initialize_board()
+    def __init__(self, fen=None):
+        # One bitboard per piece type and color, indexed like bitboard.PIECE_SYMBOLS
+        self.bitboards = [0] * 12
+        self.occupancy = {'white': 0, 'black': 0}
+        self.occupied = 0
+        # One byte per square: 0 if empty, else 1 + the piece's code
+        self.squares = bytearray(64)
+        # Castling rights bitmask (zobrist.WHITE_KINGSIDE etc.), kept up to date by make_move
+        self.castling = 0
+        self.side_to_move = 'white'
         self.last_move = None  # Keep track of the last move for en passant
+        self.undo_stack = []  # One record per move played through make_move
+        # Zobrist key of the position before each move on the undo stack
+        self.key_history = []
+        self.halfmove_clock = 0  # Plies since the last capture or pawn move
+        self.fullmove_number = 1
+        # 64-bit Zobrist key of the position, updated incrementally. The
+        # en passant file currently folded into it is remembered so it can be
+        # swapped out when it changes.
+        self.zobrist_key = 0
+        self._key_en_passant = None
+        # Running tapered-evaluation terms (see evaluation.py), White positive
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        if fen is None:
+            self.grid = self.initialize_board()
+        else:
+            self.set_fen(fen)
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid):
+        # Replacing the whole grid (as the tests do) rebuilds the bitboards.
+        # Single squares must be changed through set_piece_at to stay in sync.
+        self._grid = grid
+        self.sync_bitboards()
+
+    def sync_bitboards(self):
+        """
+        Rebuild the squares, bitboards, occupancy masks, evaluation terms,
+        castling rights and Zobrist key from grid in a single pass.
+        """
+        bitboards = [0] * 12
+        squares = bytearray(64)
+        mg_score = eg_score = phase = key = 0
+        square = 0
+        for row in self._grid:
+            for piece in row:
+                if piece is not None:
+                    index = piece.code
+                    squares[square] = index + 1
+                    bitboards[index] |= 1 << square
+                    mg_score += MG_SCORES[index][square]
+                    eg_score += EG_SCORES[index][square]
+                    phase += PHASES[index]
+                    key ^= PIECE_KEYS[index][square]
+                square += 1
+        white = bitboards[0] | bitboards[1] | bitboards[2] | bitboards[3] | bitboards[4] | bitboards[5]
+        black = bitboards[6] | bitboards[7] | bitboards[8] | bitboards[9] | bitboards[10] | bitboards[11]
+        self.bitboards = bitboards
+        self.squares = squares
+        self.occupancy = {'white': white, 'black': black}
+        self.occupied = white | black
+        self.mg_score, self.eg_score, self.phase = mg_score, eg_score, phase
+        self.castling = self._castling_from_pieces()
+        self._hash_state(key)
+
+    def rehash(self):
+        """
+        Recompute zobrist_key from scratch. Moves keep the key up to date on
+        their own; this is only needed after castling, last_move or
+        side_to_move were edited by hand.
+        """
+        key = 0
+        for index, bb in enumerate(self.bitboards):
+            keys = PIECE_KEYS[index]
+            for square in iter_bits(bb):
+                key ^= keys[square]
+        self._hash_state(key)
+
+    def _hash_state(self, key):
+        """
+        Set zobrist_key to the given piece key plus side to move, castling
+        rights and en passant file.
+        """
+        if self.side_to_move == 'black':
+            key ^= SIDE_KEY
+        key ^= CASTLING_KEYS[self.castling]
+        self._key_en_passant = self._en_passant_file()
+        if self._key_en_passant is not None:
+            key ^= EN_PASSANT_KEYS[self._key_en_passant]
+        self.zobrist_key = key
+
+    def castling_rights(self):
+        """
+        Castling rights as a bitmask of the zobrist.WHITE_KINGSIDE style flags.
+        """
+        return self.castling
+
+    def _castling_from_pieces(self):
+        """
+        Castling rights implied by the kings and rooks on their home squares
+        and their has_moved flags; used when a position is edited by hand.
+        """
+        rights = 0
+        grid = self._grid
+        for color, row, kingside, queenside in (('white', 7, WHITE_KINGSIDE, WHITE_QUEENSIDE),
+                                                ('black', 0, BLACK_KINGSIDE, BLACK_QUEENSIDE)):
+            king = grid[row][4]
+            if not isinstance(king, King) or king.color != color or king.has_moved:
+                continue
+            for rook_col, flag in ((7, kingside), (0, queenside)):
+                rook = grid[row][rook_col]
+                if isinstance(rook, Rook) and rook.color == color and not rook.has_moved:
+                    rights |= flag
+        return rights
+
+    def _en_passant_file(self):
+        """
+        Column of the en passant square if the side to move can actually
+        capture onto it, else None. Only then does it belong in the hash.
+        """
+        mask = self._en_passant_mask(self.side_to_move)
+        if mask:
+            square = mask.bit_length() - 1
+            pawns = self.bitboards[COLOR_OFFSET[self.side_to_move] + PAWN]
+            if PAWN_ATTACKS[OTHER_COLOR[self.side_to_move]][square] & pawns:
+                return square & 7
+        return None
+
+    def _set_castling(self, rights):
+        if rights != self.castling:
+            self.zobrist_key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[rights]
+            self.castling = rights
 
     def initialize_board(self):
         grid = [[None for _ in range(8)] for _ in range(8)]
@@ -34,121 +257,259 @@ class Board:
         grid[7][4] = King('white')
         return grid
 
-    def move_piece(self, start_pos, end_pos):
+    def move_piece(self, start_pos, end_pos, promotion='Q'):
         """
         Move a piece from start_pos to end_pos, assuming the move is valid.
+        A pawn reaching the last row becomes the promotion piece.
         """
         piece = self.get_piece_at(start_pos)
-        if piece:
-            captured_piece = self.get_piece_at(end_pos)
-            self.set_piece_at(end_pos, piece)
-            self.set_piece_at(start_pos, None)
-            # Handle pawn promotion
-            if isinstance(piece, Pawn):
-                promotion_row = 0 if piece.color == 'white' else 7
-                if end_pos[0] == promotion_row:
-                    self.promote_pawn(end_pos, piece.color)
-            # Update has_moved status
-            piece.has_moved = True
-            if isinstance(piece, King) and abs(start_pos[1] - end_pos[1]) == 2:
-                # Handle castling
-                self._castle_rook(piece.color, start_pos, end_pos)
-            # Handle en passant capture
-            if isinstance(piece, Pawn) and captured_piece is None:
-                if start_pos[1] != end_pos[1]:
-                    # Capturing en passant
-                    capture_row = start_pos[0]
-                    captured_pawn_pos = (capture_row, end_pos[1])
-                    self.set_piece_at(captured_pawn_pos, None)
-
-            self.last_move = (piece, start_pos, end_pos)
-            return True
-        else:
-            print("No piece at the starting position.")
+        if piece is None:
             return False
+        if piece.kind == PAWN and end_pos[0] in (0, 7):
+            self.make_move((start_pos, end_pos, promotion))
+        else:
+            self.make_move((start_pos, end_pos))
+        return True
+
+    def apply_move(self, move):
+        """
+        Play a move for the side to move if it is legal and return a
+        MoveResult. move is a (start, end[, promotion]) tuple or coordinate
+        notation such as 'e2e4' or 'e7e8q'; pawn moves to the last row must
+        name the promotion piece. The board is unchanged when ok is False.
+        """
+        if isinstance(move, str):
+            parsed = notation_to_move(move)
+            if parsed is None:
+                return MoveResult(False, move, None, self.game_status(), "Invalid move notation")
+            move = parsed
+        elif len(move) > 2:
+            move = (tuple(move[0]), tuple(move[1]), move[2].upper())
+        else:
+            move = (tuple(move[0]), tuple(move[1]))
+        color = self.side_to_move
+        pseudo_legal = self.get_pseudo_legal_moves(color)
+        if move not in pseudo_legal:
+            if move + ('Q',) in pseudo_legal:
+                error = "Promotion piece required"
+            else:
+                error = "Illegal move"
+            return MoveResult(False, move, None, self.game_status(), error)
+        self.make_move(move)
+        if self.is_in_check(color):
+            self.unmake_move()
+            return MoveResult(False, move, None, self.game_status(), "King would be in check")
+        captured = self.undo_stack[-1][2]
+        return MoveResult(True, move, captured.symbol if captured else None, self.game_status(), None)
+
+    def make_move(self, move):
+        """
+        Play a move given as (start, end) or (start, end, promotion), where
+        promotion is one of 'Q', 'R', 'B', 'N' (a queen if omitted).
+        Handles castling, en passant and promotion, and pushes an undo record
+        so unmake_move can restore the position exactly.
+        """
+        start, end = move[0], move[1]
+        grid = self._grid
+        piece = grid[start[0]][start[1]]
+        kind = piece.kind
+        captured_piece = grid[end[0]][end[1]]
+        captured_pos = end
+        if kind == PAWN and captured_piece is None and start[1] != end[1]:
+            # Capturing en passant
+            captured_pos = (start[0], end[1])
+            captured_piece = grid[start[0]][end[1]]
+        castled_rook = None
+        if kind == KING and abs(start[1] - end[1]) == 2:
+            rook = grid[start[0]][CASTLING_ROOK_COLS[end[1]][0]]
+            castled_rook = (rook, rook.has_moved)
+        self.undo_stack.append((
+            move, piece, captured_piece, captured_pos,
+            piece.has_moved, castled_rook, self.last_move,
+            self.side_to_move, self.zobrist_key, self.castling, self._key_en_passant,
+            self.halfmove_clock, self.fullmove_number,
+        ))
+        self.key_history.append(self.zobrist_key)
+        if kind == PAWN or captured_piece is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color == 'black':
+            self.fullmove_number += 1
+
+        if captured_pos != end:
+            self._put(captured_pos, None)
+        self._put(start, None)
+        if kind == PAWN and (end[0] == 0 or end[0] == 7):
+            promotion = move[2] if len(move) > 2 else 'Q'
+            self._put(end, PROMOTION_PIECES[promotion](piece.color))
+        else:
+            self._put(end, piece)
+        if castled_rook is not None:
+            self._castle_rook(piece.color, start, end)
+        piece.has_moved = True
+        self.last_move = (piece, start, end)
+
+        # Fold the new side to move, castling rights and en passant file into the key
+        side_to_move = OTHER_COLOR[piece.color]
+        if side_to_move != self.side_to_move:
+            self.zobrist_key ^= SIDE_KEY
+            self.side_to_move = side_to_move
+        rights = self.castling
+        if rights:
+            self._set_castling(rights & CASTLING_MASK[start[0] * 8 + start[1]]
+                               & CASTLING_MASK[end[0] * 8 + end[1]])
+        en_passant = self._en_passant_file()
+        if en_passant != self._key_en_passant:
+            if self._key_en_passant is not None:
+                self.zobrist_key ^= EN_PASSANT_KEYS[self._key_en_passant]
+            if en_passant is not None:
+                self.zobrist_key ^= EN_PASSANT_KEYS[en_passant]
+            self._key_en_passant = en_passant
+
+    def unmake_move(self):
+        """
+        Take back the last move played through make_move and return it.
+        """
+        (move, piece, captured_piece, captured_pos, had_moved, castled_rook, last_move,
+         side_to_move, zobrist_key, self.castling, key_en_passant,
+         self.halfmove_clock, self.fullmove_number) = self.undo_stack.pop()
+        self.key_history.pop()
+        start, end = move[0], move[1]
+        if castled_rook is not None:
+            rook, rook_had_moved = castled_rook
+            rook_start_col, rook_end_col = CASTLING_ROOK_COLS[end[1]]
+            self._put((start[0], rook_end_col), None)
+            self._put((start[0], rook_start_col), rook)
+            rook.has_moved = rook_had_moved
+        self._put(end, None)
+        if captured_piece is not None:
+            self._put(captured_pos, captured_piece)
+        self._put(start, piece)
+        piece.has_moved = had_moved
+        self.last_move = last_move
+        self.side_to_move = side_to_move
+        # The square updates above changed the key; the saved one is exact
+        self.zobrist_key = zobrist_key
+        self._key_en_passant = key_en_passant
+        return move
 
 
     def _castle_rook(self, color, king_start, king_end):
         row = king_start[0]
-        if king_end[1] == 6:  # Kingside
-            rook_start = (row, 7)
-            rook_end = (row, 5)
-        elif king_end[1] == 2:  # Queenside
-            rook_start = (row, 0)
-            rook_end = (row, 3)
+        rook_start_col, rook_end_col = CASTLING_ROOK_COLS[king_end[1]]
+        rook_start = (row, rook_start_col)
+        rook_end = (row, rook_end_col)
         rook = self.get_piece_at(rook_start)
-        self.set_piece_at(rook_end, rook)
-        self.set_piece_at(rook_start, None)
+        self._put(rook_end, rook)
+        self._put(rook_start, None)
         rook.has_moved = True
 
-    def promote_pawn(self, position, color):
-        while True:
-            choice = input("Promote pawn to (Q, R, B, N): ").upper()
-            if choice in ['Q', 'R', 'B', 'N']:
-                if choice == 'Q':
-                    self.set_piece_at(position, Queen(color))
-                elif choice == 'R':
-                    self.set_piece_at(position, Rook(color))
-                elif choice == 'B':
-                    self.set_piece_at(position, Bishop(color))
-                elif choice == 'N':
-                    self.set_piece_at(position, Knight(color))
-                break
-            else:
-                print("Invalid choice. Please choose Q, R, B, or N.")
+    def promote_pawn(self, position, color, choice='Q'):
+        """
+        Replace the pawn on position with a piece of the given color;
+        choice is one of 'Q', 'R', 'B', 'N'.
+        """
+        if choice not in PROMOTION_PIECES:
+            raise ValueError(f"Invalid promotion piece: {choice!r}")
+        self.set_piece_at(position, PROMOTION_PIECES[choice](color))
 
     def get_piece_at(self, position):
         row, col = position
         if 0 <= row < 8 and 0 <= col < 8:
-            return self.grid[row][col]
+            return self._grid[row][col]
         return None
 
     def set_piece_at(self, position, piece):
+        """
+        Put piece (or None) on a square, keeping every derived structure in
+        sync. Editing a king or rook home square re-derives castling rights.
+        """
         row, col = position
         if 0 <= row < 8 and 0 <= col < 8:
-            self.grid[row][col] = piece
+            self._put(position, piece)
+            if (1 << (row * 8 + col)) & CASTLING_SQUARES:
+                self._set_castling(self._castling_from_pieces())
+
+    def _put(self, position, piece):
+        """
+        Update the grid, squares, bitboards, Zobrist key and evaluation terms
+        for one square. The single primitive behind every board change.
+        """
+        row, col = position
+        square = row * 8 + col
+        bit = 1 << square
+        old_piece = self._grid[row][col]
+        if old_piece is not None:
+            index = old_piece.code
+            self.bitboards[index] &= ~bit
+            self.occupancy[old_piece.color] &= ~bit
+            self.zobrist_key ^= PIECE_KEYS[index][square]
+            self.mg_score -= MG_SCORES[index][square]
+            self.eg_score -= EG_SCORES[index][square]
+            self.phase -= PHASES[index]
+        if piece is not None:
+            index = piece.code
+            self.bitboards[index] |= bit
+            self.occupancy[piece.color] |= bit
+            self.zobrist_key ^= PIECE_KEYS[index][square]
+            self.mg_score += MG_SCORES[index][square]
+            self.eg_score += EG_SCORES[index][square]
+            self.phase += PHASES[index]
+            self.squares[square] = index + 1
+        else:
+            self.squares[square] = 0
+        self.occupied = self.occupancy['white'] | self.occupancy['black']
+        self._grid[row][col] = piece
 
     def is_empty(self, position):
-        return self.get_piece_at(position) is None
+        row, col = position
+        if 0 <= row < 8 and 0 <= col < 8:
+            return not (self.occupied >> (row * 8 + col)) & 1
+        return True
 
     def is_enemy_piece(self, position, color):
-        piece = self.get_piece_at(position)
-        return piece is not None and piece.color != color
+        row, col = position
+        if 0 <= row < 8 and 0 <= col < 8:
+            return bool((self.occupancy[OTHER_COLOR[color]] >> (row * 8 + col)) & 1)
+        return False
 
     def is_ally_piece(self, position, color):
-        piece = self.get_piece_at(position)
-        return piece is not None and piece.color == color
+        row, col = position
+        if 0 <= row < 8 and 0 <= col < 8:
+            return bool((self.occupancy[color] >> (row * 8 + col)) & 1)
+        return False
 
     def is_square_attacked(self, position, color):
         """
         Determine if a square is attacked by any enemy pieces.
+        Works outward from the square: a piece type attacks it exactly when
+        the same piece standing on the square would attack that piece.
         """
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece_at((row, col))
-                if piece and piece.color != color:
-                    # Skip enemy king to prevent infinite recursion
-                    if isinstance(piece, King):
-                        continue
-                    if position in piece.get_possible_moves((row, col), self):
-                        return True
-        # Check for enemy king separately
-        return self.is_adjacent_enemy_king(position, color)
+        row, col = position
+        square = row * 8 + col
+        bitboards = self.bitboards
+        enemy = COLOR_OFFSET[OTHER_COLOR[color]]
+        if PAWN_ATTACKS[color][square] & bitboards[enemy + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[square] & bitboards[enemy + KNIGHT]:
+            return True
+        if KING_ATTACKS[square] & bitboards[enemy + KING]:
+            return True
+        queens = bitboards[enemy + QUEEN]
+        if bishop_attacks(square, self.occupied) & (bitboards[enemy + BISHOP] | queens):
+            return True
+        if rook_attacks(square, self.occupied) & (bitboards[enemy + ROOK] | queens):
+            return True
+        return False
+
     def is_adjacent_enemy_king(self, position, color):
         """
         Check if the enemy king is adjacent to the given position.
         """
         row, col = position
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                new_row, new_col = row + dr, col + dc
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    piece = self.get_piece_at((new_row, new_col))
-                    if isinstance(piece, King) and piece.color != color:
-                        return True
-        return False
+        enemy_king = self.bitboards[COLOR_OFFSET[OTHER_COLOR[color]] + KING]
+        return bool(KING_ATTACKS[row * 8 + col] & enemy_king)
 
     def is_in_check(self, color):
         """
@@ -164,32 +525,521 @@ class Board:
 
 
     def find_king(self, color):
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece_at((row, col))
-                if isinstance(piece, King) and piece.color == color:
-                    return (row, col)
+        king_bb = self.bitboards[COLOR_OFFSET[color] + KING]
+        if king_bb:
+            return POSITIONS[king_bb.bit_length() - 1]
         return None
 
     def get_all_possible_moves(self, color):
+        """
+        Every legal move of the given color. Checkers and pinned pieces are
+        found once; other moves are then filtered with bitboard masks.
+        King moves are tested with the king lifted off the board. En passant
+        captures are the only moves tried on the board.
+        """
+        bitboards = self.bitboards
+        offset = COLOR_OFFSET[color]
+        king_bb = bitboards[offset + KING]
+        if not king_bb:
+            raise ValueError(f"The {color} king is missing from the board.")
+        king = king_bb.bit_length() - 1
+        without_king = self.occupied ^ king_bb
+        checkers = self.attackers_to(king, color)
+        double_check = checkers & (checkers - 1)
+        # Squares a non-king move must land on: capture the checker or block
+        allowed = checkers | BETWEEN[king][checkers.bit_length() - 1] if checkers else FULL
+        pins = self.pinned_pieces(color)
+        en_passant = self._en_passant_mask(color)
+        pawns = bitboards[offset + PAWN]
+
         moves = []
-        for row in range(8):
-            for col in range(8):
-                piece = self.get_piece_at((row, col))
-                if piece and piece.color == color:
-                    piece_moves = piece.get_possible_moves((row, col), self)
-                    for move in piece_moves:
-                        # Simulate the move
-                        captured_piece = self.get_piece_at(move)
-                        self.set_piece_at(move, piece)
-                        self.set_piece_at((row, col), None)
-                        if not self.is_in_check(color):
-                            moves.append(((row, col), move))
-                        # Undo the move
-                        self.set_piece_at((row, col), piece)
-                        self.set_piece_at(move, captured_piece)
+        for move in self.get_pseudo_legal_moves(color):
+            (start_row, start_col), (end_row, end_col) = move[0], move[1]
+            start, end = start_row * 8 + start_col, end_row * 8 + end_col
+            if start == king:
+                # Castling moves are only generated when they are legal
+                if abs(end_col - start_col) == 2 or not self.attackers_to(end, color, without_king):
+                    moves.append(move)
+                continue
+            if double_check:
+                continue
+            end_bit = 1 << end
+            if end_bit & en_passant and pawns >> start & 1:
+                # The captured pawn leaves a square off the moving pawn's path
+                self.make_move(move)
+                if not self.is_in_check(color):
+                    moves.append(move)
+                self.unmake_move()
+            elif end_bit & allowed and (start not in pins or end_bit & pins[start]):
+                moves.append(move)
         return moves
 
+    def attackers_to(self, square, color, occupied=None):
+        """
+        Bitboard of the enemy pieces of color that attack square, with
+        sliders blocked by occupied (by default the current occupancy).
+        """
+        if occupied is None:
+            occupied = self.occupied
+        bitboards = self.bitboards
+        enemy = COLOR_OFFSET[OTHER_COLOR[color]]
+        queens = bitboards[enemy + QUEEN]
+        return ((PAWN_ATTACKS[color][square] & bitboards[enemy + PAWN])
+                | (KNIGHT_ATTACKS[square] & bitboards[enemy + KNIGHT])
+                | (KING_ATTACKS[square] & bitboards[enemy + KING])
+                | (bishop_attacks(square, occupied) & (bitboards[enemy + BISHOP] | queens))
+                | (rook_attacks(square, occupied) & (bitboards[enemy + ROOK] | queens)))
+
+    def see(self, move):
+        """
+        Static exchange evaluation: the material the side making move wins
+        (negative if it loses) when both sides keep recapturing on the
+        target square with their least valuable attacker, each free to stop
+        when recapturing would not pay. Pieces behind a capturer on the same
+        line (x-rays) join in as the line opens. No moves are made.
+        """
+        start, end = move[0], move[1]
+        source = start[0] * 8 + start[1]
+        target = end[0] * 8 + end[1]
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        squares = self.squares
+        code = squares[source] - 1
+        kind = code % 6
+        side = 'white' if code < 6 else 'black'
+        occupied = self.occupied ^ (1 << source)
+        if squares[target]:
+            gain = [PIECE_VALUES[(squares[target] - 1) % 6]]
+        elif kind == PAWN and start[1] != end[1]:
+            # En passant: the captured pawn is beside the target square
+            gain = [PIECE_VALUES[PAWN]]
+            occupied ^= 1 << (start[0] * 8 + end[1])
+        else:
+            gain = [0]
+        on_target = PIECE_VALUES[kind]
+        if len(move) > 2:
+            gain[0] += PROMOTION_VALUES[move[2]] - PIECE_VALUES[PAWN]
+            on_target = PROMOTION_VALUES[move[2]]
+
+        diagonal = (bitboards[BISHOP] | bitboards[QUEEN]
+                    | bitboards[6 + BISHOP] | bitboards[6 + QUEEN])
+        straight = (bitboards[ROOK] | bitboards[QUEEN]
+                    | bitboards[6 + ROOK] | bitboards[6 + QUEEN])
+        attackers = ((PAWN_ATTACKS['black'][target] & bitboards[PAWN])
+                     | (PAWN_ATTACKS['white'][target] & bitboards[6 + PAWN])
+                     | (KNIGHT_ATTACKS[target] & (bitboards[KNIGHT] | bitboards[6 + KNIGHT]))
+                     | (KING_ATTACKS[target] & (bitboards[KING] | bitboards[6 + KING]))
+                     | (bishop_attacks(target, occupied) & diagonal)
+                     | (rook_attacks(target, occupied) & straight)) & occupied
+        side = OTHER_COLOR[side]
+        while True:
+            own = attackers & occupancy[side]
+            if not own:
+                break
+            offset = COLOR_OFFSET[side]
+            for kind in range(6):
+                candidates = own & bitboards[offset + kind]
+                if candidates:
+                    break
+            lsb = candidates & -candidates
+            if kind == KING and attackers & ~lsb & occupancy[OTHER_COLOR[side]]:
+                # The king may not recapture onto a defended square
+                break
+            gain.append(on_target - gain[-1])
+            on_target = PIECE_VALUES[kind]
+            occupied ^= lsb
+            # Only a piece leaving a line can uncover an x-ray along it
+            if kind in (PAWN, BISHOP, QUEEN):
+                attackers |= bishop_attacks(target, occupied) & diagonal
+            if kind in (ROOK, QUEEN):
+                attackers |= rook_attacks(target, occupied) & straight
+            attackers &= occupied
+            side = OTHER_COLOR[side]
+        # Each side stops capturing as soon as that is better for it
+        for index in range(len(gain) - 1, 0, -1):
+            gain[index - 1] = -max(-gain[index - 1], gain[index])
+        return gain[0]
+
+    def pinned_pieces(self, color):
+        """
+        Map the square of every piece of color pinned to its king to the
+        squares it may still move to: the pin ray including the pinner.
+        """
+        bitboards = self.bitboards
+        king_bb = bitboards[COLOR_OFFSET[color] + KING]
+        if not king_bb:
+            return {}
+        king = king_bb.bit_length() - 1
+        enemy = COLOR_OFFSET[OTHER_COLOR[color]]
+        enemy_pieces = self.occupancy[OTHER_COLOR[color]]
+        queens = bitboards[enemy + QUEEN]
+        # Enemy sliders that would attack the king if our pieces were not there
+        snipers = ((rook_attacks(king, enemy_pieces) & (bitboards[enemy + ROOK] | queens))
+                   | (bishop_attacks(king, enemy_pieces) & (bitboards[enemy + BISHOP] | queens)))
+        pins = {}
+        own = self.occupancy[color]
+        for sniper in iter_bits(snipers):
+            blockers = BETWEEN[king][sniper] & self.occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pins[blockers.bit_length() - 1] = BETWEEN[king][sniper] | (1 << sniper)
+        return pins
+
+    def has_legal_move(self, color):
+        """
+        True if color has at least one legal move. Moves are generated in
+        stages and checked one at a time, stopping at the first legal one.
+        """
+        if color == self.side_to_move:
+            return next(pick_moves(self), None) is not None
+        for move in self.get_pseudo_legal_moves(color):
+            self.make_move(move)
+            in_check = self.is_in_check(color)
+            self.unmake_move()
+            if not in_check:
+                return True
+        return False
+
+    def repetition_count(self):
+        """
+        How many times the current position has occurred, this time included.
+        A capture or pawn move cannot be undone, so only the last
+        halfmove_clock plies are scanned, and only positions with the same
+        side to move.
+        """
+        history = self.key_history
+        key = self.zobrist_key
+        count = 1
+        for back in range(2, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-back] == key:
+                count += 1
+        return count
+
+    def is_repetition(self, count=3):
+        """
+        True if the current position has occurred at least count times.
+        """
+        return self.repetition_count() >= count
+
+    def game_status(self, color=None, claim_draws=True):
+        """
+        Status for color (by default the side to move) as a GameStatus. The
+        state is 'ongoing', 'checkmate', 'stalemate' or one of the draws
+        'fivefold_repetition' and 'seventyfive_moves', which end the game
+        by themselves, and 'threefold_repetition' and 'fifty_moves', which a
+        player may claim (counted as draws unless claim_draws is False).
+        Checkmate on the last move takes precedence over the move rules.
+        """
+        color = color or self.side_to_move
+        in_check = self.is_in_check(color)
+        if not self.has_legal_move(color):
+            if in_check:
+                return GameStatus('checkmate', OTHER_COLOR[color], True)
+            return GameStatus('stalemate', None, False)
+        # A third occurrence needs at least eight reversible plies
+        if self.halfmove_clock >= 8:
+            repetitions = self.repetition_count()
+            if repetitions >= 5:
+                return GameStatus('fivefold_repetition', None, in_check)
+            if self.halfmove_clock >= 150:
+                return GameStatus('seventyfive_moves', None, in_check)
+            if claim_draws and repetitions >= 3:
+                return GameStatus('threefold_repetition', None, in_check)
+            if claim_draws and self.halfmove_clock >= 100:
+                return GameStatus('fifty_moves', None, in_check)
+        return GameStatus('ongoing', None, in_check)
+
+    def perft(self, depth):
+        """
+        Count the leaf nodes of the legal move tree of the given depth,
+        starting with the side to move.
+        """
+        if depth == 0:
+            return 1
+        moves = self.get_all_possible_moves(self.side_to_move)
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.make_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move()
+        return nodes
+
+    def divide(self, depth):
+        """
+        Perft split by root move: a dict mapping every legal move of the
+        side to move to the node count of its subtree.
+        """
+        counts = {}
+        for move in self.get_all_possible_moves(self.side_to_move):
+            self.make_move(move)
+            counts[move] = self.perft(depth - 1)
+            self.unmake_move()
+        return counts
+
+    def get_pseudo_legal_moves(self, color, captures=True, quiets=True, origins=FULL):
+        """
+        Generate (start, end) pairs for every move of the given color from the
+        bitboards, without checking whether the move leaves its king in check.
+        Pawn moves onto the last row are listed once per promotion piece as
+        (start, end, promotion).
+
+        captures=False leaves out captures and promotions, quiets=False
+        everything else; origins restricts the moves to pieces on the squares
+        of that bitboard.
+        """
+        moves = []
+        bitboards = self.bitboards
+        offset = COLOR_OFFSET[color]
+        own = self.occupancy[color]
+        enemy = self.occupancy[OTHER_COLOR[color]]
+        occupied = own | enemy
+        empty = ~occupied & FULL
+        targets = (enemy if captures else 0) | (empty if quiets else 0)
+
+        # Pawns: pushes and captures are generated for all pawns at once
+        pawns = bitboards[offset + PAWN] & origins
+        direction, start_row = (-1, 6) if color == 'white' else (1, 1)
+        step = 8 * direction
+        single = shift(pawns, direction, 0) & empty
+        promotion_row = ROWS[start_row + 6 * direction]
+        if quiets:
+            double = shift(single & ROWS[start_row + direction], direction, 0) & empty
+            for square in iter_bits(single & ~promotion_row):
+                moves.append((POSITIONS[square - step], POSITIONS[square]))
+            for square in iter_bits(double):
+                moves.append((POSITIONS[square - 2 * step], POSITIONS[square]))
+        if captures:
+            capturable = enemy | self._en_passant_mask(color)
+            for dc in (-1, 1):
+                for square in iter_bits(shift(pawns, direction, dc) & capturable & ~promotion_row):
+                    moves.append((POSITIONS[square - step - dc], POSITIONS[square]))
+            for dc in (0, -1, 1):
+                landing = single if dc == 0 else shift(pawns, direction, dc) & capturable
+                for square in iter_bits(landing & promotion_row):
+                    start, end = POSITIONS[square - step - dc], POSITIONS[square]
+                    for promotion in PROMOTION_PIECES:
+                        moves.append((start, end, promotion))
+
+        # Knights
+        for square in iter_bits(bitboards[offset + KNIGHT] & origins):
+            self._append_moves(moves, square, KNIGHT_ATTACKS[square] & targets)
+
+        # Sliders: queens move along both bishop and rook lines
+        diagonal = (bitboards[offset + BISHOP] | bitboards[offset + QUEEN]) & origins
+        straight = (bitboards[offset + ROOK] | bitboards[offset + QUEEN]) & origins
+        for square in iter_bits(diagonal | straight):
+            bit = 1 << square
+            attacks = 0
+            if diagonal & bit:
+                attacks |= bishop_attacks(square, occupied)
+            if straight & bit:
+                attacks |= rook_attacks(square, occupied)
+            self._append_moves(moves, square, attacks & targets)
+
+        # King
+        for square in iter_bits(bitboards[offset + KING] & origins):
+            self._append_moves(moves, square, KING_ATTACKS[square] & targets)
+            if quiets:
+                moves.extend(self._castling_moves(color))
+        return moves
+
+    def is_pseudo_legal(self, move):
+        """
+        True if move is one of the side to move's pseudo-legal moves, e.g. to
+        validate a move taken from the transposition table.
+        """
+        row, col = move[0]
+        piece = self.grid[row][col]
+        if piece is None or piece.color != self.side_to_move:
+            return False
+        return move in self.get_pseudo_legal_moves(piece.color, origins=1 << (row * 8 + col))
+
+    def _append_moves(self, moves, start_square, attacks):
+        start = POSITIONS[start_square]
+        for square in iter_bits(attacks):
+            moves.append((start, POSITIONS[square]))
+
+    def _en_passant_mask(self, color):
+        """
+        Bitboard holding the square the given color may capture onto
+        en passant, or 0 if the last move was not an enemy double pawn push.
+        """
+        if self.last_move:
+            last_piece, last_start, last_end = self.last_move
+            if (last_piece.kind == PAWN and last_piece.color != color
+                    and abs(last_end[0] - last_start[0]) == 2):
+                row = (last_start[0] + last_end[0]) // 2
+                return 1 << (row * 8 + last_end[1])
+        return 0
+
+    def _castling_moves(self, color):
+        moves = []
+        if color == 'white':
+            row, kingside, queenside = 7, WHITE_KINGSIDE, WHITE_QUEENSIDE
+        else:
+            row, kingside, queenside = 0, BLACK_KINGSIDE, BLACK_QUEENSIDE
+        rights = self.castling & (kingside | queenside)
+        if not rights or self.is_in_check(color):
+            return moves
+        # (right, columns that must be empty, columns the king crosses)
+        for flag, between, crossed in ((kingside, (5, 6), (5, 6)), (queenside, (1, 2, 3), (3, 2))):
+            if not rights & flag:
+                continue
+            if any(self.squares[row * 8 + col] for col in between):
+                continue
+            if any(self.is_square_attacked((row, col), color) for col in crossed):
+                continue
+            moves.append(((row, 4), (row, crossed[1])))
+        return moves
+
+    def set_position(self, grid, side_to_move='white', castling=0, en_passant=None,
+                     halfmove_clock=0, fullmove_number=1):
+        """
+        Load a position from a grid of pieces, the side to move, a castling
+        rights bitmask and the column of the en passant square (or None).
+        has_moved flags and last_move are set to match, and the undo stack
+        is cleared. Raises ValueError, leaving the board unchanged, if no
+        double pawn push can have made the en passant square.
+        """
+        for row_index, row in enumerate(grid):
+            for piece in row:
+                if piece is not None:
+                    start_row = 6 if piece.color == 'white' else 1
+                    piece.has_moved = not (isinstance(piece, Pawn) and row_index == start_row)
+        for flag, row, rook_col in CASTLING_HOMES:
+            king, rook = grid[row][4], grid[row][rook_col]
+            if castling & flag and isinstance(king, King) and isinstance(rook, Rook):
+                king.has_moved = False
+                rook.has_moved = False
+        last_move = None
+        if en_passant is not None:
+            # Recreate the double push that made the en passant square available
+            start_row, end_row = (1, 3) if side_to_move == 'white' else (6, 4)
+            pawn = grid[end_row][en_passant]
+            passed = grid[(start_row + end_row) // 2][en_passant]
+            if (not isinstance(pawn, Pawn) or pawn.color == side_to_move
+                    or passed is not None or grid[start_row][en_passant] is not None):
+                raise ValueError("No double pawn push leads to the en passant square")
+            last_move = (pawn, (start_row, en_passant), (end_row, en_passant))
+        self.last_move = last_move
+        self.side_to_move = side_to_move
+        self.undo_stack = []
+        self.key_history = []
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.grid = grid
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Build a Board from a FEN string.
+        """
+        return cls(fen)
+
+    def set_fen(self, fen):
+        """
+        Load a position from a FEN string. The halfmove clock and fullmove
+        number fields are optional. Raises ValueError on malformed input.
+        """
+        fields = fen.split()
+        if len(fields) < 4 or fields[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        ranks = fields[0].split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN placement: {fen!r}")
+        grid = []
+        for rank in ranks:
+            layout = _FEN_RANKS.get(rank)
+            if layout is None:
+                layout = _parse_fen_rank(rank, fen)
+            grid.append([piece_class(color) if piece_class else None
+                         for piece_class, color in layout])
+        if fields[2] != '-' and set(fields[2]) - set('KQkq'):
+            raise ValueError(f"Invalid FEN castling rights: {fen!r}")
+        castling = 0
+        for letter, flag in FEN_CASTLING:
+            if letter in fields[2]:
+                castling |= flag
+        en_passant = None
+        if fields[3] != '-':
+            # The square behind a pawn that just moved two squares: rank 6
+            # when white is to move, rank 3 when black is
+            rank = '6' if fields[1] == 'w' else '3'
+            if len(fields[3]) != 2 or fields[3][0] not in 'abcdefgh' or fields[3][1] != rank:
+                raise ValueError(f"Invalid FEN en passant square: {fen!r}")
+            en_passant = 'abcdefgh'.index(fields[3][0])
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"Invalid FEN move counters: {fen!r}") from None
+        try:
+            self.set_position(grid, 'white' if fields[1] == 'w' else 'black', castling,
+                              en_passant, halfmove_clock, fullmove_number)
+        except ValueError as error:
+            raise ValueError(f"{error}: {fen!r}") from None
+
+    def to_fen(self):
+        """
+        Describe the position as a FEN string. The en passant square is
+        given after every double pawn push, as in the FEN standard.
+        """
+        ranks = []
+        for row in self._grid:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += piece.symbol
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        rights = self.castling
+        castling = ''.join(letter for letter, flag in FEN_CASTLING if rights & flag) or '-'
+        mask = self._en_passant_mask(self.side_to_move)
+        en_passant = '-'
+        if mask:
+            row, col = POSITIONS[mask.bit_length() - 1]
+            en_passant = 'abcdefgh'[col] + str(8 - row)
+        side = 'w' if self.side_to_move == 'white' else 'b'
+        return (f"{'/'.join(ranks)} {side} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def pack(self):
+        """
+        Serialize the position to 67 bytes: the 64 squares (0 for empty,
+        else 1 + piece code), then side to move, castling rights and en
+        passant column + 1 (0 for none). Cheap to send to worker processes
+        or keep by the million.
+        """
+        mask = self._en_passant_mask(self.side_to_move)
+        en_passant = (mask.bit_length() - 1) % 8 + 1 if mask else 0
+        side = 0 if self.side_to_move == 'white' else 1
+        return bytes(self.squares) + bytes((side, self.castling, en_passant))
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Build a Board from the output of pack.
+        """
+        grid = [[None for _ in range(8)] for _ in range(8)]
+        for square in range(64):
+            value = data[square]
+            if value:
+                code = value - 1
+                grid[square >> 3][square & 7] = PIECE_TYPES[code % 6]('white' if code < 6 else 'black')
+        side, castling, en_passant = data[64], data[65], data[66]
+        board = cls()
+        board.set_position(grid, 'black' if side else 'white', castling,
+                           en_passant - 1 if en_passant else None)
+        return board
+
     def display(self):
         """
         Display the board in the console with colors.
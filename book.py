@@ -0,0 +1,220 @@
+# book.py
+
+"""
+Opening book compiled to a binary file and looked up through mmap.
+
+compile_book() reads PGN games and EPD lines and writes one fixed-size
+record per (position, move), sorted by position key. Like a Polyglot
+book, every 16-byte record holds, big-endian:
+
+    key     8 bytes  Board.zobrist_key of the position
+    move    2 bytes  utils.encode_move
+    weight  2 bytes  how good the move looked in the source games
+    learn   4 bytes  free for the user, written as 0
+
+OpeningBook maps the file and finds a position's moves by binary search,
+so opening a book costs nothing and processes that use the same book
+share its pages through the OS cache instead of each building a dict.
+The keys are this program's own Zobrist keys, so third-party Polyglot
+books cannot be read.
+
+    python book.py games.pgn openings.epd --out book.bin --plies 20
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+
+from board import Board, STARTING_FEN
+from pgn import read_games
+from san import parse_san
+from utils import encode_move, decode_move, move_to_notation
+
+RECORD = struct.Struct('>QHHI')
+_KEY = struct.Struct('>Q')
+MAX_WEIGHT = 0xFFFF
+# Weight a game adds to each move of the side that won, drew or lost it
+WIN_WEIGHT, DRAW_WEIGHT, LOSS_WEIGHT = 2, 1, 0
+
+BookEntry = namedtuple('BookEntry', ['move', 'weight', 'learn'])
+
+
+def _add(weights, board, move, weight):
+    if weight:
+        entry = (board.zobrist_key, encode_move(move))
+        weights[entry] = weights.get(entry, 0) + weight
+
+
+def _collect_pgn(path, weights, plies):
+    """
+    Add the first plies moves of every game in a PGN file. A move is
+    weighted by how the game ended for the side that played it; games
+    stop at the first move that cannot be parsed.
+    """
+    for game in read_games(path):
+        by_color = {
+            '1-0': {'white': WIN_WEIGHT, 'black': LOSS_WEIGHT},
+            '0-1': {'white': LOSS_WEIGHT, 'black': WIN_WEIGHT},
+        }.get(game.result, {'white': DRAW_WEIGHT, 'black': DRAW_WEIGHT})
+        try:
+            board = Board.from_fen(game.headers.get('FEN', STARTING_FEN))
+            for san in game.moves[:plies]:
+                move = parse_san(board, san)
+                _add(weights, board, move, by_color[board.side_to_move])
+                board.make_move(move)
+        except ValueError:
+            continue
+
+
+def _collect_epd(path, weights):
+    """
+    Add the best moves ('bm' operation) of every line of an EPD file.
+    """
+    with open(path) as handle:
+        for line in handle:
+            fields = line.split(None, 4)
+            if len(fields) < 5:
+                continue
+            try:
+                board = Board.from_fen(' '.join(fields[:4]))
+                for operation in fields[4].split(';'):
+                    opcode, _, operands = operation.strip().partition(' ')
+                    if opcode == 'bm':
+                        for san in operands.split():
+                            _add(weights, board, parse_san(board, san), WIN_WEIGHT)
+            except ValueError:
+                continue
+
+
+def compile_book(sources, out, plies=20):
+    """
+    Compile PGN and EPD files (told apart by the .epd extension) into a
+    book file at out and return the number of records written. The file
+    is replaced in one step, so processes reading the old book are not
+    disturbed.
+    """
+    weights = {}
+    for path in sources:
+        if path.lower().endswith('.epd'):
+            _collect_epd(path, weights)
+        else:
+            _collect_pgn(path, weights, plies)
+    temporary = out + '.tmp'
+    with open(temporary, 'wb') as handle:
+        for (key, move), weight in sorted(weights.items()):
+            handle.write(RECORD.pack(key, move, min(weight, MAX_WEIGHT), 0))
+    os.replace(temporary, out)
+    return len(weights)
+
+
+class OpeningBook:
+    """
+    Read-only view of a compiled book file. Use as a context manager or
+    call close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % RECORD.size:
+            self._file.close()
+            raise ValueError(f"Not an opening book: {path!r}")
+        # Empty files cannot be mapped
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._count = size // RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def _first_record(self, key):
+        """
+        Index of the first record whose key is not below key.
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if _KEY.unpack_from(self._buffer, middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, key):
+        """
+        The BookEntry list stored for a position key.
+        """
+        entries = []
+        for index in range(self._first_record(key), self._count):
+            record_key, move, weight, learn = RECORD.unpack_from(self._buffer, index * RECORD.size)
+            if record_key != key:
+                break
+            entries.append(BookEntry(decode_move(move), weight, learn))
+        return entries
+
+    def moves(self, board):
+        """
+        BookEntry list for the position on board, heaviest first, keeping
+        only moves that are legal there (a key collision could bring in
+        moves of another position).
+        """
+        entries = self.lookup(board.zobrist_key)
+        if not entries:
+            return []
+        legal = board.get_all_possible_moves(board.side_to_move)
+        entries = [entry for entry in entries if entry.move in legal and entry.weight]
+        entries.sort(key=lambda entry: entry.weight, reverse=True)
+        return entries
+
+    def choose(self, board, rng=None):
+        """
+        A book move for board, or None. With rng (a random.Random) the
+        move is drawn in proportion to the weights, otherwise the heaviest
+        move is returned.
+        """
+        entries = self.moves(board)
+        if not entries:
+            return None
+        if rng is None:
+            return entries[0].move
+        return rng.choices([entry.move for entry in entries],
+                           [entry.weight for entry in entries])[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile PGN/EPD files into an opening book.")
+    parser.add_argument('sources', nargs='*', help="PGN files, or EPD files with 'bm' operations")
+    parser.add_argument('--out', required=True, help="book file to write (or read with --probe)")
+    parser.add_argument('--plies', type=int, default=20, help="plies taken from each PGN game")
+    parser.add_argument('--probe', metavar='FEN', help="list the book moves of a position instead")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        with OpeningBook(args.out) as book:
+            board = Board.from_fen(args.probe)
+            for entry in book.moves(board):
+                print(f"{move_to_notation(entry.move)} {entry.weight}")
+        return 0
+    if not args.sources:
+        parser.error("no PGN or EPD files given")
+    count = compile_book(args.sources, args.out, args.plies)
+    print(f"{count} book entries written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# engine.py
+
+"""
+Move search: negamax alpha-beta with iterative deepening and a
+quiescence search over captures and promotions. Moves are tried in the
+staged order of movepick.pick_moves, with killer moves and a history
+table learned during the search.
+"""
+
+import time
+from collections import namedtuple
+
+from evaluation import evaluate
+from movepick import is_capture, is_losing, mvv_lva, pick_moves
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE_SCORE = 100000
+# Scores beyond this are mates; the distance to mate is MATE_SCORE - abs(score)
+MATE_BOUND = MATE_SCORE - 1000
+MAX_PLY = 128
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'pv', 'nodes', 'seconds'])
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when a node or time limit is hit.
+    """
+
+
+def score_to_tt(score, ply):
+    """
+    Mate scores are stored relative to the node, not the root.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def tablebase_score(result, ply):
+    """
+    Search score at ply of a TablebaseResult: a mate score at the exact
+    distance, or 0 for a draw.
+    """
+    if result.wdl == 0:
+        return 0
+    score = MATE_SCORE - (ply + result.dtm)
+    return score if result.wdl > 0 else -score
+
+
+class Engine:
+    def __init__(self, evaluate=evaluate, hash_mb=16, tt=None, book=None, tablebase=None):
+        self.evaluate = evaluate
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+        # book.OpeningBook consulted before searching, or None
+        self.book = book
+        # tablebase.Tablebase probed at the root and inside the search, or None
+        self.tablebase = tablebase
+        self.nodes = 0
+        self._pv = [[] for _ in range(MAX_PLY + 1)]
+        # Two quiet moves per ply that recently caused a beta cutoff
+        self._killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        # Quiet move -> cutoff score, per color
+        self.history = {'white': {}, 'black': {}}
+        self._deadline = None
+        self._node_limit = None
+        # Set from another thread by stop() to end the current search
+        self.stopped = False
+
+    def search(self, board, depth=None, movetime=None, nodes=None, on_iteration=None):
+        """
+        Search the position for the side to move and return a SearchResult.
+
+        depth limits the iterative deepening depth, movetime the wall-clock
+        time in seconds and nodes the number of visited nodes. With no limit
+        at all the search stops at depth 4. on_iteration, if given, is called
+        with the SearchResult of every completed iteration. stop(), e.g.
+        from another thread, ends the search with the last completed
+        iteration. A move found in the opening book or the tablebase is
+        returned at once, with depth 0.
+        """
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                self.stopped = False
+                return SearchResult(move, 0, 0, [move], 0, 0.0)
+        if self.tablebase is not None:
+            known = self.tablebase.probe(board)
+            move = self.tablebase.best_move(board) if known is not None else None
+            if move is not None:
+                self.stopped = False
+                return SearchResult(move, tablebase_score(known, 0), 0, [move], 0, 0.0)
+        if depth is None:
+            depth = MAX_PLY if (movetime or nodes) else 4
+        start_time = time.perf_counter()
+        self._deadline = start_time + movetime if movetime else None
+        self._node_limit = nodes
+        self.nodes = 0
+        self.tt.new_search()
+        self._killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        for table in self.history.values():
+            # Keep some of what earlier searches learned, but let it fade
+            for move in table:
+                table[move] //= 8
+        root_moves = board.get_all_possible_moves(board.side_to_move)
+        result = SearchResult(root_moves[0] if root_moves else None,
+                              0, 0, root_moves[:1], 0, 0.0)
+        if not root_moves:
+            self.stopped = False
+            return result._replace(score=-MATE_SCORE if board.is_in_check(board.side_to_move) else 0)
+
+        root_depth = len(board.undo_stack)
+        for current_depth in range(1, depth + 1):
+            try:
+                score = self._search_root(board, root_moves, current_depth)
+            except SearchAborted:
+                # Unwind whatever the interrupted iteration left on the board
+                while len(board.undo_stack) > root_depth:
+                    board.unmake_move()
+                break
+            pv = list(self._pv[0])
+            result = SearchResult(pv[0], score, current_depth, pv, self.nodes,
+                                  time.perf_counter() - start_time)
+            if on_iteration is not None:
+                on_iteration(result)
+            # Search the best move first in the next iteration
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+            if abs(score) >= MATE_BOUND:
+                break
+        self.stopped = False
+        return result._replace(nodes=self.nodes, seconds=time.perf_counter() - start_time)
+
+    def stop(self):
+        """
+        Ask a running search to return as soon as possible.
+        """
+        self.stopped = True
+
+    def _check_limits(self):
+        if self.stopped:
+            raise SearchAborted()
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchAborted()
+        if self._deadline is not None and not self.nodes & 255:
+            if time.perf_counter() >= self._deadline:
+                raise SearchAborted()
+
+    def _search_root(self, board, root_moves, depth):
+        alpha, beta = -MATE_SCORE - 1, MATE_SCORE + 1
+        for move in root_moves:
+            board.make_move(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            board.unmake_move()
+            if score > alpha:
+                alpha = score
+                self._pv[0] = [move] + self._pv[1]
+        return alpha
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self._pv[ply] = []
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiescence(board, alpha, beta, ply)
+        self.nodes += 1
+        self._check_limits()
+        if ply > 0 and (board.halfmove_clock >= 100 or board.repetition_count() >= 2):
+            # Heading back into a position already on the board (or the
+            # 50-move rule) is scored as a draw
+            return 0
+        tablebase = self.tablebase
+        if tablebase is not None and bin(board.occupied).count('1') <= tablebase.max_pieces:
+            known = tablebase.probe(board)
+            if known is not None:
+                return tablebase_score(known, ply)
+
+        key = board.zobrist_key
+        entry = self.tt.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth:
+                score = score_from_tt(entry.score, ply)
+                if (entry.bound == EXACT or (entry.bound == LOWER and score >= beta)
+                        or (entry.bound == UPPER and score <= alpha)):
+                    return score
+
+        color = board.side_to_move
+        history = self.history[color]
+        killers = self._killers[ply]
+        best_move = None
+        legal_moves = 0
+        for move in pick_moves(board, hash_move, killers, history, legal=False):
+            board.make_move(move)
+            if board.is_in_check(color):
+                board.unmake_move()
+                continue
+            legal_moves += 1
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if score >= beta:
+                if not is_capture(board, move):
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    history[move] = history.get(move, 0) + depth * depth
+                self.tt.store(key, depth, score_to_tt(score, ply), LOWER, move)
+                return score
+            if score > alpha:
+                alpha = score
+                best_move = move
+                self._pv[ply] = [move] + self._pv[ply + 1]
+        if not legal_moves:
+            return -(MATE_SCORE - ply) if board.is_in_check(color) else 0
+        self.tt.store(key, depth, score_to_tt(alpha, ply),
+                      EXACT if best_move is not None else UPPER, best_move)
+        return alpha
+
+    def _quiescence(self, board, alpha, beta, ply):
+        self._pv[ply] = []
+        self.nodes += 1
+        self._check_limits()
+
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        color = board.side_to_move
+        captures = board.get_pseudo_legal_moves(color, quiets=False)
+        captures.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+        for move in captures:
+            if is_losing(board, move):
+                # Losing the exchange is almost never better than standing pat
+                continue
+            board.make_move(move)
+            if board.is_in_check(color):
+                board.unmake_move()
+                continue
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+                self._pv[ply] = [move] + self._pv[ply + 1]
+        return alpha
+
+
+def find_best_move(board, depth=None, movetime=None, nodes=None):
+    """
+    Convenience wrapper: search with a fresh Engine and return the best move.
+    """
+    return Engine().search(board, depth=depth, movetime=movetime, nodes=nodes).move
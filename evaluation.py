@@ -0,0 +1,158 @@
+# evaluation.py
+
+"""
+Tapered material and piece-square evaluation.
+
+Every piece contributes a midgame and an endgame value (material plus a
+piece-square bonus). Board keeps the running sums and the game phase up
+to date in Board._put, so evaluate() only blends two numbers.
+
+Tables are written from White's point of view with rank 8 on the first
+line, i.e. indexed by the same square numbers as Board.grid
+(square = row * 8 + col). Black pieces use the vertically mirrored
+square (square ^ 56).
+"""
+
+from bitboard import iter_bits
+
+# Material, indexed by piece type (pawn, knight, bishop, rook, queen, king)
+MG_VALUES = [82, 337, 365, 477, 1025, 0]
+EG_VALUES = [94, 281, 297, 512, 936, 0]
+
+# Phase weight per piece type; 24 is the full opening phase
+PHASE_WEIGHTS = [0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+MG_PAWN = [
+    0,   0,   0,   0,   0,   0,   0,   0,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    10,  10,  20,  30,  30,  20,  10,  10,
+    5,   5,  10,  25,  25,  10,   5,   5,
+    0,   0,   0,  20,  20,   0,   0,   0,
+    5,  -5, -10,   0,   0, -10,  -5,   5,
+    5,  10,  10, -20, -20,  10,  10,   5,
+    0,   0,   0,   0,   0,   0,   0,   0,
+]
+EG_PAWN = [
+    0,   0,   0,   0,   0,   0,   0,   0,
+    80,  80,  80,  80,  80,  80,  80,  80,
+    50,  50,  50,  50,  50,  50,  50,  50,
+    30,  30,  30,  30,  30,  30,  30,  30,
+    15,  15,  15,  15,  15,  15,  15,  15,
+    5,   5,   5,   5,   5,   5,   5,   5,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+]
+KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+MG_ROOK = [
+    0,   0,   0,   0,   0,   0,   0,   0,
+    5,  10,  10,  10,  10,  10,  10,   5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    -5,   0,   0,   0,   0,   0,   0,  -5,
+    0,   0,   0,   5,   5,   0,   0,   0,
+]
+EG_ROOK = [
+    5,   5,   5,   5,   5,   5,   5,   5,
+    10,  10,  10,  10,  10,  10,  10,  10,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+    0,   0,   0,   0,   0,   0,   0,   0,
+]
+QUEEN = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+    -5,   0,   5,   5,   5,   5,   0,  -5,
+    0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+MG_KING = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20,  20,   0,   0,   0,   0,  20,  20,
+    20,  30,  10,   0,   0,  10,  30,  20,
+]
+EG_KING = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+MG_TABLES = [MG_PAWN, KNIGHT, BISHOP, MG_ROOK, QUEEN, MG_KING]
+EG_TABLES = [EG_PAWN, KNIGHT, BISHOP, EG_ROOK, QUEEN, EG_KING]
+
+
+def _signed_tables(values, tables):
+    """
+    Per piece index (as in bitboard.PIECE_SYMBOLS) and square: material
+    plus piece-square bonus, positive for White and negative for Black.
+    """
+    white = [[values[kind] + tables[kind][square] for square in range(64)] for kind in range(6)]
+    black = [[-values[kind] - tables[kind][square ^ 56] for square in range(64)] for kind in range(6)]
+    return white + black
+
+
+# MG_SCORES[piece_index][square] / EG_SCORES[piece_index][square]
+MG_SCORES = _signed_tables(MG_VALUES, MG_TABLES)
+EG_SCORES = _signed_tables(EG_VALUES, EG_TABLES)
+# PHASES[piece_index]
+PHASES = PHASE_WEIGHTS + PHASE_WEIGHTS
+
+
+def full_scores(bitboards):
+    """
+    Recompute (midgame, endgame, phase) from scratch. Board keeps these
+    incrementally; this is the reference the tests check them against.
+    """
+    mg = eg = phase = 0
+    for index, bb in enumerate(bitboards):
+        for square in iter_bits(bb):
+            mg += MG_SCORES[index][square]
+            eg += EG_SCORES[index][square]
+            phase += PHASES[index]
+    return mg, eg, phase
+
+
+def evaluate(board):
+    """
+    Tapered evaluation in centipawns from the side to move's point of view.
+    """
+    phase = min(board.phase, MAX_PHASE)
+    score = int((board.mg_score * phase + board.eg_score * (MAX_PHASE - phase)) / MAX_PHASE)
+    return score if board.side_to_move == 'white' else -score
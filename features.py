@@ -0,0 +1,159 @@
+# features.py
+
+"""
+Batch position encoding and evaluation with NumPy, for dataset work.
+
+encode() serializes any number of positions with Board.pack and turns
+the bytes into arrays in one step, so nothing walks Board.grid square by
+square. Positions can be FEN strings, Boards, or the (board, move) pairs
+that pgn.replay yields; pgn_positions() streams every position of a PGN
+file. planes() expands a batch into 12 x 64 one-hot piece planes and
+evaluate_batch() runs the tapered evaluation of evaluation.py over the
+whole batch with array operations.
+
+NumPy is only needed here; the functions raise ImportError without it.
+
+    python features.py games.pgn --out positions.npz
+"""
+
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from board import Board
+from evaluation import MG_SCORES, EG_SCORES, PHASES, MAX_PHASE
+from pgn import read_games, replay
+
+# Length of Board.pack(): 64 squares, side to move, castling rights, en passant column + 1
+PACKED_SIZE = 67
+
+# squares: (N, 64) uint8, 0 for empty, else 1 + the index in bitboard.PIECE_SYMBOLS
+# side: (N,) uint8, 0 for white to move, 1 for black
+# castling: (N, 4) uint8 flags for K, Q, k and q castling
+# en_passant: (N,) int8 column of the en passant square, -1 for none
+EncodedBatch = namedtuple('EncodedBatch', ['squares', 'side', 'castling', 'en_passant'])
+
+_tables = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("features.py needs NumPy (pip install numpy)")
+
+
+def _evaluation_tables():
+    """
+    MG_SCORES, EG_SCORES and PHASES as arrays indexed by square value
+    (0 for empty, else 1 + piece index), built on first use.
+    """
+    global _tables
+    if _tables is None:
+        mg = np.zeros((13, 64), dtype=np.int32)
+        eg = np.zeros((13, 64), dtype=np.int32)
+        mg[1:] = MG_SCORES
+        eg[1:] = EG_SCORES
+        phases = np.array([0] + PHASES, dtype=np.int32)
+        _tables = (mg, eg, phases)
+    return _tables
+
+
+def _boards(positions):
+    for position in positions:
+        if isinstance(position, str):
+            yield Board.from_fen(position)
+        elif isinstance(position, tuple):
+            yield position[0]
+        else:
+            yield position
+
+
+def pgn_positions(source):
+    """
+    Yield the board after every move of every game in source (a path,
+    file or buffer, as for pgn.read_games). The same Board object is
+    reused within a game, so encode the positions as they come. Games
+    with an illegal move are cut off there.
+    """
+    for game in read_games(source):
+        try:
+            for board, _ in replay(game):
+                yield board
+        except ValueError:
+            continue
+
+
+def encode(positions):
+    """
+    EncodedBatch of an iterable of FEN strings, Boards or (board, move)
+    pairs. Only the packed 67 bytes of each position are kept while the
+    iterable is consumed.
+    """
+    _require_numpy()
+    packed = bytearray()
+    for board in _boards(positions):
+        packed += board.pack()
+    data = np.frombuffer(bytes(packed), dtype=np.uint8).reshape(-1, PACKED_SIZE)
+    castling = data[:, 65]
+    return EncodedBatch(
+        squares=data[:, :64],
+        side=data[:, 64],
+        castling=np.stack([(castling >> bit) & 1 for bit in range(4)], axis=1).astype(np.uint8),
+        en_passant=data[:, 66].astype(np.int8) - 1,
+    )
+
+
+def planes(batch):
+    """
+    (N, 12, 64) uint8 one-hot planes, one per piece in the order of
+    bitboard.PIECE_SYMBOLS.
+    """
+    _require_numpy()
+    codes = np.arange(1, 13, dtype=np.uint8)[None, :, None]
+    return (batch.squares[:, None, :] == codes).astype(np.uint8)
+
+
+def evaluate_batch(batch):
+    """
+    evaluation.evaluate of every position in the batch, in centipawns
+    from the side to move's point of view, as an (N,) int32 array.
+    """
+    _require_numpy()
+    mg_table, eg_table, phase_table = _evaluation_tables()
+    squares = batch.squares.astype(np.intp)
+    columns = np.arange(64)
+    mg = mg_table[squares, columns].sum(axis=1, dtype=np.int64)
+    eg = eg_table[squares, columns].sum(axis=1, dtype=np.int64)
+    phase = np.minimum(phase_table[squares].sum(axis=1), MAX_PHASE)
+    # int() in evaluate truncates towards zero
+    score = np.trunc((mg * phase + eg * (MAX_PHASE - phase)) / MAX_PHASE).astype(np.int32)
+    return np.where(batch.side == 0, score, -score)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode the positions of PGN games as NumPy arrays.")
+    parser.add_argument('pgn', help="PGN file to read")
+    parser.add_argument('--out', required=True, help="write the arrays to this .npz file")
+    args = parser.parse_args(argv)
+    try:
+        _require_numpy()
+    except ImportError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    batch = encode(pgn_positions(args.pgn))
+    scores = evaluate_batch(batch)
+    seconds = time.perf_counter() - start
+    np.savez_compressed(args.out, evaluation=scores, **batch._asdict())
+    print(f"{len(scores)} positions in {seconds:.2f}s"
+          f" ({int(len(scores) / seconds) if seconds else 0} positions/s) written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,16 @@
-from board import Board
+from board import Board, PROMOTION_PIECES, DRAW_REASONS
+from pieces import Pawn
 from utils import notation_to_index, index_to_notation
 
 
 class Game:
-    def __init__(self, board=None):
-        print(f"Initializing Game with board: {board}")
+    def __init__(self, board=None, verbose=True, tablebase=None):
         self.board = board if board else Board()
-        self.current_player = 'white'
+        self.current_player = self.board.side_to_move
+        # Console front end; with verbose=False the game never prints
+        self.verbose = verbose
+        # tablebase.Tablebase that adjudicates endings it covers, or None
+        self.tablebase = tablebase
 
     def switch_player(self):
         self.current_player = 'black' if self.current_player == 'white' else 'white'
@@ -14,21 +18,53 @@ class Game:
     def opponent_color(self):
         return 'black' if self.current_player == 'white' else 'white'
 
+    def status(self):
+        """
+        GameStatus of the player to move.
+        """
+        return self.board.game_status(self.current_player)
+
     def is_game_over(self):
         """
-        Check for checkmate or stalemate.
+        Check for checkmate, stalemate, repetition and the 50/75-move rules.
+        With a tablebase, an ending it covers is over as soon as it is reached.
         """
-        if self.board.is_in_check(self.current_player):
-            possible_moves = self.board.get_all_possible_moves(self.current_player)
-            if not possible_moves:
-                print(f"Checkmate! {self.opponent_color()} wins!")
-                return True
-        else:
-            possible_moves = self.board.get_all_possible_moves(self.current_player)
-            if not possible_moves:
+        status = self.status()
+        if status.state == 'ongoing':
+            return self._adjudicate()
+        if self.verbose:
+            if status.state == 'checkmate':
+                print(f"Checkmate! {status.winner} wins!")
+            elif status.state == 'stalemate':
                 print("Stalemate!")
-                return True
-        return False
+            else:
+                print(f"Draw by {DRAW_REASONS[status.state]}!")
+        return True
+
+    def _adjudicate(self):
+        if self.tablebase is None:
+            return False
+        result = self.tablebase.probe(self.board)
+        if result is None:
+            return False
+        if self.verbose:
+            if result.wdl == 0:
+                print("Tablebase draw!")
+            else:
+                side = self.board.side_to_move
+                winner = side if result.wdl > 0 else ('black' if side == 'white' else 'white')
+                print(f"{winner} wins: the tablebase gives mate in {(result.dtm + 1) // 2} moves!")
+        return True
+
+    def ask_promotion(self):
+        """
+        Prompt until the player picks a promotion piece.
+        """
+        while True:
+            choice = input("Promote pawn to (Q, R, B, N): ").strip().upper()
+            if choice in PROMOTION_PIECES:
+                return choice
+            print("Invalid choice. Please choose Q, R, B, or N.")
 
     def play_turn(self):
         """
@@ -46,21 +82,11 @@ class Game:
             if start_pos:
                 piece = self.board.get_piece_at(start_pos)
                 if piece and piece.color == self.current_player:
-                    # Get possible moves for the piece
-                    possible_moves = piece.get_possible_moves(start_pos, self.board)
-                    # Filter out moves that would leave the king in check
+                    # Legal destinations of this piece (promotions are listed once)
                     legal_moves = []
-                    for end_pos in possible_moves:
-                        # Simulate the move
-                        captured_piece = self.board.get_piece_at(end_pos)
-                        self.board.set_piece_at(end_pos, piece)
-                        self.board.set_piece_at(start_pos, None)
-                        in_check = self.board.is_in_check(self.current_player)
-                        # Undo the move
-                        self.board.set_piece_at(start_pos, piece)
-                        self.board.set_piece_at(end_pos, captured_piece)
-                        if not in_check:
-                            legal_moves.append(end_pos)
+                    for move in self.board.get_all_possible_moves(self.current_player):
+                        if move[0] == start_pos and move[1] not in legal_moves:
+                            legal_moves.append(move[1])
                     if not legal_moves:
                         print("No legal moves available for this piece. Please choose another piece.")
                         continue
@@ -73,7 +99,10 @@ class Game:
                         exit()
                     end_pos = notation_to_index(end_notation)
                     if end_pos and end_pos in legal_moves:
-                        if self.board.move_piece(start_pos, end_pos):
+                        promotion = 'Q'
+                        if isinstance(piece, Pawn) and end_pos[0] in (0, 7):
+                            promotion = self.ask_promotion()
+                        if self.board.move_piece(start_pos, end_pos, promotion):
                             valid_move = True
                         else:
                             print("Invalid move. Try again.")
@@ -0,0 +1,157 @@
+# loadtest.py
+
+"""
+Load-test client for server.py.
+
+Opens a number of connections, plays random legal moves in many
+concurrent games on each of them and reports throughput and round-trip
+move latency percentiles, next to the server's own figures.
+
+    python loadtest.py --port 8765 --connections 20 --games 50 --plies 40
+
+Without --port an in-process server is started on a free local port.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+from server import GameServer, percentiles
+
+
+class Client:
+    """
+    One connection; replies are matched to requests by their id, so many
+    games can share it.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self._ids = itertools.count(1)
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            future = self.pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def request(self, **request):
+        request['id'] = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request['id']] = future
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.write_eof()
+        # The server closes its end once it has seen ours
+        await self._listener
+        self.writer.close()
+
+
+async def play_game(client, plies, rng, latencies):
+    """
+    Play up to plies random legal moves in a new game and close it.
+    Returns the number of moves played.
+    """
+    state = await client.request(cmd='new', legal=True)
+    game_id = state['game']
+    played = 0
+    while played < plies and state['status'] == 'ongoing' and state['legal']:
+        move = rng.choice(state['legal'])
+        start = time.perf_counter()
+        state = await client.request(cmd='move', game=game_id, move=move, legal=True)
+        latencies.append(time.perf_counter() - start)
+        if state['type'] != 'state':
+            raise RuntimeError(f"Move {move} rejected: {state.get('error')}")
+        played += 1
+    await client.request(cmd='close', game=game_id)
+    return played
+
+
+async def run(host='127.0.0.1', port=None, connections=10, games=10, plies=40, seed=0):
+    """
+    Run the load test and return a summary dict. Starts an in-process
+    server when port is None.
+    """
+    server = None
+    if port is None:
+        server = await GameServer().start(host, 0)
+        port = server.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    latencies = []
+    clients = [await Client.connect(host, port) for _ in range(connections)]
+    start = time.perf_counter()
+    try:
+        played = await asyncio.gather(*[
+            play_game(client, plies, random.Random(rng.random()), latencies)
+            for client in clients for _ in range(games)
+        ])
+        seconds = time.perf_counter() - start
+        server_stats = await clients[0].request(cmd='stats')
+    finally:
+        for client in clients:
+            await client.close()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    moves = sum(played)
+    return {
+        'connections': connections,
+        'games': connections * games,
+        'moves': moves,
+        'seconds': round(seconds, 3),
+        'moves_per_second': int(moves / seconds) if seconds else 0,
+        'latency_ms': percentiles(latencies),
+        'server_latency_ms': server_stats['latency_ms'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the chess game server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help="server port (default: start a server in this process)")
+    parser.add_argument('--connections', type=int, default=10)
+    parser.add_argument('--games', type=int, default=10, help="concurrent games per connection")
+    parser.add_argument('--plies', type=int, default=40, help="maximum moves per game")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args.host, args.port, args.connections, args.games,
+                              args.plies, args.seed))
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{summary['games']} games over {summary['connections']} connections:"
+              f" {summary['moves']} moves in {summary['seconds']}s"
+              f" ({summary['moves_per_second']} moves/s)")
+        for label, key in (('round trip', 'latency_ms'), ('server', 'server_latency_ms')):
+            figures = ', '.join(f"{name} {value}ms" for name, value in summary[key].items())
+            print(f"{label:>10}: {figures}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# movepick.py
+
+"""
+Staged, lazy move picking.
+
+pick_moves() yields the moves of the side to move best-first in stages,
+generating and ordering each stage only when the previous one is used up:
+
+    1. the hash move
+    2. captures and queen promotions that do not lose material by static
+       exchange evaluation, most valuable victim first
+    3. killer moves (quiet moves that caused a cutoff at the same ply)
+    4. the remaining quiet moves, by history score
+    5. losing captures
+    6. underpromotions
+
+A caller that stops after the first move or two (a cutoff, or looking for
+any legal move) never generates or sorts the later stages.
+"""
+
+from bitboard import PAWN
+
+# Material values for move ordering, indexed by piece kind (bitboard.PAWN .. bitboard.KING)
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+PROMOTION_VALUES = {'Q': 900, 'R': 500, 'B': 330, 'N': 320}
+
+
+def is_capture(board, move):
+    """
+    True for captures (including en passant) and promotions, the moves
+    searched by quiescence.
+    """
+    start, end = move[0], move[1]
+    if len(move) > 2 or board.get_piece_at(end) is not None:
+        return True
+    return board.get_piece_at(start).kind == PAWN and start[1] != end[1]
+
+
+def mvv_lva(board, move):
+    """
+    Most valuable victim, least valuable attacker ordering key (higher first).
+    """
+    start, end = move[0], move[1]
+    victim = board.get_piece_at(end)
+    attacker = board.get_piece_at(start)
+    # En passant captures a pawn that is not on the target square
+    victim_value = PIECE_VALUES[victim.kind] if victim else PIECE_VALUES[PAWN]
+    score = victim_value * 10 - PIECE_VALUES[attacker.kind]
+    if len(move) > 2:
+        score += PROMOTION_VALUES[move[2]] * 10
+    return score
+
+
+def is_losing(board, move):
+    """
+    True if move loses material by static exchange evaluation. Taking a
+    piece worth at least as much as the capturer never does, which saves
+    most of the evaluations.
+    """
+    victim = board.get_piece_at(move[1])
+    if (victim is not None and len(move) == 2
+            and PIECE_VALUES[victim.kind] >= PIECE_VALUES[board.get_piece_at(move[0]).kind]):
+        return False
+    return board.see(move) < 0
+
+
+def pick_moves(board, hash_move=None, killers=(), history=None, legal=True):
+    """
+    Yield the moves of the side to move in staged order. history maps
+    quiet moves to scores (higher first). With legal=True each move is
+    checked for leaving the king in check just before it is yielded;
+    with legal=False pseudo-legal moves are yielded and the caller checks
+    after making them.
+    """
+    color = board.side_to_move
+
+    def playable(move):
+        if not legal:
+            return True
+        board.make_move(move)
+        in_check = board.is_in_check(color)
+        board.unmake_move()
+        return not in_check
+
+    if hash_move is not None and board.is_pseudo_legal(hash_move) and playable(hash_move):
+        yield hash_move
+
+    tactical = board.get_pseudo_legal_moves(color, quiets=False)
+    captures, losing, underpromotions = [], [], []
+    for move in tactical:
+        if move == hash_move:
+            continue
+        if len(move) > 2 and move[2] != 'Q':
+            underpromotions.append(move)
+        elif is_losing(board, move):
+            losing.append(move)
+        else:
+            captures.append(move)
+    captures.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+    for move in captures:
+        if playable(move):
+            yield move
+
+    quiets = board.get_pseudo_legal_moves(color, captures=False)
+    searched_killers = []
+    for killer in killers:
+        if killer is not None and killer != hash_move and killer in quiets:
+            searched_killers.append(killer)
+            if playable(killer):
+                yield killer
+
+    rest = [move for move in quiets if move != hash_move and move not in searched_killers]
+    if history:
+        rest.sort(key=lambda move: history.get(move, 0), reverse=True)
+    for move in rest:
+        if playable(move):
+            yield move
+
+    losing.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+    for move in losing:
+        if playable(move):
+            yield move
+
+    for move in underpromotions:
+        if playable(move):
+            yield move
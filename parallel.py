@@ -0,0 +1,73 @@
+# parallel.py
+
+"""
+Parallel perft across a process pool.
+
+The tree is split into subtrees a few plies below the root. Each task is
+the packed root position plus the move path to one subtree, so workers
+receive a few dozen bytes and rebuild the position themselves. Subtree
+counts are summed per root move.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board
+
+
+def _subtree_perft(task):
+    packed, path, depth = task
+    board = Board.unpack(packed)
+    for move in path:
+        board.make_move(move)
+    return board.perft(depth)
+
+
+def _split(board, split_depth, path=()):
+    """
+    Yield the move paths of length split_depth (or shorter where the game
+    ends earlier) from the current position.
+    """
+    if len(path) == split_depth:
+        yield path
+        return
+    moves = board.get_all_possible_moves(board.side_to_move)
+    if not moves:
+        yield path
+        return
+    for move in moves:
+        board.make_move(move)
+        yield from _split(board, split_depth, path + (move,))
+        board.unmake_move()
+
+
+def parallel_divide(board, depth, workers=None, chunksize=1, split_depth=1):
+    """
+    Like Board.divide, but with the subtrees counted in worker processes.
+
+    workers defaults to the number of CPUs. split_depth is how many plies
+    below the root the tree is cut into tasks: 1 gives one task per root
+    move, 2 gives a few hundred smaller tasks that balance better across
+    many cores. chunksize is the number of tasks sent to a worker at once.
+    """
+    if depth < 1:
+        return {}
+    split_depth = max(1, min(split_depth, depth))
+    packed = board.pack()
+    paths = list(_split(board, split_depth))
+    tasks = [(packed, path, depth - len(path)) for path in paths]
+    counts = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for path, nodes in zip(paths, pool.map(_subtree_perft, tasks, chunksize=chunksize)):
+            if path:
+                counts[path[0]] = counts.get(path[0], 0) + nodes
+    return counts
+
+
+def parallel_perft(board, depth, workers=None, chunksize=1, split_depth=1):
+    """
+    Like Board.perft, but spread over a process pool.
+    """
+    if depth < 1:
+        return 1
+    return sum(parallel_divide(board, depth, workers, chunksize, split_depth).values())
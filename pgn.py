@@ -0,0 +1,220 @@
+# pgn.py
+
+"""
+Streaming PGN reader and batch replayer.
+
+read_games() pulls a file, file object or memory-mapped buffer through in
+fixed-size chunks and yields one PgnGame at a time, so memory stays
+bounded by the longest game rather than the archive size. replay()
+applies a game's SAN moves to a Board without printing anything.
+format_game() writes a game back out as PGN text.
+
+    python pgn.py games.pgn
+"""
+
+import codecs
+import mmap
+import re
+import sys
+import time
+from collections import namedtuple
+
+from board import Board, STARTING_FEN
+from san import parse_san
+
+PgnGame = namedtuple('PgnGame', ['headers', 'moves', 'result'])
+# board is None if the game's FEN tag could not be loaded
+ReplayResult = namedtuple('ReplayResult', ['game', 'board', 'error'])
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+_TAG_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+# Comments, line comments, NAGs, move numbers and everything else
+_TOKEN_PATTERN = re.compile(r'\{[^}]*\}?|;[^\n]*|\$\d+|\d+\.+|\(|\)|[^\s(){};]+')
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+        return
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_lines(source, chunk_size):
+    """
+    Yield decoded lines from a binary or text source, reading chunk_size
+    bytes at a time.
+    """
+    # An incremental decoder keeps multi-byte characters split across chunks intact
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    for chunk in _iter_chunks(source, chunk_size):
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        pending += chunk
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if pending:
+        yield pending.rstrip('\r')
+
+
+def _parse_movetext(text):
+    """
+    Split movetext into SAN moves and the result token, skipping comments,
+    NAGs, move numbers and (nested) variations.
+    """
+    moves = []
+    result = None
+    depth = 0
+    for token in _TOKEN_PATTERN.findall(text):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif depth or token[0] in '{;$' or token[0].isdigit() and token.endswith('.'):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return moves, result
+
+
+def read_games(source, chunk_size=1 << 16):
+    """
+    Yield a PgnGame (headers dict, list of SAN moves, result) for every game
+    in source: a path, an open file (text or binary) or an in-memory or
+    memory-mapped buffer.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as handle:
+            try:
+                buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty files cannot be mapped
+                return
+            with buffer:
+                yield from read_games(buffer, chunk_size)
+        return
+
+    headers = {}
+    movetext = []
+    open_comments = 0
+    for line in _iter_lines(source, chunk_size):
+        stripped = line.strip()
+        match = None
+        if stripped.startswith('[') and not open_comments:
+            match = _TAG_PATTERN.match(stripped)
+        if match:
+            if movetext:
+                # A new tag section starts the next game
+                yield _make_game(headers, movetext)
+                headers, movetext = {}, []
+            headers[match.group(1)] = match.group(2).replace('\\"', '"')
+        elif stripped and not stripped.startswith('%'):
+            movetext.append(stripped)
+            open_comments += stripped.count('{') - stripped.count('}')
+            if not open_comments and stripped.split()[-1] in RESULTS:
+                yield _make_game(headers, movetext)
+                headers, movetext = {}, []
+    if headers or movetext:
+        yield _make_game(headers, movetext)
+
+
+def _make_game(headers, movetext):
+    moves, result = _parse_movetext(' '.join(movetext))
+    return PgnGame(headers, moves, result or headers.get('Result', '*'))
+
+
+def replay(game, board=None):
+    """
+    Apply a PgnGame's moves to board (by default the position from its FEN
+    tag, or the start position), yielding (board, move) after every ply.
+    Raises ValueError on an illegal, ambiguous or malformed move.
+    """
+    if board is None:
+        board = Board.from_fen(game.headers.get('FEN', STARTING_FEN))
+    for san in game.moves:
+        move = parse_san(board, san)
+        board.make_move(move)
+        yield board, move
+
+
+def replay_games(source, chunk_size=1 << 16):
+    """
+    Replay every game in source, yielding a ReplayResult with the final
+    board, or the ValueError that stopped the game. A game with an invalid
+    FEN tag has no board.
+    """
+    for game in read_games(source, chunk_size):
+        try:
+            board = Board.from_fen(game.headers.get('FEN', STARTING_FEN))
+        except ValueError as error:
+            yield ReplayResult(game, None, error)
+            continue
+        try:
+            for _ in replay(game, board):
+                pass
+        except ValueError as error:
+            yield ReplayResult(game, board, error)
+        else:
+            yield ReplayResult(game, board, None)
+
+
+def format_game(headers, moves, result, width=80):
+    """
+    PGN text for a game: the tag section (headers in the order given) and
+    SAN moves, wrapped to width columns, followed by a blank line.
+    """
+    tags = []
+    for name, value in headers.items():
+        escaped = str(value).replace('"', '\\"')
+        tags.append(f'[{name} "{escaped}"]')
+    tokens = []
+    for ply, san in enumerate(moves):
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        tokens.append(san)
+    tokens.append(result)
+    lines, line = [], ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(tags) + '\n\n' + '\n'.join(lines) + '\n\n'
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("usage: python pgn.py FILE.pgn [FILE.pgn ...]")
+        return 2
+    games = plies = errors = 0
+    start = time.perf_counter()
+    for path in paths:
+        for result in replay_games(path):
+            games += 1
+            if result.board is not None:
+                plies += len(result.board.undo_stack)
+            if result.error is not None:
+                errors += 1
+                event = result.game.headers.get('Event', '?')
+                print(f"{path}: game {games} ({event}): {result.error}")
+    seconds = time.perf_counter() - start
+    print(f"{games} games, {plies} plies, {errors} errors in {seconds:.2f}s"
+          f" ({int(plies / seconds) if seconds else 0} plies/s)")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
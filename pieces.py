@@ -1,9 +1,18 @@
 # pieces.py
 
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, COLOR_OFFSET
+
 class Piece:
+    # Fixed attributes keep pieces small; subclasses add none of their own
+    __slots__ = ('color', 'symbol', 'code', 'has_moved')
+    kind = None   # PAWN .. KING from bitboard, set in subclasses
+    letter = ' '  # White symbol, set in subclasses
+
     def __init__(self, color):
         self.color = color  # 'white' or 'black'
-        self.symbol = ' '   # Will be set in subclasses
+        self.symbol = self.letter if color == 'white' else self.letter.lower()
+        # Index into bitboard.PIECE_SYMBOLS, e.g. 0 for 'P' and 11 for 'k'
+        self.code = self.kind + COLOR_OFFSET[color]
         self.has_moved = False  # Track if the piece has moved (for special moves)
 
     def get_possible_moves(self, position, board):
@@ -14,9 +23,9 @@ class Piece:
         raise NotImplementedError
 
 class Pawn(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'P' if color == 'white' else 'p'
+    __slots__ = ()
+    kind = PAWN
+    letter = 'P'
 
     def get_possible_moves(self, position, board):
         moves = []
@@ -57,9 +66,9 @@ class Pawn(Piece):
         return moves
 
 class Knight(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'N' if color == 'white' else 'n'
+    __slots__ = ()
+    kind = KNIGHT
+    letter = 'N'
 
     def get_possible_moves(self, position, board):
         moves = []
@@ -79,9 +88,9 @@ class Knight(Piece):
         return moves
 
 class Bishop(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'B' if color == 'white' else 'b'
+    __slots__ = ()
+    kind = BISHOP
+    letter = 'B'
 
     def get_possible_moves(self, position, board):
         return self._get_linear_moves(position, board, [(-1, -1), (-1, 1), (1, -1), (1, 1)])
@@ -105,9 +114,9 @@ class Bishop(Piece):
         return moves
 
 class Rook(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'R' if color == 'white' else 'r'
+    __slots__ = ()
+    kind = ROOK
+    letter = 'R'
 
     def get_possible_moves(self, position, board):
         return self._get_linear_moves(position, board, [(-1, 0), (1, 0), (0, -1), (0, 1)])
@@ -132,9 +141,9 @@ class Rook(Piece):
         return moves
 
 class Queen(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'Q' if color == 'white' else 'q'
+    __slots__ = ()
+    kind = QUEEN
+    letter = 'Q'
 
     def get_possible_moves(self, position, board):
         directions = [(-1, -1), (-1, 1), (1, -1), (1, 1),
@@ -161,9 +170,9 @@ class Queen(Piece):
         return moves
 
 class King(Piece):
-    def __init__(self, color):
-        super().__init__(color)
-        self.symbol = 'K' if color == 'white' else 'k'
+    __slots__ = ()
+    kind = KING
+    letter = 'K'
 
     def get_possible_moves(self, position, board):
         moves = []
@@ -205,6 +214,8 @@ class King(Piece):
                 if board.is_square_attacked((row, check_col), self.color):
                     break
             else:
-                # All squares are clear and not under attack
-                moves.append((row, col + step * 2))
+                # All squares are clear and not under attack; queenside also
+                # needs the square next to the rook to be empty
+                if kingside or board.is_empty((row, col - 3)):
+                    moves.append((row, col + step * 2))
         return moves
@@ -0,0 +1,340 @@
+# profiling.py
+
+"""
+Opt-in counters and timers for the board, the move generators and the
+search.
+
+enable() replaces the hot methods of Board, TranspositionTable and
+Engine with instrumented versions, and disable() puts the originals
+back. While profiling is off nothing is checked anywhere, so it costs
+nothing. While it is on it counts:
+
+    calls                 calls of each instrumented method
+    piece_moves           pseudo-legal moves generated per piece type
+    legality_rejections   pseudo-legal moves found to leave the king in check
+    nodes                 nodes visited by Engine.search, running searches included
+    tt_hits               transposition table probes that found an entry
+
+and the time spent in each phase of PHASES. A phase's time excludes the
+time spent in other instrumented calls made from it, so the phases add
+up to the profiled time. snapshot() returns all of it as a ProfileStats;
+SnapshotWriter saves a snapshot as JSON every few seconds. Only the
+current process is profiled, not the workers of parallel.py or the
+tablebase generator.
+
+    python profiling.py --depth 4
+    python profiling.py --fen "<FEN>" --perft 3 --json
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from board import Board, STARTING_FEN
+from engine import Engine
+from transposition import TranspositionTable
+
+# Indexed by piece kind (bitboard.PAWN .. bitboard.KING)
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+PHASES = ('search', 'evaluation', 'move_generation', 'legality', 'attacks', 'make_unmake', 'hash')
+
+ProfileStats = namedtuple('ProfileStats', [
+    'seconds', 'nodes', 'calls', 'piece_moves', 'legality_rejections', 'tt_hits', 'times',
+])
+
+_calls = {}
+_piece_moves = {}
+_counts = {}
+_times = {}
+_started = 0.0
+# (class, name, original function) of every replaced method while enabled
+_originals = []
+# Engines searching right now; snapshot() adds their node counts so far
+_searching = set()
+_searching_lock = threading.Lock()
+# Per thread: time spent in instrumented calls made by each running one
+_frames = threading.local()
+
+
+def _instrument(function, name, counter, phase):
+    """
+    function counting its calls in counter[name] and adding its own time
+    (without that of nested instrumented calls) to phase.
+    """
+    counter.setdefault(name, 0)
+    times = _times
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        counter[name] += 1
+        stack = getattr(_frames, 'stack', None)
+        if stack is None:
+            stack = _frames.stack = []
+        stack.append(0.0)
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = clock() - start
+            times[phase] += elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
+    return wrapper
+
+
+def _count_pseudo_legal(function):
+    @functools.wraps(function)
+    def get_pseudo_legal_moves(self, *args, **kwargs):
+        moves = function(self, *args, **kwargs)
+        _counts['pseudo_legal_moves'] += len(moves)
+        squares = self.squares
+        for move in moves:
+            row, col = move[0]
+            # squares holds 1 + the piece code; codes repeat every 6 per color
+            _piece_moves[PIECE_NAMES[(squares[row * 8 + col] - 1) % 6]] += 1
+        return moves
+    return get_pseudo_legal_moves
+
+
+def _count_filtered(function):
+    # Every generated move that is not returned was rejected; this also
+    # covers the en passant captures checked on the board
+    @functools.wraps(function)
+    def get_all_possible_moves(self, color):
+        rejected = _counts['legality_rejections']
+        generated = _counts['pseudo_legal_moves']
+        moves = function(self, color)
+        _counts['legality_rejections'] = rejected + _counts['pseudo_legal_moves'] - generated - len(moves)
+        return moves
+    return get_all_possible_moves
+
+
+def _count_illegal(function):
+    # The side that just moved in check: the move is rejected
+    @functools.wraps(function)
+    def is_in_check(self, color):
+        in_check = function(self, color)
+        if in_check and color != self.side_to_move:
+            _counts['legality_rejections'] += 1
+        return in_check
+    return is_in_check
+
+
+def _count_hits(function):
+    @functools.wraps(function)
+    def probe(self, key):
+        entry = function(self, key)
+        if entry is not None:
+            _counts['tt_hits'] += 1
+        return entry
+    return probe
+
+
+def _count_search(function):
+    # Engine.evaluate is set per engine, so it is wrapped for each search
+    @functools.wraps(function)
+    def search(self, *args, **kwargs):
+        evaluate = self.evaluate
+        self.evaluate = _instrument(evaluate, 'evaluate', _calls, 'evaluation')
+        with _searching_lock:
+            self.nodes = 0
+            _searching.add(self)
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            self.evaluate = evaluate
+            with _searching_lock:
+                _searching.discard(self)
+                _counts['nodes'] += self.nodes
+    return search
+
+
+# (class, method, phase, counting wrapper applied inside the timer)
+_METHODS = [
+    (Engine, 'search', 'search', _count_search),
+    (Board, 'get_all_possible_moves', 'legality', _count_filtered),
+    (Board, 'has_legal_move', 'legality', None),
+    (Board, 'get_pseudo_legal_moves', 'move_generation', _count_pseudo_legal),
+    (Board, 'is_in_check', 'attacks', _count_illegal),
+    (Board, 'is_square_attacked', 'attacks', None),
+    (Board, 'attackers_to', 'attacks', None),
+    (Board, 'pinned_pieces', 'attacks', None),
+    (Board, 'see', 'attacks', None),
+    (Board, 'make_move', 'make_unmake', None),
+    (Board, 'unmake_move', 'make_unmake', None),
+    (TranspositionTable, 'probe', 'hash', _count_hits),
+    (TranspositionTable, 'store', 'hash', None),
+]
+
+
+def reset():
+    """
+    Zero all counters and timers.
+    """
+    global _started
+    for name in _calls:
+        _calls[name] = 0
+    _piece_moves.update(dict.fromkeys(PIECE_NAMES, 0))
+    _counts.update(nodes=0, legality_rejections=0, tt_hits=0, pseudo_legal_moves=0)
+    _times.update(dict.fromkeys(PHASES, 0.0))
+    _started = time.perf_counter()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def enable():
+    """
+    Install the instrumented methods and start counting from zero.
+    """
+    if _originals:
+        return
+    reset()
+    for cls, name, phase, count in _METHODS:
+        function = cls.__dict__[name]
+        _originals.append((cls, name, function))
+        setattr(cls, name, _instrument(count(function) if count else function, name, _calls, phase))
+
+
+def disable():
+    """
+    Put the original methods back. The counters keep their values.
+    """
+    while _originals:
+        cls, name, function = _originals.pop()
+        setattr(cls, name, function)
+
+
+@contextmanager
+def profiled():
+    """
+    Profile the with block, counting from zero. Profiling is disabled
+    afterwards unless it was already enabled.
+    """
+    was_enabled = is_enabled()
+    enable()
+    reset()
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable()
+
+
+def snapshot():
+    """
+    ProfileStats of everything counted since enable() or reset(),
+    including the nodes of searches still running.
+    """
+    with _searching_lock:
+        nodes = _counts.get('nodes', 0) + sum(engine.nodes for engine in _searching)
+    return ProfileStats(
+        seconds=time.perf_counter() - _started,
+        nodes=nodes,
+        calls=dict(_calls),
+        piece_moves=dict(_piece_moves),
+        legality_rejections=_counts.get('legality_rejections', 0),
+        tt_hits=_counts.get('tt_hits', 0),
+        times=dict(_times),
+    )
+
+
+def write_snapshot(path):
+    """
+    Save snapshot() as JSON at path, replacing the file in one step so
+    readers never see a partial snapshot.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(snapshot()._asdict(), handle, indent=2)
+    os.replace(temporary, path)
+
+
+class SnapshotWriter:
+    """
+    Writes a JSON snapshot to path every interval seconds from a
+    background thread, and a last one on close(). Use as a context
+    manager or call close().
+    """
+
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            write_snapshot(self.path)
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        write_snapshot(self.path)
+
+
+def format_report(stats):
+    """
+    Lines describing a ProfileStats for the console.
+    """
+    lines = [f"{stats.seconds:.3f}s profiled, {stats.nodes} nodes,"
+             f" {stats.legality_rejections} legality rejections, {stats.tt_hits} hash hits"]
+    for phase in sorted(stats.times, key=stats.times.get, reverse=True):
+        share = stats.times[phase] / stats.seconds if stats.seconds else 0
+        lines.append(f"  {phase:<16} {stats.times[phase]:>9.3f}s {share:>6.1%}")
+    for name, count in sorted(stats.calls.items(), key=lambda item: item[1], reverse=True):
+        if count:
+            lines.append(f"  {name:<24} {count:>10} calls")
+    for name, count in stats.piece_moves.items():
+        if count:
+            lines.append(f"  {name + ' moves':<24} {count:>10} generated")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile a search or perft run with the built-in counters.")
+    parser.add_argument('--fen', default=STARTING_FEN, help="position to start from")
+    parser.add_argument('--depth', type=int, default=4, help="search depth")
+    parser.add_argument('--perft', type=int, metavar='DEPTH', help="run perft to this depth instead of a search")
+    parser.add_argument('--json', action='store_true', help="print the stats as JSON")
+    parser.add_argument('--snapshot', metavar='PATH', help="also write JSON snapshots to this file while running")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between snapshots")
+    args = parser.parse_args(argv)
+
+    board = Board.from_fen(args.fen)
+    with profiled():
+        writer = SnapshotWriter(args.snapshot, args.interval) if args.snapshot else None
+        try:
+            if args.perft:
+                board.perft(args.perft)
+            else:
+                Engine().search(board, depth=args.depth)
+        finally:
+            if writer is not None:
+                writer.close()
+        stats = snapshot()
+    if args.json:
+        print(json.dumps(stats._asdict(), indent=2))
+    else:
+        print('\n'.join(format_report(stats)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# san.py
+
+"""
+Standard algebraic notation (SAN) for moves, e.g. 'e4', 'Nbd7', 'exd6',
+'O-O-O', 'e8=Q+'.
+"""
+
+import re
+
+from pieces import Pawn, King
+from utils import notation_to_index, index_to_notation
+
+_SAN_PATTERN = re.compile(
+    r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$'
+)
+_CASTLING = {'O-O': 6, 'O-O-O': 2, '0-0': 6, '0-0-0': 2}
+
+
+def parse_san(board, san):
+    """
+    Resolve a SAN string to a legal (start, end[, promotion]) move for the
+    side to move. Raises ValueError if it is malformed, illegal or
+    ambiguous.
+    """
+    text = san.rstrip('+#!?')
+    color = board.side_to_move
+    pseudo_legal = board.get_pseudo_legal_moves(color)
+    if text in _CASTLING:
+        row = 7 if color == 'white' else 0
+        castle = ((row, 4), (row, _CASTLING[text]))
+        candidates = [castle] if castle in pseudo_legal else []
+    else:
+        match = _SAN_PATTERN.match(text)
+        if match is None:
+            raise ValueError(f"Invalid SAN move: {san!r}")
+        piece_letter, from_file, from_rank, _, target, promotion = match.groups()
+        piece_letter = piece_letter or 'P'
+        end = notation_to_index(target)
+        from_col = 'abcdefgh'.index(from_file) if from_file else None
+        from_row = 8 - int(from_rank) if from_rank else None
+        candidates = []
+        for move in pseudo_legal:
+            start = move[0]
+            if move[1] != end or (len(move) > 2 and move[2] != (promotion or 'Q')):
+                continue
+            if len(move) == 2 and promotion:
+                continue
+            if from_col is not None and start[1] != from_col:
+                continue
+            if from_row is not None and start[0] != from_row:
+                continue
+            if board.get_piece_at(start).symbol.upper() != piece_letter:
+                continue
+            candidates.append(move)
+        if piece_letter == 'K':
+            # A king moving two files is castling, which is written O-O
+            candidates = [move for move in candidates if abs(move[0][1] - move[1][1]) != 2]
+
+    legal = [move for move in candidates if _is_legal(board, move)]
+    if not legal:
+        raise ValueError(f"Illegal move for {color}: {san!r}")
+    if len(legal) > 1:
+        raise ValueError(f"Ambiguous move for {color}: {san!r}")
+    return legal[0]
+
+
+def _is_legal(board, move):
+    color = board.side_to_move
+    board.make_move(move)
+    legal = not board.is_in_check(color)
+    board.unmake_move()
+    return legal
+
+
+def move_to_san(board, move, legal_moves=None):
+    """
+    Describe a legal move of the side to move in SAN, including the check
+    or mate suffix. legal_moves may be passed in to avoid regenerating them.
+    """
+    start, end = move[0], move[1]
+    piece = board.get_piece_at(start)
+    if isinstance(piece, King) and abs(start[1] - end[1]) == 2:
+        san = 'O-O' if end[1] == 6 else 'O-O-O'
+    else:
+        target = board.get_piece_at(end)
+        capture = target is not None or (isinstance(piece, Pawn) and start[1] != end[1])
+        if isinstance(piece, Pawn):
+            san = index_to_notation(*start)[0] + 'x' if capture else ''
+            san += index_to_notation(*end)
+            if len(move) > 2:
+                san += '=' + move[2]
+        else:
+            if legal_moves is None:
+                legal_moves = board.get_all_possible_moves(board.side_to_move)
+            letter = piece.symbol.upper()
+            rivals = [other[0] for other in legal_moves
+                      if other[1] == end and other[0] != start
+                      and board.get_piece_at(other[0]).symbol.upper() == letter]
+            square = index_to_notation(*start)
+            if not rivals:
+                disambiguation = ''
+            elif all(other[1] != start[1] for other in rivals):
+                disambiguation = square[0]
+            elif all(other[0] != start[0] for other in rivals):
+                disambiguation = square[1]
+            else:
+                disambiguation = square
+            san = letter + disambiguation + ('x' if capture else '') + index_to_notation(*end)
+
+    board.make_move(move)
+    if board.is_in_check(board.side_to_move):
+        san += '#' if not board.get_all_possible_moves(board.side_to_move) else '+'
+    board.unmake_move()
+    return san
@@ -0,0 +1,270 @@
+# server.py
+
+"""
+Asyncio game server: many games in one process over a local TCP socket.
+
+The protocol is newline-delimited JSON. Every request is an object with a
+"cmd" and, optionally, an "id" that is echoed back in the reply:
+
+    {"cmd": "new", "fen": "...", "legal": true}   start a game (fen optional)
+    {"cmd": "move", "game": 1, "move": "e2e4"}    play a move in coordinate notation
+    {"cmd": "state", "game": 1}                   current state of a game
+    {"cmd": "watch", "game": 1}                   receive updates of a game
+    {"cmd": "close", "game": 1}                   drop a game
+    {"cmd": "stats"}                              games, moves and move latency
+
+Replies are {"type": "state", ...}, {"type": "stats", ...} or
+{"type": "error", "error": "..."}; a malformed request gets an error reply
+and leaves the connection and its games alone. After a move every other
+client watching the game is sent the new state. Clients that pass
+"legal": true when they create or watch a game get the legal moves with
+every state.
+
+    python server.py --port 8765
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import deque
+
+from board import Board
+from utils import move_to_notation
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    """
+    Nearest-rank percentiles of samples given in seconds, in milliseconds,
+    keyed like 'p50', 'p99.9'.
+    """
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        key = f"p{point:g}"
+        if not ordered:
+            result[key] = None
+            continue
+        rank = max(0, min(len(ordered) - 1, math.ceil(point / 100 * len(ordered)) - 1))
+        result[key] = round(ordered[rank] * 1000, 3)
+    return result
+
+
+async def _read_line(reader):
+    """
+    The next line from reader, b'' at the end of the stream, or None for a
+    line longer than the stream limit, which is read and thrown away.
+    """
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as error:
+        # The last line may lack its newline
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+            return None
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+
+
+class HostedGame:
+    def __init__(self, game_id, board):
+        self.id = game_id
+        self.board = board
+        # Connection -> whether it wants legal moves with each state
+        self.watchers = {}
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.games = set()
+
+    def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b'\n')
+
+
+class GameServer:
+    def __init__(self, latency_samples=100000):
+        self.games = {}
+        self.moves = 0
+        # Seconds spent handling each of the most recent moves
+        self.latencies = deque(maxlen=latency_samples)
+        self._ids = itertools.count(1)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Start listening and return the asyncio.Server; port 0 picks a free port.
+        """
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def handle_client(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                line = await _read_line(reader)
+                if line is None:
+                    connection.send({'type': 'error', 'error': "Request too long"})
+                    await writer.drain()
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    connection.send({'type': 'error', 'error': "Invalid JSON"})
+                else:
+                    try:
+                        reply = self.handle_request(request, connection)
+                    except Exception as error:
+                        # A bad request must not cost the client its other games
+                        reply = {'type': 'error', 'error': f"Internal error: {error}"}
+                    connection.send(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.disconnect(connection)
+            writer.close()
+
+    def disconnect(self, connection):
+        """
+        Stop sending updates to connection; games nobody watches any more
+        are dropped.
+        """
+        for game_id in connection.games:
+            game = self.games.get(game_id)
+            if game is not None:
+                game.watchers.pop(connection, None)
+                if not game.watchers:
+                    del self.games[game_id]
+        connection.games.clear()
+
+    def handle_request(self, request, connection):
+        """
+        Answer one decoded request from connection and return the reply.
+        """
+        if not isinstance(request, dict):
+            return {'type': 'error', 'error': "Request must be a JSON object"}
+        command = request.get('cmd')
+        if command == 'new':
+            reply = self._new_game(request, connection)
+        elif command == 'stats':
+            reply = self.stats()
+        elif command in ('move', 'state', 'watch', 'close'):
+            game_id = request.get('game')
+            # Lists and objects cannot be looked up; true and false are not ids
+            valid = isinstance(game_id, int) and not isinstance(game_id, bool)
+            game = self.games.get(game_id) if valid else None
+            if game is None:
+                reply = {'type': 'error', 'error': "Unknown game"}
+            elif command == 'move':
+                reply = self._move(game, request, connection)
+            elif command == 'close':
+                for watcher in game.watchers:
+                    watcher.games.discard(game.id)
+                del self.games[game.id]
+                reply = {'type': 'closed', 'game': game.id}
+            else:
+                if command == 'watch':
+                    game.watchers[connection] = bool(request.get('legal'))
+                    connection.games.add(game.id)
+                reply = self.state(game, request.get('legal', game.watchers.get(connection)))
+        else:
+            reply = {'type': 'error', 'error': f"Unknown command: {command!r}"}
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    def _new_game(self, request, connection):
+        fen = request.get('fen')
+        if fen is not None and not isinstance(fen, str):
+            return {'type': 'error', 'error': "FEN must be a string"}
+        try:
+            board = Board.from_fen(fen) if fen else Board()
+            if board.find_king('white') is None or board.find_king('black') is None:
+                raise ValueError("Both kings must be on the board")
+            game = HostedGame(next(self._ids), board)
+            reply = self.state(game, request.get('legal'))
+        except ValueError as error:
+            return {'type': 'error', 'error': str(error)}
+        self.games[game.id] = game
+        game.watchers[connection] = bool(request.get('legal'))
+        connection.games.add(game.id)
+        return reply
+
+    def _move(self, game, request, connection):
+        start = time.perf_counter()
+        move = request.get('move')
+        if not isinstance(move, str):
+            return {'type': 'error', 'game': game.id, 'error': "Missing move"}
+        result = game.board.apply_move(move)
+        if not result.ok:
+            return {'type': 'error', 'game': game.id, 'error': result.error}
+        states = {}
+        for watcher, legal in game.watchers.items():
+            if watcher is not connection:
+                if legal not in states:
+                    states[legal] = self.state(game, legal, result.status)
+                watcher.send(states[legal])
+        reply = self.state(game, request.get('legal', game.watchers.get(connection)), result.status)
+        self.moves += 1
+        self.latencies.append(time.perf_counter() - start)
+        return reply
+
+    def state(self, game, legal=False, status=None):
+        """
+        The state message for game; legal adds the list of legal moves.
+        """
+        board = game.board
+        if status is None:
+            status = board.game_status()
+        message = {
+            'type': 'state',
+            'game': game.id,
+            'fen': board.to_fen(),
+            'status': status.state,
+            'winner': status.winner,
+            'check': status.in_check,
+            'last': move_to_notation(board.undo_stack[-1][0]) if board.undo_stack else None,
+        }
+        if legal:
+            message['legal'] = [move_to_notation(move)
+                                for move in board.get_all_possible_moves(board.side_to_move)]
+        return message
+
+    def stats(self):
+        return {'type': 'stats', 'games': len(self.games), 'moves': self.moves,
+                'latency_ms': percentiles(self.latencies)}
+
+
+async def serve(host, port):
+    server = await GameServer().start(host, port)
+    for sock in server.sockets:
+        print(f"Serving on {sock.getsockname()}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host chess games over TCP (newline-delimited JSON).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    main()
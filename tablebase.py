@@ -0,0 +1,559 @@
+# tablebase.py
+
+"""
+Endgame tablebases for small material sets, built by retrograde analysis.
+
+A table covers one material set named like 'KQK' or 'KRKP': white's
+pieces, then black's. The stronger side is always white; positions with
+the colors the other way round are looked up with the board mirrored.
+For every position a table stores one number, from the point of view of
+the side to move:
+
+    0        draw (or a position that cannot occur)
+    d + 1    mate in d plies: the side to move mates when d is odd and
+             is mated when d is even
+
+Positions are indexed by the squares of the pieces, white king first.
+Symmetry keeps the white king on the 10 squares of the a1-d1-d4 triangle
+when there are no pawns (the board may be mirrored and rotated) and on
+the a-d files when there are.
+
+Generation takes two passes. The first runs Board's move generator on
+every position, split over a process pool, to count the distinct
+positions each one can move to, and looks up captures and promotions in
+the smaller tables they lead to (which are generated first). The second
+works backwards from the mates with un-moves, one distance at a time.
+Castling and en passant are not covered.
+
+    python tablebase.py KQK KRK KPK --dir tables
+    python tablebase.py --dir tables --probe "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+"""
+
+import argparse
+import os
+import re
+import sys
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from board import Board, PIECE_CLASSES
+from bitboard import FULL, POSITIONS, PIECE_SYMBOLS, OTHER_COLOR, iter_bits
+from attacks import KNIGHT_ATTACKS, KING_ATTACKS, bishop_attacks, rook_attacks
+from utils import move_to_notation
+
+MAGIC = b'RTB1'
+SUFFIX = '.rtb'
+# Largest material set accepted, counting the kings
+MAX_PIECES = 5
+PIECE_ORDER = 'QRBNP'
+PIECE_WORTH = {'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+# Material sets in which neither side can ever mate
+DRAWN = {'KK', 'KBK', 'KNK'}
+# Move count of a position that can move into a draw, so it never counts down to a loss
+_ESCAPE = 1 << 30
+_NAME_PATTERN = re.compile(r'^K[QRBNP]*K[QRBNP]*$')
+
+# Result of Tablebase.probe for the side to move: wdl is 1 (win), 0 (draw)
+# or -1 (loss), dtm the distance to mate in plies (None for a draw)
+TablebaseResult = namedtuple('TablebaseResult', ['wdl', 'dtm'])
+
+
+def _symmetries():
+    """
+    The 8 symmetries of the board as square -> square tables, identity first.
+    """
+    tables = []
+    for flip_rows in (False, True):
+        for flip_cols in (False, True):
+            for transpose in (False, True):
+                table = []
+                for row, col in POSITIONS:
+                    if transpose:
+                        row, col = col, row
+                    if flip_rows:
+                        row = 7 - row
+                    if flip_cols:
+                        col = 7 - col
+                    table.append(row * 8 + col)
+                tables.append(table)
+    return tables
+
+
+_SYMMETRIES = _symmetries()
+_MIRROR = _SYMMETRIES[2]  # Files a-h reversed
+# White king squares: the a1-d1-d4 triangle without pawns, the a-d files with them
+_TRIANGLE = [square for square in range(64)
+             if square % 8 <= 3 and 7 - square // 8 <= square % 8]
+_HALF = [square for square in range(64) if square % 8 <= 3]
+# For every white king square, the symmetries that bring it into its region
+_PAWNLESS_MAPS = [[table for table in _SYMMETRIES if table[square] in _TRIANGLE]
+                  for square in range(64)]
+_PAWN_MAPS = [[_SYMMETRIES[0]] if square % 8 <= 3 else [_MIRROR] for square in range(64)]
+
+
+def _strength(pieces):
+    return (sum(PIECE_WORTH[piece] for piece in pieces),
+            [PIECE_WORTH[piece] for piece in pieces],
+            [-PIECE_ORDER.index(piece) for piece in pieces])
+
+
+def material_name(symbols):
+    """
+    Table name for a collection of piece symbols ('PNBRQK' white,
+    'pnbrqk' black) and whether the colors had to be swapped to put the
+    stronger side first.
+    """
+    white = sorted((s for s in symbols if s.isupper() and s != 'K'), key=PIECE_ORDER.index)
+    black = sorted((s.upper() for s in symbols if s.islower() and s != 'k'), key=PIECE_ORDER.index)
+    flipped = _strength(black) > _strength(white)
+    if flipped:
+        white, black = black, white
+    return 'K' + ''.join(white) + 'K' + ''.join(black), flipped
+
+
+class _Material:
+    """
+    Index arithmetic for one material set.
+    """
+
+    def __init__(self, name):
+        second_king = name.index('K', 1)
+        # Piece symbols in index order: the kings, then white's and black's other pieces
+        self.pieces = ['K', 'k'] + list(name[1:second_king]) + list(name[second_king + 1:].lower())
+        self.pawns = 'P' in name
+        self.slots = _HALF if self.pawns else _TRIANGLE
+        self.slot_of = {square: slot for slot, square in enumerate(self.slots)}
+        self.maps = _PAWN_MAPS if self.pawns else _PAWNLESS_MAPS
+        self.per_slot = 64 ** (len(self.pieces) - 1)
+        self.size = len(self.slots) * self.per_slot
+        # Index ranges of identical pieces, kept in sorted square order
+        self.runs = []
+        start = 2
+        for end in range(3, len(self.pieces) + 1):
+            if end == len(self.pieces) or self.pieces[end] != self.pieces[start]:
+                if end - start > 1:
+                    self.runs.append((start, end))
+                start = end
+
+    def canonical(self, squares):
+        """
+        The representative of the symmetric copies of squares (aligned
+        with self.pieces) that the table stores.
+        """
+        best = None
+        for table in self.maps[squares[0]]:
+            candidate = [table[square] for square in squares]
+            for start, end in self.runs:
+                candidate[start:end] = sorted(candidate[start:end])
+            candidate = tuple(candidate)
+            if best is None or candidate < best:
+                best = candidate
+        return best
+
+    def index_of(self, squares):
+        canonical = self.canonical(squares)
+        index = self.slot_of[canonical[0]]
+        for square in canonical[1:]:
+            index = index * 64 + square
+        return index
+
+    def squares_of(self, index):
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            index, square = divmod(index, 64)
+            squares.append(square)
+        squares.append(self.slots[index])
+        return tuple(reversed(squares))
+
+
+_MATERIALS = {}
+
+
+def _material(name):
+    material = _MATERIALS.get(name)
+    if material is None:
+        material = _MATERIALS[name] = _Material(name)
+    return material
+
+
+def _check_name(name):
+    if not _NAME_PATTERN.match(name) or len(name) > MAX_PIECES:
+        raise ValueError(f"Invalid material set: {name!r}")
+    second_king = name.index('K', 1)
+    return material_name(list(name[:second_king]) + list(name[second_king:].lower()))[0]
+
+
+class Tablebase:
+    """
+    Probes the tables found in a directory; each is loaded on first use.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # Name -> (values, number of positions per side to move)
+        self._tables = {}
+        names = [entry[:-len(SUFFIX)] for entry in os.listdir(directory)
+                 if entry.endswith(SUFFIX)] if os.path.isdir(directory) else []
+        # Bare kings and a lone minor piece are draws even without a table
+        self.max_pieces = max([3] + [len(name) for name in names])
+
+    def _table(self, name):
+        if name not in self._tables:
+            path = os.path.join(self.directory, name + SUFFIX)
+            table = None
+            if os.path.exists(path):
+                with open(path, 'rb') as handle:
+                    data = handle.read()
+                if data[:4] != MAGIC:
+                    raise ValueError(f"Not a tablebase file: {path!r}")
+                values = array('B' if data[4] == 1 else 'H')
+                values.frombytes(data[8:])
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                if len(values) != 2 * _material(name).size:
+                    raise ValueError(f"Truncated tablebase file: {path!r}")
+                table = (values, len(values) // 2)
+            self._tables[name] = table
+        return self._tables[name]
+
+    def _code(self, symbols, squares, white_to_move):
+        """
+        Stored value (see the module docstring) of the position with the
+        given pieces, or None if there is no table for it.
+        """
+        name, flipped = material_name(symbols)
+        if name in DRAWN:
+            return 0
+        if flipped:
+            symbols = [symbol.swapcase() for symbol in symbols]
+            squares = [square ^ 56 for square in squares]
+            white_to_move = not white_to_move
+        table = self._table(name)
+        if table is None:
+            return None
+        material = _material(name)
+        pools = {}
+        for symbol, square in zip(symbols, squares):
+            pools.setdefault(symbol, []).append(square)
+        ordered = [pools[symbol].pop() for symbol in material.pieces]
+        values, size = table
+        return values[material.index_of(ordered) + (0 if white_to_move else size)]
+
+    def probe(self, board):
+        """
+        TablebaseResult for the side to move, or None if no table covers
+        the position (too many pieces, castling rights or an en passant
+        capture available).
+        """
+        occupied = board.occupied
+        if bin(occupied).count('1') > self.max_pieces or board.castling or board._en_passant_file() is not None:
+            return None
+        squares = list(iter_bits(occupied))
+        symbols = [PIECE_SYMBOLS[board.squares[square] - 1] for square in squares]
+        code = self._code(symbols, squares, board.side_to_move == 'white')
+        if code is None:
+            return None
+        if code == 0:
+            return TablebaseResult(0, None)
+        return TablebaseResult(1 if (code - 1) % 2 else -1, code - 1)
+
+    def best_move(self, board):
+        """
+        The move that mates fastest, holds the draw, or delays mate
+        longest, or None if the position or a move out of it is not
+        covered.
+        """
+        best_move, best_key = None, None
+        for move in board.get_all_possible_moves(board.side_to_move):
+            board.make_move(move)
+            result = self.probe(board)
+            board.unmake_move()
+            if result is None:
+                return None
+            # result is the opponent's: its loss is best, sooner better
+            if result.wdl < 0:
+                key = (2, -result.dtm)
+            elif result.wdl == 0:
+                key = (1, 0)
+            else:
+                key = (0, result.dtm)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+
+def _children(name):
+    """
+    Material sets that a capture or promotion in name leads to.
+    """
+    pieces = _material(name).pieces
+    children = set()
+    for index, symbol in enumerate(pieces):
+        if symbol in 'Kk':
+            continue
+        rest = pieces[:index] + pieces[index + 1:]
+        children.add(material_name(rest)[0])
+        if symbol in 'Pp':
+            for promotion in 'QRBN':
+                children.add(material_name(rest + [promotion if symbol == 'P' else promotion.lower()])[0])
+    return children
+
+
+def _scan_position(board, material, tablebase, squares, color):
+    """
+    (move count, external win, external loss) for one position, color to
+    move. The move count is the number of distinct positions of this table
+    the moves lead to, -1 for an illegal position and _ESCAPE if a move
+    reaches a draw in another table. The external win is the stored value
+    of the quickest mate reached through a capture or promotion, the
+    external loss the longest distance to being mated through one.
+    """
+    other = OTHER_COLOR[color]
+    if board.is_in_check(other):
+        return -1, 0, 0
+    moves = board.get_all_possible_moves(color)
+    if not moves:
+        return (0, 0, 0) if board.is_in_check(color) else (_ESCAPE, 0, 0)
+    successors = set()
+    win = loss = 0
+    escape = False
+    for move in moves:
+        start = move[0][0] * 8 + move[0][1]
+        end = move[1][0] * 8 + move[1][1]
+        moving = squares.index(start)
+        if end not in squares and len(move) == 2:
+            after = list(squares)
+            after[moving] = end
+            successors.add(material.index_of(after))
+            continue
+        symbols, after = list(material.pieces), list(squares)
+        if end in squares:
+            captured = squares.index(end)
+            del symbols[captured], after[captured]
+            if captured < moving:
+                moving -= 1
+        after[moving] = end
+        if len(move) > 2:
+            symbols[moving] = move[2] if color == 'white' else move[2].lower()
+        code = tablebase._code(symbols, after, other == 'white')
+        if code == 0:
+            escape = True
+        elif (code - 1) % 2 == 0:
+            # The opponent is mated in code - 1 plies, so this side mates in code
+            win = min(win, code + 1) if win else code + 1
+        else:
+            loss = max(loss, code - 1)
+    return (_ESCAPE if escape else len(successors)), win, loss
+
+
+def _scan(task):
+    """
+    First pass over the positions whose white king is in slots
+    first..last - 1. Returns {color: (counts, wins, losses)} arrays.
+    """
+    name, directory, first, last = task
+    material = _material(name)
+    tablebase = Tablebase(directory)
+    board = Board('8/8/8/8/8/8/8/8 w - - 0 1')
+    pieces = []
+    for symbol in material.pieces:
+        piece = PIECE_CLASSES[symbol.upper()]('white' if symbol.isupper() else 'black')
+        # Keeps set_piece_at from granting castling rights
+        piece.has_moved = True
+        pieces.append(piece)
+    result = {color: (array('l'), array('H'), array('H')) for color in ('white', 'black')}
+    placed = []
+    for index in range(first * material.per_slot, last * material.per_slot):
+        squares = material.squares_of(index)
+        valid = (len(set(squares)) == len(squares)
+                 and material.canonical(squares) == squares
+                 and not any(symbol in 'Pp' and square // 8 in (0, 7)
+                             for symbol, square in zip(material.pieces, squares)))
+        if valid:
+            for position in placed:
+                board.set_piece_at(position, None)
+            placed = [POSITIONS[square] for square in squares]
+            for position, piece in zip(placed, pieces):
+                board.set_piece_at(position, piece)
+        for color in ('white', 'black'):
+            counts, wins, losses = result[color]
+            count, win, loss = (_scan_position(board, material, tablebase, list(squares), color)
+                                if valid else (-1, 0, 0))
+            counts.append(count)
+            wins.append(win)
+            losses.append(loss)
+    return result
+
+
+def _predecessors(material, index, color):
+    """
+    Indices of the positions, with the other color to move, from which a
+    quiet move of the other color leads to position index.
+    """
+    squares = material.squares_of(index)
+    occupied = 0
+    for square in squares:
+        occupied |= 1 << square
+    empty = ~occupied & FULL
+    white = color == 'black'  # The side that just moved
+    previous = set()
+    for piece, (symbol, square) in enumerate(zip(material.pieces, squares)):
+        if symbol.isupper() != white:
+            continue
+        kind = symbol.upper()
+        if kind == 'K':
+            origins = KING_ATTACKS[square] & empty
+        elif kind == 'N':
+            origins = KNIGHT_ATTACKS[square] & empty
+        elif kind == 'P':
+            # Pawns reach rows 1-6 quietly; white ones move up the grid (towards row 0)
+            step, double_row, lowest = (8, 4, 2) if white else (-8, 3, 1)
+            origins = 0
+            if lowest <= square // 8 + step // 8 <= lowest + 4 and empty >> (square + step) & 1:
+                origins |= 1 << (square + step)
+                if square // 8 == double_row and empty >> (square + 2 * step) & 1:
+                    origins |= 1 << (square + 2 * step)
+        else:
+            origins = 0
+            if kind in 'BQ':
+                origins |= bishop_attacks(square, occupied)
+            if kind in 'RQ':
+                origins |= rook_attacks(square, occupied)
+            origins &= empty
+        for origin in iter_bits(origins):
+            before = list(squares)
+            before[piece] = origin
+            previous.add(material.index_of(before))
+    return previous
+
+
+def _solve(material, scans):
+    """
+    Second pass: spread the mates backwards through un-moves. scans maps
+    each color to its (counts, wins, losses) arrays. Returns the stored
+    values per color.
+    """
+    values = {color: array('H', bytes(2 * material.size)) for color in scans}
+    buckets = {}
+    for color, (counts, wins, losses) in scans.items():
+        for index, count in enumerate(counts):
+            if count >= 0 and wins[index]:
+                # A capture or promotion wins, even if it is the only kind of move
+                buckets.setdefault(wins[index] - 1, []).append((color, index))
+            elif count == 0:
+                # Mated, or every move captures or promotes into a lost position
+                buckets.setdefault(losses[index] + 1 if losses[index] else 0, []).append((color, index))
+    distance = 0
+    while buckets:
+        for color, index in buckets.pop(distance, ()):
+            if values[color][index]:
+                continue
+            values[color][index] = distance + 1
+            mover = OTHER_COLOR[color]
+            counts, wins, losses = scans[mover]
+            mover_values = values[mover]
+            for before in _predecessors(material, index, color):
+                if mover_values[before] or counts[before] < 0:
+                    continue
+                if distance % 2 == 0:
+                    # color is mated here, so moving here mates one ply later
+                    buckets.setdefault(distance + 1, []).append((mover, before))
+                else:
+                    counts[before] -= 1
+                    if counts[before] == 0 and not wins[before]:
+                        # Every move loses; the longest resistance decides the distance
+                        buckets.setdefault(max(distance, losses[before]) + 1, []).append((mover, before))
+        distance += 1
+    return values
+
+
+def _write(path, values):
+    top = max(max(values['white']), max(values['black']))
+    typecode = 'B' if top < 256 else 'H'
+    data = array(typecode, values['white']) + array(typecode, values['black'])
+    if sys.byteorder == 'big':
+        data.byteswap()
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(MAGIC + bytes([data.itemsize, 0, 0, 0]))
+        handle.write(data.tobytes())
+    os.replace(temporary, path)
+
+
+def generate(name, directory, workers=None):
+    """
+    Build the table for a material set such as 'KQK' in directory, after
+    the smaller tables its captures and promotions lead to. Tables already
+    there are kept. Returns the canonical name. The first pass is split by
+    white king square over workers processes (default: the CPU count).
+    Raises ValueError for an invalid name.
+    """
+    name = _check_name(name)
+    if name in DRAWN:
+        return name
+    path = os.path.join(directory, name + SUFFIX)
+    if os.path.exists(path):
+        return name
+    for child in sorted(_children(name)):
+        generate(child, directory, workers)
+    os.makedirs(directory, exist_ok=True)
+
+    material = _material(name)
+    slots = len(material.slots)
+    workers = workers or os.cpu_count()
+    chunk = max(1, -(-slots // (workers * 4)))
+    tasks = [(name, directory, first, min(first + chunk, slots)) for first in range(0, slots, chunk)]
+    scans = {color: (array('l'), array('H'), array('H')) for color in ('white', 'black')}
+    if workers == 1:
+        results = map(_scan, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_scan, tasks)
+    try:
+        for result in results:
+            for color, arrays in result.items():
+                for merged, part in zip(scans[color], arrays):
+                    merged.extend(part)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    _write(path, _solve(material, scans))
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases.")
+    parser.add_argument('materials', nargs='*', help="material sets such as KQK KRK KPK KRKP")
+    parser.add_argument('--dir', default='tablebases', help="directory of the table files")
+    parser.add_argument('--workers', type=int, default=0, help="worker processes (default: CPUs)")
+    parser.add_argument('--probe', metavar='FEN', help="look up a position instead")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        board = Board.from_fen(args.probe)
+        tablebase = Tablebase(args.dir)
+        result = tablebase.probe(board)
+        if result is None:
+            print("not in the tablebases")
+        elif result.wdl == 0:
+            print("draw")
+        else:
+            outcome = 'mates' if result.wdl > 0 else 'is mated'
+            move = tablebase.best_move(board)
+            print(f"{board.side_to_move} {outcome} in {result.dtm} plies"
+                  f"{f', best move {move_to_notation(move)}' if move else ''}")
+        return 0
+    if not args.materials:
+        parser.error("no material sets given")
+    for name in args.materials:
+        try:
+            name = generate(name, args.dir, args.workers or None)
+        except ValueError as error:
+            parser.error(str(error))
+        print(f"{name} done")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
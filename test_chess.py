@@ -1,10 +1,36 @@
+import asyncio
+import json
+import math
+import os
+import random
+import tempfile
 import unittest
 from unittest.mock import patch
 from io import StringIO
 from pieces import Pawn, Knight, Bishop, Rook, Queen, King
-from board import Board
+from array import array
+from board import Board, STARTING_FEN, PIECE_CLASSES
+from bitboard import SYMBOL_INDEX, PIECE_SYMBOLS, iter_bits
+from attacks import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, bishop_attacks, rook_attacks
 from game import Game
-from utils import notation_to_index, index_to_notation
+from utils import notation_to_index, index_to_notation, move_to_notation, notation_to_move, decode_move
+from benchmark import POSITIONS, run_position
+from parallel import parallel_perft, parallel_divide
+from engine import Engine, MATE_SCORE
+from transposition import TranspositionTable, TTEntry, EXACT, LOWER, UPPER
+from evaluation import evaluate, full_scores
+from san import parse_san, move_to_san
+from pgn import read_games, replay_games
+from server import GameServer, percentiles
+import loadtest
+from uci import UciEngine, allocate_time, format_score
+import tournament
+from book import OpeningBook, compile_book, RECORD
+import tablebase
+import features
+import archive
+import profiling
+from movepick import pick_moves, is_capture
 
 
 class TestUtils(unittest.TestCase):
@@ -262,6 +288,12 @@ class TestGame(unittest.TestCase):
         # Now white has no legal moves but is not in check
         self.assertTrue(game.is_game_over())
 
+    def test_starts_with_the_side_to_move(self):
+        game = Game(Board.from_fen('k7/1Q6/1K6/8/8/8/8/8 b - - 0 1'), verbose=False)
+        self.assertEqual(game.current_player, 'black')
+        self.assertEqual(game.status().state, 'checkmate')
+        self.assertTrue(game.is_game_over())
+
 
 class TestPawnPromotion(unittest.TestCase):
     def setUp(self):
@@ -328,5 +360,1399 @@ class TestPawnPromotion(unittest.TestCase):
         self.assertIn("No valid piece at that position. Try again.", output)
 
 
+class TestBitboards(unittest.TestCase):
+    def test_initial_occupancy(self):
+        board = Board()
+        self.assertEqual(board.occupancy['black'], 0xFFFF)
+        self.assertEqual(board.occupancy['white'], 0xFFFF << 48)
+        self.assertEqual(board.bitboards[SYMBOL_INDEX['K']], 1 << 60)
+        self.assertEqual(board.find_king('black'), (0, 4))
+
+    def test_set_piece_at_updates_bitboards(self):
+        board = Board()
+        board.set_piece_at((4, 4), Knight('black'))
+        board.set_piece_at((6, 4), None)
+        self.assertFalse(board.is_empty((4, 4)))
+        self.assertTrue(board.is_enemy_piece((4, 4), 'white'))
+        self.assertTrue(board.is_empty((6, 4)))
+        self.assertEqual(board.bitboards[SYMBOL_INDEX['n']] >> 36 & 1, 1)
+        self.assertEqual(board.bitboards[SYMBOL_INDEX['P']] >> 52 & 1, 0)
+
+    def test_grid_assignment_resyncs(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        self.assertEqual(board.occupied, 0)
+        self.assertIsNone(board.find_king('white'))
+
+    def test_initial_move_count(self):
+        board = Board()
+        self.assertEqual(len(board.get_all_possible_moves('white')), 20)
+        self.assertEqual(len(board.get_all_possible_moves('black')), 20)
+
+    def test_matches_piece_move_generation(self):
+        board = Board()
+        board.set_piece_at((5, 2), None)
+        board.move_piece((6, 4), (4, 4))
+        board.move_piece((1, 3), (3, 3))
+        expected = []
+        for row in range(8):
+            for col in range(8):
+                piece = board.get_piece_at((row, col))
+                if piece and piece.color == 'white':
+                    for end in piece.get_possible_moves((row, col), board):
+                        expected.append(((row, col), end))
+        self.assertCountEqual(board.get_pseudo_legal_moves('white'), expected)
+
+
+class TestAttacks(unittest.TestCase):
+    def setUp(self):
+        self.board = Board()
+        self.board.grid = [[None for _ in range(8)] for _ in range(8)]
+        self.board.set_piece_at(notation_to_index('e1'), King('white'))
+        self.board.set_piece_at(notation_to_index('e8'), King('black'))
+
+    def test_tables(self):
+        self.assertEqual(bin(KNIGHT_ATTACKS[0]).count('1'), 2)
+        self.assertEqual(bin(KNIGHT_ATTACKS[36]).count('1'), 8)
+        self.assertEqual(bin(KING_ATTACKS[63]).count('1'), 3)
+        # A white pawn on e4 attacks d5 and f5
+        self.assertEqual(PAWN_ATTACKS['white'][36], (1 << 27) | (1 << 29))
+        self.assertEqual(PAWN_ATTACKS['black'][8], 1 << 17)
+
+    def test_slider_attacks_stop_at_blockers(self):
+        occupied = (1 << 35) | (1 << 20)  # d4 and e6
+        attacks = rook_attacks(36, occupied)  # rook on e4
+        self.assertTrue(attacks >> 35 & 1)
+        self.assertFalse(attacks >> 34 & 1)
+        self.assertTrue(attacks >> 20 & 1)
+        self.assertFalse(attacks >> 12 & 1)
+        self.assertEqual(bin(bishop_attacks(0, 0)).count('1'), 7)
+
+    def test_is_square_attacked(self):
+        self.board.set_piece_at(notation_to_index('d4'), Pawn('black'))
+        self.board.set_piece_at(notation_to_index('a5'), Bishop('black'))
+        self.board.set_piece_at(notation_to_index('c3'), Knight('white'))
+        self.assertTrue(self.board.is_square_attacked(notation_to_index('e3'), 'white'))
+        # Pawn pushes are not attacks
+        self.assertFalse(self.board.is_square_attacked(notation_to_index('d3'), 'white'))
+        self.assertTrue(self.board.is_square_attacked(notation_to_index('b4'), 'white'))
+        # The bishop is blocked by the knight on c3
+        self.assertFalse(self.board.is_square_attacked(notation_to_index('d2'), 'white'))
+        self.assertTrue(self.board.is_square_attacked(notation_to_index('d7'), 'white'))
+        self.assertTrue(self.board.is_adjacent_enemy_king(notation_to_index('d7'), 'white'))
+
+
+class TestMakeUnmake(unittest.TestCase):
+    def snapshot(self, board):
+        pieces = [(piece, piece.has_moved) if piece else None for row in board.grid for piece in row]
+        return pieces, list(board.bitboards), board.last_move
+
+    def assert_round_trip(self, board, move):
+        before = self.snapshot(board)
+        board.make_move(move)
+        self.assertNotEqual(self.snapshot(board), before)
+        self.assertEqual(board.unmake_move(), move)
+        self.assertEqual(self.snapshot(board), before)
+        self.assertEqual(board.undo_stack, [])
+
+    def test_castling_round_trip(self):
+        board = Board()
+        board.set_piece_at((7, 5), None)
+        board.set_piece_at((7, 6), None)
+        self.assert_round_trip(board, ((7, 4), (7, 6)))
+
+    def test_en_passant_round_trip(self):
+        board = Board()
+        board.set_piece_at((3, 3), Pawn('white'))
+        board.move_piece((1, 4), (3, 4))
+        board.undo_stack = []
+        board.make_move(((3, 3), (2, 4)))
+        self.assertIsNone(board.get_piece_at((3, 4)))
+        board.unmake_move()
+        self.assertIsInstance(board.get_piece_at((3, 4)), Pawn)
+        self.assert_round_trip(board, ((3, 3), (2, 4)))
+
+    def test_promotion_round_trip(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        board.set_piece_at((7, 4), King('white'))
+        board.set_piece_at((0, 4), King('black'))
+        pawn = Pawn('white')
+        board.set_piece_at((1, 0), pawn)
+        board.make_move(((1, 0), (0, 0), 'N'))
+        self.assertIsInstance(board.get_piece_at((0, 0)), Knight)
+        board.unmake_move()
+        self.assertIs(board.get_piece_at((1, 0)), pawn)
+        self.assert_round_trip(board, ((1, 0), (0, 0), 'Q'))
+
+    def test_promotions_are_listed_per_piece(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        board.set_piece_at((7, 4), King('white'))
+        board.set_piece_at((0, 4), King('black'))
+        board.set_piece_at((1, 0), Pawn('white'))
+        promotions = [move for move in board.get_all_possible_moves('white') if move[0] == (1, 0)]
+        self.assertCountEqual(promotions, [((1, 0), (0, 0), letter) for letter in 'QRBN'])
+
+    def test_en_passant_exposing_king_is_illegal(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        board.set_piece_at((3, 0), King('white'))
+        board.set_piece_at((3, 7), Rook('black'))
+        board.set_piece_at((0, 4), King('black'))
+        board.set_piece_at((3, 1), Pawn('white'))
+        board.set_piece_at((1, 2), Pawn('black'))
+        board.move_piece((1, 2), (3, 2))
+        moves = board.get_all_possible_moves('white')
+        self.assertNotIn(((3, 1), (2, 2)), moves)
+        self.assertIn(((3, 1), (2, 1)), moves)
+
+
+class TestZobrist(unittest.TestCase):
+    def test_transposition_has_same_key(self):
+        first = Board()
+        for move in [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((7, 1), (5, 2)), ((0, 1), (2, 2))]:
+            first.make_move(move)
+        second = Board()
+        for move in [((7, 1), (5, 2)), ((0, 1), (2, 2)), ((7, 6), (5, 5)), ((0, 6), (2, 5))]:
+            second.make_move(move)
+        self.assertEqual(first.zobrist_key, second.zobrist_key)
+
+    def test_side_to_move_changes_key(self):
+        board = Board()
+        start_key = board.zobrist_key
+        board.make_move(((7, 6), (5, 5)))
+        self.assertEqual(board.side_to_move, 'black')
+        board.make_move(((0, 6), (2, 5)))
+        board.make_move(((5, 5), (7, 6)))
+        board.make_move(((2, 5), (0, 6)))
+        self.assertEqual(board.zobrist_key, start_key)
+        board.make_move(((7, 6), (5, 5)))
+        board.make_move(((0, 6), (2, 5)))
+        board.make_move(((5, 5), (7, 6)))
+        self.assertNotEqual(board.zobrist_key, start_key)
+
+    def test_castling_rights_change_key(self):
+        board = Board()
+        board.set_piece_at((7, 6), None)
+        board.set_piece_at((0, 6), None)
+        before = board.zobrist_key
+        board.make_move(((7, 7), (7, 6)))
+        board.make_move(((0, 7), (0, 6)))
+        board.make_move(((7, 6), (7, 7)))
+        board.make_move(((0, 6), (0, 7)))
+        # Same squares, but both kingside castling rights are gone
+        self.assertEqual(board.castling_rights(), 0b1010)
+        self.assertNotEqual(board.zobrist_key, before)
+
+    def test_incremental_key_matches_rehash(self):
+        board = Board()
+        keys = [board.zobrist_key]
+        for move in [((6, 4), (4, 4)), ((1, 3), (3, 3)), ((4, 4), (3, 4)),
+                     ((1, 5), (3, 5)), ((3, 4), (2, 5)), ((0, 6), (2, 5))]:
+            board.make_move(move)
+            keys.append(board.zobrist_key)
+            board.rehash()
+            self.assertEqual(board.zobrist_key, keys[-1])
+        keys.pop()
+        while board.undo_stack:
+            board.unmake_move()
+            self.assertEqual(board.zobrist_key, keys.pop())
+
+
+class TestPerft(unittest.TestCase):
+    def test_start_position(self):
+        board = Board()
+        self.assertEqual([board.perft(depth) for depth in (1, 2, 3)], [20, 400, 8902])
+        self.assertEqual(board.undo_stack, [])
+
+    def test_divide_sums_to_perft(self):
+        board = Board()
+        counts = board.divide(2)
+        self.assertEqual(len(counts), 20)
+        self.assertEqual(counts[((6, 4), (4, 4))], 20)
+        self.assertEqual(sum(counts.values()), 400)
+
+    def test_reference_positions(self):
+        for name in POSITIONS:
+            result = run_position(name, 2)
+            self.assertTrue(result['ok'], result)
+
+    def test_move_to_notation(self):
+        self.assertEqual(move_to_notation(((6, 4), (4, 4))), 'e2e4')
+        self.assertEqual(move_to_notation(((1, 0), (0, 0), 'N')), 'a7a8n')
+
+
+class TestParallel(unittest.TestCase):
+    def test_pack_round_trip(self):
+        board = Board()
+        board.make_move(((6, 4), (4, 4)))
+        board.make_move(((1, 0), (2, 0)))
+        board.make_move(((4, 4), (3, 4)))
+        board.make_move(((1, 3), (3, 3)))
+        packed = board.pack()
+        self.assertEqual(len(packed), 67)
+        restored = Board.unpack(packed)
+        self.assertEqual(restored.zobrist_key, board.zobrist_key)
+        self.assertEqual(restored.pack(), packed)
+        self.assertIn(((3, 4), (2, 3)), restored.get_all_possible_moves('white'))
+
+    def test_parallel_perft_matches_serial(self):
+        board = Board()
+        self.assertEqual(parallel_perft(board, 3, workers=2), 8902)
+        counts = parallel_divide(board, 3, workers=2, split_depth=2)
+        self.assertEqual(counts, board.divide(3))
+
+
+class TestEngine(unittest.TestCase):
+    def empty_board(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        return board
+
+    def test_finds_mate_in_one(self):
+        board = self.empty_board()
+        board.set_piece_at(notation_to_index('g1'), King('white'))
+        board.set_piece_at(notation_to_index('a1'), Rook('white'))
+        board.set_piece_at(notation_to_index('g8'), King('black'))
+        for square in ('f7', 'g7', 'h7'):
+            board.set_piece_at(notation_to_index(square), Pawn('black'))
+        result = Engine().search(board, depth=3)
+        self.assertEqual(result.move, (notation_to_index('a1'), notation_to_index('a8')))
+        self.assertEqual(result.score, MATE_SCORE - 1)
+        self.assertEqual(board.undo_stack, [])
+
+    def test_captures_hanging_queen(self):
+        board = self.empty_board()
+        board.set_piece_at(notation_to_index('e1'), King('white'))
+        board.set_piece_at(notation_to_index('e8'), King('black'))
+        board.set_piece_at(notation_to_index('c3'), Knight('white'))
+        board.set_piece_at(notation_to_index('d5'), Queen('black'))
+        result = Engine().search(board, depth=2)
+        self.assertEqual(result.move, (notation_to_index('c3'), notation_to_index('d5')))
+        self.assertGreater(result.score, 200)
+
+    def test_node_limit_restores_board(self):
+        board = Board()
+        key = board.zobrist_key
+        result = Engine().search(board, nodes=300)
+        self.assertLessEqual(result.nodes, 300)
+        self.assertIn(result.move, board.get_all_possible_moves('white'))
+        self.assertEqual(board.undo_stack, [])
+        self.assertEqual(board.zobrist_key, key)
+
+    def test_principal_variation_is_legal(self):
+        board = Board()
+        result = Engine().search(board, depth=3)
+        self.assertEqual(result.depth, 3)
+        for move in result.pv:
+            self.assertIn(move, board.get_all_possible_moves(board.side_to_move))
+            board.make_move(move)
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_store_and_probe(self):
+        table = TranspositionTable(1)
+        self.assertEqual(len(table.keys), 1024 * 1024 // 16)
+        move = ((1, 0), (0, 0), 'N')
+        table.store(12345, 7, -250, UPPER, move)
+        self.assertEqual(table.probe(12345), TTEntry(7, -250, UPPER, move))
+        self.assertIsNone(table.probe(54321))
+        self.assertEqual(table.stats['hits'], 1)
+        self.assertEqual(table.stats['misses'], 1)
+
+    def test_depth_preferred_and_always_replace_slots(self):
+        table = TranspositionTable(1)
+        deep, shallow, newer = 5, 5 + table.buckets, 5 + 2 * table.buckets
+        table.store(deep, 10, 1, EXACT)
+        table.store(shallow, 2, 2, EXACT)
+        # The deep entry keeps its slot, the shallow one takes the other
+        self.assertEqual(table.probe(deep).depth, 10)
+        self.assertEqual(table.probe(shallow).depth, 2)
+        table.store(newer, 3, 3, EXACT)
+        self.assertIsNone(table.probe(shallow))
+        self.assertEqual(table.stats['overwrites'], 1)
+        self.assertEqual(table.stats['collisions'], 1)
+        # After a new search the old deep entry may be replaced
+        table.new_search()
+        table.store(shallow, 1, 4, LOWER)
+        self.assertIsNone(table.probe(deep))
+
+    def test_keeps_move_when_storing_without_one(self):
+        table = TranspositionTable(1)
+        table.store(99, 3, 10, LOWER, ((6, 4), (4, 4)))
+        table.store(99, 4, 12, UPPER)
+        self.assertEqual(table.probe(99).move, ((6, 4), (4, 4)))
+
+    def test_engine_uses_table(self):
+        engine = Engine(hash_mb=1)
+        engine.search(Board(), depth=3)
+        self.assertGreater(engine.tt.stats['hits'], 0)
+        self.assertGreater(engine.tt.hashfull(), 0)
+
+
+class TestEvaluation(unittest.TestCase):
+    def assert_incremental(self, board):
+        self.assertEqual((board.mg_score, board.eg_score, board.phase), full_scores(board.bitboards))
+
+    def test_start_position_is_balanced(self):
+        board = Board()
+        self.assertEqual(board.phase, 24)
+        self.assertEqual(evaluate(board), 0)
+        board.make_move(((6, 4), (4, 4)))
+        self.assertLess(evaluate(board), 0)  # Black to move, White is better
+
+    def test_incremental_scores_follow_special_moves(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        board.set_piece_at((7, 4), King('white'))
+        board.set_piece_at((7, 7), Rook('white'))
+        board.set_piece_at((0, 4), King('black'))
+        board.set_piece_at((1, 0), Pawn('white'))
+        board.set_piece_at((3, 3), Pawn('white'))
+        board.set_piece_at((1, 4), Pawn('black'))
+        before = (board.mg_score, board.eg_score, board.phase)
+        for move in [((7, 4), (7, 6)), ((1, 4), (3, 4)), ((3, 3), (2, 4)),
+                     ((0, 4), (0, 3)), ((1, 0), (0, 0), 'Q')]:
+            board.make_move(move)
+            self.assert_incremental(board)
+        self.assertEqual(board.phase, 2 + 4)
+        while board.undo_stack:
+            board.unmake_move()
+        self.assertEqual((board.mg_score, board.eg_score, board.phase), before)
+
+    def test_promote_pawn_updates_scores(self):
+        board = Board()
+        board.grid = [[None for _ in range(8)] for _ in range(8)]
+        board.set_piece_at((7, 4), King('white'))
+        board.set_piece_at((0, 7), King('black'))
+        board.set_piece_at((1, 0), Pawn('white'))
+        board.move_piece((1, 0), (0, 0), promotion='N')
+        self.assert_incremental(board)
+        self.assertEqual(board.phase, 1)
+
+
+class TestFen(unittest.TestCase):
+    def test_round_trip(self):
+        fens = [STARTING_FEN] + [fen for fen, _ in POSITIONS.values()] + [
+            'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2',
+            '4k3/8/8/8/8/8/8/R3K2R b Q - 12 40',
+        ]
+        for fen in fens:
+            self.assertEqual(Board.from_fen(fen).to_fen(), fen)
+
+    def test_start_position_matches_default_board(self):
+        board = Board.from_fen(STARTING_FEN)
+        self.assertEqual(board.zobrist_key, Board().zobrist_key)
+        self.assertEqual(board.to_fen(), Board().to_fen())
+        self.assertFalse(board.get_piece_at((6, 0)).has_moved)
+
+    def test_castling_rights_are_kept_by_the_board(self):
+        board = Board.from_fen('r3k2r/8/8/8/8/8/8/R3K2R w Kq - 0 1')
+        self.assertEqual(board.castling, 0b1001)
+        # Pieces keep their has_moved flags for the old per-piece API
+        self.assertFalse(board.get_piece_at((7, 7)).has_moved)
+        self.assertTrue(board.get_piece_at((7, 0)).has_moved)
+        # Capturing the a8 rook takes away black's queenside right
+        board.make_move(((7, 0), (0, 0)))
+        self.assertEqual(board.to_fen(), 'R3k2r/8/8/8/8/8/8/4K2R b K - 0 1')
+        board.unmake_move()
+        self.assertEqual(board.castling, 0b1001)
+        # Editing a home square by hand re-derives the rights from the pieces
+        board.set_piece_at((0, 0), None)
+        self.assertEqual(board.to_fen(), '4k2r/8/8/8/8/8/8/R3K2R w K - 0 1')
+
+    def test_move_counters(self):
+        board = Board()
+        board.make_move(((7, 6), (5, 5)))
+        board.make_move(((0, 6), (2, 5)))
+        self.assertEqual((board.halfmove_clock, board.fullmove_number), (2, 2))
+        board.make_move(((6, 4), (4, 4)))
+        self.assertEqual(board.to_fen(),
+                         'rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq e3 0 2')
+        board.unmake_move()
+        self.assertEqual((board.halfmove_clock, board.fullmove_number), (2, 2))
+
+    def test_invalid_fen(self):
+        for fen in ['', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1',
+                    'rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+                    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1',
+                    'rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+                    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkx - 0 1',
+                    # En passant squares with no pawn behind them, or on the wrong rank
+                    '4k3/8/8/8/8/8/8/4K3 w - e3 0 1',
+                    '4k3/8/8/8/8/8/8/4K3 w - e6 0 1',
+                    '4k3/8/8/8/4P3/4N3/8/4K3 b - e3 0 1',
+                    'rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq e3 0 2',
+                    'rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq e 0 2']:
+            with self.assertRaises(ValueError):
+                Board.from_fen(fen)
+        board = Board.from_fen('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2')
+        self.assertEqual(board.to_fen(), 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2')
+
+
+SAMPLE_PGN = """[Event "Ruy Lopez"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 {A comment
+spanning [two] lines} a6 (3... Nf6 4. O-O) 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5
+7. Bb3 d6 8. c3 O-O 9. h3 $1 Nb8 10. d4 Nbd7 11. Nbd2 Bb7 1-0
+
+[Event "Promotion"]
+[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+
+1. a8=Q+ Kd7 2. Qb7+ Ke6 *
+[Event "Fool's mate"]
+1. f3 e5 2. g4 Qh4# 0-1
+
+[Event "Broken"]
+1. e4 e5 2. Ke3 1/2-1/2
+"""
+
+
+class TestSan(unittest.TestCase):
+    def test_parse_and_format(self):
+        board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+        legal = board.get_all_possible_moves('white')
+        for move in legal:
+            san = move_to_san(board, move, legal)
+            self.assertEqual(parse_san(board, san), move, san)
+        self.assertEqual(parse_san(board, 'O-O-O'), ((7, 4), (7, 2)))
+        self.assertEqual(move_to_san(board, ((7, 4), (7, 6))), 'O-O')
+        self.assertEqual(move_to_san(board, ((5, 5), (2, 5))), 'Qxf6')
+
+    def test_disambiguation_and_check(self):
+        board = Board.from_fen('4k3/8/8/8/8/8/4K3/R6R w - - 0 1')
+        self.assertEqual(move_to_san(board, ((7, 0), (7, 3))), 'Rad1')
+        self.assertEqual(move_to_san(board, ((7, 7), (0, 7))), 'Rh8+')
+        self.assertEqual(parse_san(board, 'Rhf1'), ((7, 7), (7, 5)))
+
+    def test_invalid_moves(self):
+        board = Board()
+        for san in ['Nd4', 'e5', 'Rf1', 'O-O', 'xyz']:
+            with self.assertRaises(ValueError):
+                parse_san(board, san)
+
+
+class TestPgn(unittest.TestCase):
+    def test_read_games_in_small_chunks(self):
+        games = list(read_games(SAMPLE_PGN.encode(), chunk_size=16))
+        self.assertEqual([game.headers['Event'] for game in games],
+                         ['Ruy Lopez', 'Promotion', "Fool's mate", 'Broken'])
+        self.assertEqual(games[0].moves[:6], ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6'])
+        self.assertEqual(len(games[0].moves), 22)
+        self.assertEqual([game.result for game in games], ['1-0', '*', '0-1', '1/2-1/2'])
+
+    def test_replay_games(self):
+        results = list(replay_games(StringIO(SAMPLE_PGN)))
+        self.assertEqual([result.error is None for result in results], [True, True, True, False])
+        self.assertIsInstance(results[1].board.get_piece_at((1, 1)), Queen)
+        fools = results[2].board
+        self.assertTrue(fools.is_in_check('white'))
+        self.assertEqual(fools.get_all_possible_moves('white'), [])
+        self.assertEqual(len(results[3].board.undo_stack), 2)
+
+    def test_replay_games_survives_a_bad_fen(self):
+        text = ('[Event "first"]\n\n1. e4 e5 *\n\n'
+                '[Event "bad"]\n[FEN "8/8/8 w - - 0 1"]\n\n1. e4 *\n\n'
+                '[Event "last"]\n\n1. d4 d5 2. c4 *\n\n')
+        results = list(replay_games(StringIO(text)))
+        self.assertEqual([result.game.headers['Event'] for result in results], ['first', 'bad', 'last'])
+        self.assertIsNone(results[1].board)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual([len(results[i].board.undo_stack) for i in (0, 2)], [2, 3])
+        self.assertTrue(results[0].error is None and results[2].error is None)
+
+
+class TestMoveApi(unittest.TestCase):
+    def test_apply_move(self):
+        board = Board()
+        result = board.apply_move('e2e4')
+        self.assertTrue(result.ok)
+        self.assertEqual(result.move, ((6, 4), (4, 4)))
+        self.assertIsNone(result.captured)
+        self.assertEqual(result.status.state, 'ongoing')
+        self.assertEqual(board.side_to_move, 'black')
+        board.apply_move(((1, 3), (3, 3)))
+        self.assertEqual(board.apply_move('e4d5').captured, 'p')
+
+    def test_illegal_moves_leave_board_unchanged(self):
+        board = Board.from_fen('4k3/8/8/8/8/8/4r3/4K3 w - - 0 1')
+        fen = board.to_fen()
+        self.assertEqual(board.apply_move('e1d2').error, "King would be in check")
+        self.assertEqual(board.apply_move('e1e3').error, "Illegal move")
+        self.assertEqual(board.apply_move('e1').error, "Invalid move notation")
+        self.assertEqual(board.to_fen(), fen)
+
+    def test_explicit_promotion(self):
+        board = Board.from_fen('4k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        result = board.apply_move(((1, 0), (0, 0)))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error, "Promotion piece required")
+        self.assertTrue(board.apply_move('a7a8n').ok)
+        self.assertIsInstance(board.get_piece_at((0, 0)), Knight)
+
+    def test_game_status(self):
+        board = Board()
+        for move in ('f2f3', 'e7e5', 'g2g4'):
+            board.apply_move(move)
+        result = board.apply_move('d8h4')
+        self.assertEqual(result.status, ('checkmate', 'black', True))
+        stalemate = Board.from_fen('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+        self.assertEqual(stalemate.game_status().state, 'stalemate')
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_quiet_game(self, mock_stdout):
+        game = Game(verbose=False)
+        game.board.set_fen('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+        game.current_player = 'black'
+        self.assertTrue(game.is_game_over())
+        self.assertEqual(mock_stdout.getvalue(), '')
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.games = set()
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+class TestServer(unittest.TestCase):
+    def test_moves_are_validated_and_pushed(self):
+        server = GameServer()
+        player, watcher = RecordingConnection(), RecordingConnection()
+        state = server.handle_request({'cmd': 'new', 'id': 7, 'legal': True}, player)
+        self.assertEqual((state['type'], state['id'], state['fen']), ('state', 7, STARTING_FEN))
+        self.assertEqual(len(state['legal']), 20)
+        game_id = state['game']
+        server.handle_request({'cmd': 'watch', 'game': game_id}, watcher)
+        reply = server.handle_request({'cmd': 'move', 'game': game_id, 'move': 'e2e5'}, player)
+        self.assertEqual(reply['error'], "Illegal move")
+        reply = server.handle_request({'cmd': 'move', 'game': game_id, 'move': 'e2e4'}, player)
+        self.assertEqual(reply['last'], 'e2e4')
+        self.assertEqual([message['last'] for message in watcher.sent], ['e2e4'])
+        self.assertEqual(player.sent, [])
+        self.assertEqual(server.stats()['moves'], 1)
+        server.disconnect(player)
+        server.disconnect(watcher)
+        self.assertEqual(server.games, {})
+
+    def test_unknown_requests(self):
+        server = GameServer()
+        connection = RecordingConnection()
+        self.assertEqual(server.handle_request({'cmd': 'move', 'game': 3}, connection)['error'],
+                         "Unknown game")
+        self.assertEqual(server.handle_request({'cmd': 'jump'}, connection)['type'], 'error')
+        self.assertEqual(server.handle_request({'cmd': 'new', 'fen': 'bad'}, connection)['type'],
+                         'error')
+
+    def test_malformed_requests(self):
+        server = GameServer()
+        connection = RecordingConnection()
+        for request in [
+            {'cmd': 'new', 'fen': '8/8/8/8/8/8/8/4K3 w - - 0 1'},
+            {'cmd': 'new', 'fen': '4k3/8/8/8/8/8/8/4K3 w - e3 0 1'},
+            {'cmd': 'new', 'fen': ['not', 'a', 'string']},
+            {'cmd': 'state', 'game': [1]},
+            {'cmd': 'move', 'game': {'id': 1}, 'move': 'e2e4'},
+            {'cmd': 'watch', 'game': True},
+        ]:
+            self.assertEqual(server.handle_request(request, connection)['type'], 'error', request)
+        self.assertEqual(server.games, {})
+        self.assertEqual(connection.games, set())
+
+    def test_bad_request_keeps_the_connection(self):
+        async def session():
+            server = GameServer()
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            replies = []
+            for request in ({'cmd': 'new'}, {'cmd': 'state', 'game': [1]},
+                            {'cmd': 'new', 'fen': '8/8/8/8/8/8/8/4K3 w - - 0 1'}, {'cmd': 'state', 'game': 1}):
+                writer.write(json.dumps(request).encode() + b'\n')
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            return replies
+
+        replies = asyncio.run(session())
+        self.assertEqual([reply['type'] for reply in replies], ['state', 'error', 'error', 'state'])
+
+    def test_oversized_line_keeps_the_connection(self):
+        async def session():
+            server = GameServer()
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            replies = []
+            for line in (b'{"cmd": "new"}\n', b'x' * 100000 + b'\n', b'{"cmd": "state", "game": 1}\n'):
+                writer.write(line)
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            return replies
+
+        replies = asyncio.run(session())
+        self.assertEqual([reply['type'] for reply in replies], ['state', 'error', 'state'])
+        self.assertEqual(replies[1]['error'], "Request too long")
+
+    def test_load_test_over_tcp(self):
+        summary = asyncio.run(loadtest.run(connections=2, games=3, plies=6))
+        self.assertEqual(summary['games'], 6)
+        self.assertEqual(summary['moves'], 36)
+        self.assertIsNotNone(summary['server_latency_ms']['p50'])
+
+    def test_percentiles(self):
+        samples = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentiles(samples, (50, 99)), {'p50': 50.0, 'p99': 99.0})
+        # Nearest rank: the smallest sample with at least p% of the samples at or below it
+        self.assertEqual(percentiles([0.001, 0.002, 0.003, 0.004, 0.005], (50, 90, 10)),
+                         {'p50': 3.0, 'p90': 5.0, 'p10': 1.0})
+
+
+class TestUci(unittest.TestCase):
+    def run_commands(self, uci, *lines):
+        for line in lines:
+            uci.handle(line)
+        uci.stop()
+        return uci.output.getvalue().splitlines()
+
+    def test_handshake(self):
+        output = self.run_commands(UciEngine(StringIO()), 'uci', 'isready')
+        self.assertEqual(output[-2:], ['uciok', 'readyok'])
+
+    def test_position_and_go(self):
+        uci = UciEngine(StringIO())
+        uci.handle('position startpos moves e2e4 e7e5 g1f3')
+        self.assertEqual(uci.board.side_to_move, 'black')
+        output = self.run_commands(uci, 'position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'go depth 3')
+        self.assertEqual(output[-1], 'bestmove a1a8')
+        self.assertIn('score mate 1', output[-2])
+
+    def test_stop_ends_infinite_search(self):
+        uci = UciEngine(StringIO())
+        uci.handle('go infinite')
+        uci.handle('isready')
+        self.assertIn('readyok', uci.output.getvalue())
+        self.assertNotIn('bestmove', uci.output.getvalue())
+        uci.handle('stop')
+        self.assertTrue(uci.output.getvalue().splitlines()[-1].startswith('bestmove '))
+
+    def test_node_limit(self):
+        output = self.run_commands(UciEngine(StringIO()), 'go nodes 500')
+        self.assertRegex(output[-1], r'^bestmove [a-h][1-8][a-h][1-8]$')
+
+    def test_time_allocation(self):
+        soft, hard = allocate_time(60000, 1000)
+        self.assertGreater(soft, 1.0)
+        self.assertLess(hard, 60 * 0.8)
+        soft, hard = allocate_time(100, 0, moves_to_go=1)
+        self.assertLessEqual(hard, 0.1)
+        self.assertEqual(format_score(MATE_SCORE - 3), 'mate 2')
+        self.assertEqual(format_score(-(MATE_SCORE - 2)), 'mate -1')
+
+
+class TestTournament(unittest.TestCase):
+    def test_parse_player(self):
+        self.assertEqual(tournament.parse_player('random'), ('random', {}))
+        self.assertEqual(tournament.parse_player('engine:nodes=500,hash=1'),
+                         ('engine', {'nodes': 500, 'hash': 1}))
+        self.assertEqual(tournament.parse_player('engine'), ('engine', {'depth': 2}))
+        with self.assertRaises(ValueError):
+            tournament.parse_player('engine:speed=3')
+
+    def test_adjudication(self):
+        for fen, expected in [
+            ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', ('1/2-1/2', 'stalemate')),
+            ('R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1', ('1-0', 'checkmate')),
+            ('4k3/8/8/8/8/8/4R3/4K3 w - - 100 80', ('1/2-1/2', '50-move rule')),
+            ('4k3/8/8/8/8/8/4N3/4K3 w - - 0 1', ('1/2-1/2', 'insufficient material')),
+        ]:
+            board = Board.from_fen(fen)
+            self.assertEqual(tournament.adjudicate(board), expected, fen)
+        board = Board.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')
+        for move in ['a1a2', 'e8d8', 'a2a1', 'd8e8'] * 2:
+            self.assertIsNone(tournament.adjudicate(board))
+            board.apply_move(move)
+        self.assertEqual(tournament.adjudicate(board), ('1/2-1/2', 'threefold repetition'))
+
+    def test_elo_difference(self):
+        self.assertEqual(tournament.elo_difference(10, 0, 10)[0], 0.0)
+        elo, error = tournament.elo_difference(60, 20, 20)
+        self.assertAlmostEqual(elo, 147.2, places=1)
+        self.assertTrue(0 < error < elo)
+        self.assertEqual(tournament.elo_difference(5, 0, 0)[1], math.inf)
+
+    def test_games_are_streamed_and_resumed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = os.path.join(directory, 'results.jsonl')
+            pgn_path = os.path.join(directory, 'games.pgn')
+            report = tournament.run_tournament('random', 'engine:depth=1', 2, workers=1,
+                                               out=out, pgn=pgn_path, max_plies=30)
+            self.assertEqual(report['games'], 2)
+            report = tournament.run_tournament('random', 'engine:depth=1', 3, workers=1, out=out,
+                                               pgn=pgn_path, resume=True, max_plies=30)
+            self.assertEqual(report['wins'] + report['draws'] + report['losses'], 3)
+            with open(out) as handle:
+                indices = sorted(json.loads(line)['index'] for line in handle)
+            self.assertEqual(indices, [0, 1, 2])
+            results = list(replay_games(pgn_path))
+            self.assertEqual(len(results), 3)
+            self.assertTrue(all(result.error is None for result in results))
+
+    def test_same_player_on_both_sides(self):
+        records = [{'index': index, 'white': 'random', 'black': 'random', 'result': result}
+                   for index, result in enumerate(['1-0', '1-0', '0-1', '1/2-1/2'])]
+        # Games 0 and 2 have the first player as white, games 1 and 3 as black
+        self.assertEqual([tournament.score_for(record) for record in records], [1.0, 0.0, 0.0, 0.5])
+        report = tournament.summarize(records, 'random', 'random')
+        self.assertEqual((report['wins'], report['draws'], report['losses']), (1, 1, 2))
+        self.assertFalse(math.isinf(report['elo']))
+
+    def test_resume_cuts_off_a_partial_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            out = os.path.join(directory, 'results.jsonl')
+            tournament.run_tournament('random', 'random', 1, workers=1, out=out, max_plies=10)
+            with open(out, 'a') as handle:
+                handle.write('{"index": 1, "res')
+            report = tournament.run_tournament('random', 'random', 2, workers=1, out=out,
+                                               resume=True, max_plies=10)
+            self.assertEqual(report['games'], 2)
+            with open(out) as handle:
+                indices = sorted(json.loads(line)['index'] for line in handle)
+            self.assertEqual(indices, [0, 1])
+
+
+class TestMovePicker(unittest.TestCase):
+    def test_yields_every_legal_move_once(self):
+        for fen, _ in POSITIONS.values():
+            board = Board.from_fen(fen)
+            legal = board.get_all_possible_moves(board.side_to_move)
+            picked = list(pick_moves(board, hash_move=legal[-1], killers=(legal[0], None)))
+            self.assertEqual(sorted(picked), sorted(legal), fen)
+            self.assertEqual(picked[0], legal[-1])
+
+    def test_stage_order(self):
+        # Captures that do not lose material come right after the hash move,
+        # then the killer and the best history move; losing captures come last
+        board = Board.from_fen(POSITIONS['kiwipete'][0])
+        killer = notation_to_move('a2a3')
+        history = {notation_to_move('g2g3'): 50}
+        picked = [move_to_notation(move) for move in
+                  pick_moves(board, notation_to_move('e1g1'), (killer, None), history)]
+        self.assertEqual(picked[0], 'e1g1')
+        captures = [move for move in picked[1:] if is_capture(board, notation_to_move(move))]
+        good = [move for move in captures if board.see(notation_to_move(move)) >= 0]
+        self.assertEqual(picked[1:1 + len(good)], good)
+        self.assertEqual(picked[1 + len(good):3 + len(good)], ['a2a3', 'g2g3'])
+        self.assertEqual(picked[-len(captures) + len(good):], captures[len(good):])
+        self.assertTrue(all(board.see(notation_to_move(move)) < 0 for move in captures[len(good):]))
+
+    def test_underpromotions_last(self):
+        board = Board.from_fen('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1')
+        picked = list(pick_moves(board))
+        self.assertEqual(picked[0], ((1, 1), (0, 1), 'Q'))
+        self.assertEqual([move[2] for move in picked[-3:]], ['R', 'B', 'N'])
+
+    def test_pseudo_legal_split(self):
+        board = Board.from_fen(POSITIONS['kiwipete'][0])
+        color = board.side_to_move
+        tactical = board.get_pseudo_legal_moves(color, quiets=False)
+        quiet = board.get_pseudo_legal_moves(color, captures=False)
+        self.assertEqual(sorted(tactical + quiet), sorted(board.get_pseudo_legal_moves(color)))
+        self.assertTrue(all(is_capture(board, move) for move in tactical))
+        self.assertFalse(any(is_capture(board, move) for move in quiet))
+        self.assertTrue(board.is_pseudo_legal(((7, 4), (7, 6))))
+        self.assertFalse(board.is_pseudo_legal(((7, 4), (5, 4))))
+        self.assertFalse(board.is_pseudo_legal(((0, 4), (0, 5))))
+
+
+class TestLegalMoves(unittest.TestCase):
+    def brute_force(self, board, color):
+        legal = []
+        for move in board.get_pseudo_legal_moves(color):
+            board.make_move(move)
+            if not board.is_in_check(color):
+                legal.append(move)
+            board.unmake_move()
+        return legal
+
+    def test_matches_make_unmake_filter(self):
+        rng = random.Random(17)
+        for fen, _ in POSITIONS.values():
+            board = Board.from_fen(fen)
+            for _ in range(40):
+                color = board.side_to_move
+                moves = board.get_all_possible_moves(color)
+                self.assertEqual(moves, self.brute_force(board, color), board.to_fen())
+                if not moves:
+                    break
+                board.make_move(rng.choice(moves))
+
+    def test_pinned_piece_stays_on_ray(self):
+        board = Board.from_fen('4k3/4r3/8/8/8/8/4R3/4K3 w - - 0 1')
+        self.assertEqual(board.pinned_pieces('white'),
+                         {52: BETWEEN[60][12] | (1 << 12)})
+        rook_moves = {move[1] for move in board.get_all_possible_moves('white') if move[0] == (6, 4)}
+        self.assertEqual(rook_moves, {(row, 4) for row in range(1, 6)})
+
+    def test_evasions(self):
+        # Knight check: capture the knight or move the king
+        board = Board.from_fen('4k3/8/8/8/8/3n4/8/R3K2R w KQ - 0 1')
+        self.assertEqual(board.attackers_to(60, 'white'), 1 << 43)
+        moves = board.get_all_possible_moves('white')
+        self.assertTrue(all(move[0] == (7, 4) for move in moves))
+        # Double check: only the king may move
+        board = Board.from_fen('4k3/8/8/8/1b6/8/4r3/R3K3 w Q - 0 1')
+        moves = board.get_all_possible_moves('white')
+        self.assertTrue(moves and all(move[0] == (7, 4) for move in moves))
+
+    def test_en_passant_discovered_check(self):
+        # Capturing en passant would expose the king along the fifth rank
+        board = Board.from_fen('8/8/8/K1pP3r/8/8/8/7k w - c6 0 2')
+        self.assertNotIn(((3, 3), (2, 2)), board.get_all_possible_moves('white'))
+
+    def test_between(self):
+        self.assertEqual(BETWEEN[0][63], sum(1 << (9 * i) for i in range(1, 7)))
+        self.assertEqual(BETWEEN[0][2], 1 << 1)
+        self.assertEqual(BETWEEN[0][17], 0)
+
+
+class TestCompactPosition(unittest.TestCase):
+    def test_pieces_have_no_instance_dict(self):
+        for piece_class in (Pawn, Knight, Bishop, Rook, Queen, King):
+            piece = piece_class('black')
+            self.assertFalse(hasattr(piece, '__dict__'))
+            self.assertEqual(SYMBOL_INDEX[piece.symbol], piece.code)
+            self.assertEqual(piece.code, piece.kind + 6)
+
+    def test_squares_follow_the_grid(self):
+        rng = random.Random(18)
+        board = Board.from_fen(POSITIONS['kiwipete'][0])
+        for _ in range(60):
+            moves = board.get_all_possible_moves(board.side_to_move)
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            expected = bytes(piece.code + 1 if piece else 0 for row in board.grid for piece in row)
+            self.assertEqual(bytes(board.squares), expected)
+        while board.undo_stack:
+            board.unmake_move()
+        self.assertEqual(board.to_fen(), POSITIONS['kiwipete'][0])
+
+    def test_pack_is_67_bytes(self):
+        board = Board.from_fen(POSITIONS['kiwipete'][0])
+        packed = board.pack()
+        self.assertEqual(len(packed), 67)
+        self.assertEqual(packed[:64], bytes(board.squares))
+        self.assertEqual(Board.unpack(packed).to_fen(), board.to_fen())
+
+    def test_castling_rights_follow_moves(self):
+        board = Board.from_fen('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+        board.make_move(((7, 7), (7, 6)))
+        self.assertEqual(board.castling, 0b1110)
+        board.make_move(((0, 4), (0, 3)))
+        self.assertEqual(board.castling, 0b0010)
+        board.unmake_move()
+        board.unmake_move()
+        self.assertEqual(board.castling, 0b1111)
+
+
+class TestDrawRules(unittest.TestCase):
+    KNIGHT_SHUFFLE = ['g1f3', 'g8f6', 'f3g1', 'f6g8']
+
+    def test_repetition_count(self):
+        board = Board()
+        self.assertEqual(board.repetition_count(), 1)
+        for count in (2, 3):
+            for move in self.KNIGHT_SHUFFLE:
+                board.apply_move(move)
+            self.assertEqual(board.repetition_count(), count)
+        board.unmake_move()
+        self.assertEqual(board.repetition_count(), 2)
+        self.assertEqual(len(board.key_history), len(board.undo_stack))
+
+    def test_scan_stops_at_irreversible_move(self):
+        board = Board()
+        for move in self.KNIGHT_SHUFFLE:
+            board.apply_move(move)
+        self.assertEqual(board.repetition_count(), 2)
+        board.apply_move('e2e4')
+        self.assertEqual(board.halfmove_clock, 0)
+        self.assertEqual(board.repetition_count(), 1)
+
+    def test_threefold_and_fivefold_repetition(self):
+        board = Board()
+        for _ in range(2):
+            for move in self.KNIGHT_SHUFFLE:
+                board.apply_move(move)
+        self.assertEqual(board.game_status().state, 'threefold_repetition')
+        self.assertEqual(board.game_status(claim_draws=False).state, 'ongoing')
+        for _ in range(2):
+            for move in self.KNIGHT_SHUFFLE:
+                board.apply_move(move)
+        self.assertEqual(board.game_status(claim_draws=False).state, 'fivefold_repetition')
+
+    def test_move_rules(self):
+        board = Board.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 99 80')
+        self.assertEqual(board.game_status().state, 'ongoing')
+        board.apply_move('a1a2')
+        self.assertEqual(board.game_status().state, 'fifty_moves')
+        self.assertEqual(board.game_status(claim_draws=False).state, 'ongoing')
+        board = Board.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 150 100')
+        self.assertEqual(board.game_status(claim_draws=False).state, 'seventyfive_moves')
+        # Mate delivered on the 75th move still counts
+        board = Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 149 100')
+        board.apply_move('a1a8')
+        self.assertEqual(board.game_status().state, 'checkmate')
+
+    def test_game_ends_in_draw(self):
+        game = Game(verbose=False)
+        for move in self.KNIGHT_SHUFFLE * 2:
+            self.assertFalse(game.is_game_over())
+            game.board.apply_move(move)
+            game.switch_player()
+        self.assertTrue(game.is_game_over())
+
+
+class TestStaticExchange(unittest.TestCase):
+    def see(self, fen, move):
+        return Board.from_fen(fen).see(notation_to_move(move))
+
+    def test_undefended_and_defended_captures(self):
+        self.assertEqual(self.see('4k3/8/8/3p4/8/8/8/3QK3 w - - 0 1', 'd1d5'), 100)
+        self.assertEqual(self.see('4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1', 'd1d5'), -800)
+        self.assertEqual(self.see('1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1', 'e1e5'), 100)
+
+    def test_xray_attackers(self):
+        # The queen behind the rook joins in once the rook has captured
+        self.assertEqual(self.see('3rk3/8/8/3p4/8/8/3R4/3QK3 w - - 0 1', 'd2d5'), 100)
+        self.assertEqual(self.see('1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1',
+                                  'd3e5'), -220)
+
+    def test_king_only_recaptures_undefended(self):
+        self.assertEqual(self.see('3k4/8/8/8/8/8/3q4/3RK3 b - - 0 1', 'd2d1'), -400)
+        # The rook behind the queen defends d1, so the king cannot take back
+        self.assertEqual(self.see('3r3k/8/8/8/8/8/3q4/3RK3 b - - 0 1', 'd2d1'), 500)
+
+    def test_en_passant_and_promotion(self):
+        self.assertEqual(self.see('k7/8/8/8/3pP3/8/8/K7 b - e3 0 1', 'd4e3'), 100)
+        self.assertEqual(self.see('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'b7b8q'), 800)
+        self.assertEqual(self.see('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1', 'a7b8q'), 1300)
+        self.assertEqual(self.see('r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'b7b8q'), -100)
+
+    def test_board_is_unchanged(self):
+        board = Board.from_fen(POSITIONS['kiwipete'][0])
+        before = (board.zobrist_key, board.occupied, list(board.bitboards), bytes(board.squares))
+        for move in board.get_all_possible_moves('white'):
+            board.see(move)
+        self.assertEqual((board.zobrist_key, board.occupied, list(board.bitboards),
+                          bytes(board.squares)), before)
+
+
+class TestOpeningBook(unittest.TestCase):
+    GAMES = (
+        '[Result "1-0"]\n\n1. e4 e5 2. Nf3 Nc6 1-0\n\n'
+        '[Result "1/2-1/2"]\n\n1. e4 c5 2. Nf3 1/2-1/2\n\n'
+        '[Result "0-1"]\n\n1. d4 d5 0-1\n\n'
+    )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.pgn_path = os.path.join(self.directory, 'games.pgn')
+        with open(self.pgn_path, 'w') as handle:
+            handle.write(self.GAMES)
+        self.book_path = os.path.join(self.directory, 'book.bin')
+
+    def open_book(self, *sources, plies=20):
+        compile_book(list(sources) or [self.pgn_path], self.book_path, plies)
+        book = OpeningBook(self.book_path)
+        self.addCleanup(book.close)
+        return book
+
+    def test_records_are_sorted(self):
+        book = self.open_book()
+        self.assertEqual(os.path.getsize(self.book_path), len(book) * RECORD.size)
+        with open(self.book_path, 'rb') as handle:
+            data = handle.read()
+        keys = [RECORD.unpack_from(data, offset)[:2] for offset in range(0, len(data), RECORD.size)]
+        self.assertEqual(keys, sorted(keys))
+
+    def test_weights_follow_results(self):
+        book = self.open_book()
+        board = Board()
+        moves = {move_to_notation(entry.move): entry.weight for entry in book.moves(board)}
+        # The lost game's 1. d4 gets no weight and is left out
+        self.assertEqual(moves, {'e2e4': 3})
+        board.apply_move('e2e4')
+        self.assertEqual([(move_to_notation(entry.move), entry.weight) for entry in book.moves(board)],
+                         [('c7c5', 1)])
+        self.assertEqual(book.choose(Board()), notation_to_move('e2e4'))
+        self.assertEqual(book.lookup(12345), [])
+
+    def test_plies_limit_and_epd(self):
+        epd_path = os.path.join(self.directory, 'openings.epd')
+        with open(epd_path, 'w') as handle:
+            handle.write(f'{" ".join(STARTING_FEN.split()[:4])} bm Nf3; id "start";\n')
+        book = self.open_book(self.pgn_path, epd_path, plies=1)
+        self.assertEqual(sorted(move_to_notation(entry.move) for entry in book.moves(Board())),
+                         ['e2e4', 'g1f3'])
+        board = Board()
+        board.apply_move('e2e4')
+        self.assertEqual(book.moves(board), [])
+        rng = random.Random(1)
+        self.assertIn(move_to_notation(book.choose(Board(), rng)), ('e2e4', 'g1f3'))
+
+    def test_invalid_and_empty_files(self):
+        with open(self.book_path, 'wb') as handle:
+            handle.write(b'\x00' * 10)
+        with self.assertRaises(ValueError):
+            OpeningBook(self.book_path)
+        empty = os.path.join(self.directory, 'empty.pgn')
+        open(empty, 'w').close()
+        book = self.open_book(empty)
+        self.assertEqual(len(book), 0)
+        self.assertIsNone(book.choose(Board()))
+
+    def test_engine_and_uci_use_the_book(self):
+        book = self.open_book()
+        result = Engine(book=book).search(Board(), depth=3)
+        self.assertEqual((move_to_notation(result.move), result.depth), ('e2e4', 0))
+        uci = UciEngine(StringIO())
+        for line in (f'setoption name BookFile value {self.book_path}', 'position startpos', 'go depth 3'):
+            uci.handle(line)
+        uci.stop()
+        self.assertEqual(uci.output.getvalue().splitlines()[-1], 'bestmove e2e4')
+        uci.handle('setoption name BookFile value <empty>')
+        self.assertIsNone(uci.engine.book)
+
+
+    def test_tournament_opens_the_book_once(self):
+        self.open_book()
+        spec = f'engine:depth=1,book={self.book_path}'
+        with patch('tournament.OpeningBook', wraps=OpeningBook) as opened:
+            players = [tournament.make_player(spec, random.Random(0)) for _ in range(3)]
+            self.addCleanup(lambda: tournament._books.pop(self.book_path).close())
+            self.assertEqual(opened.call_count, 1)
+        self.assertEqual(players[2](Board()), notation_to_move('e2e4'))
+
+class TestTablebase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        tablebase.generate('KQK', cls.directory.name, workers=1)
+        cls.tablebase = tablebase.Tablebase(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def probe(self, fen):
+        return self.tablebase.probe(Board.from_fen(fen))
+
+    def test_material_names(self):
+        self.assertEqual(tablebase.material_name('Kkq'), ('KQK', True))
+        self.assertEqual(tablebase.material_name('KNkbp'), ('KBPKN', True))
+        self.assertEqual(tablebase.material_name('KRkr'), ('KRKR', False))
+        with self.assertRaises(ValueError):
+            tablebase.generate('KXK', self.directory.name)
+
+    def test_known_results(self):
+        self.assertEqual(self.probe('k7/8/1K6/8/8/8/7Q/8 w - - 0 1'), (1, 1))
+        self.assertEqual(self.probe('k7/1Q6/1K6/8/8/8/8/8 b - - 0 1'), (-1, 0))
+        # Black takes the undefended queen
+        self.assertEqual(self.probe('8/8/8/8/8/2k5/3Q4/7K b - - 0 1'), (0, None))
+        # The longest KQK win is 10 moves
+        result = self.probe('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+        self.assertEqual(result.wdl, 1)
+        self.assertLessEqual(result.dtm, 19)
+
+    def test_colors_and_symmetry(self):
+        white = self.probe('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+        self.assertEqual(self.probe('kq6/8/8/8/4K3/8/8/8 b - - 0 1'), white)
+        self.assertEqual(self.probe('8/8/8/3k4/8/8/8/6QK w - - 0 1'), white)
+
+    def test_best_move_mates_in_time(self):
+        board = Board.from_fen('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+        dtm = self.tablebase.probe(board).dtm
+        for _ in range(dtm):
+            board.make_move(self.tablebase.best_move(board))
+        self.assertEqual(board.game_status().state, 'checkmate')
+
+    def test_uncovered_positions(self):
+        self.assertIsNone(self.probe('8/8/8/4k3/8/8/8/KR6 w - - 0 1'))
+        self.assertIsNone(self.probe(STARTING_FEN))
+        self.assertEqual(self.probe('8/8/8/4k3/8/8/8/KN6 w - - 0 1'), (0, None))
+
+    def test_engine_and_game_use_the_tablebase(self):
+        board = Board.from_fen('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+        result = Engine(tablebase=self.tablebase).search(board, depth=3)
+        self.assertEqual(result.depth, 0)
+        self.assertEqual(result.score, MATE_SCORE - self.tablebase.probe(board).dtm)
+        self.assertTrue(Game(board, verbose=False, tablebase=self.tablebase).is_game_over())
+        self.assertFalse(Game(verbose=False, tablebase=self.tablebase).is_game_over())
+
+    def test_capture_is_the_only_move_and_wins(self):
+        # r6Q/8/8/8/8/8/2k5/K7 w: Qxa8 is forced and wins, so the position
+        # must be stored as a win. The KQKR table is too slow to build here,
+        # so the second pass runs on this one position of it.
+        material = tablebase._material('KQKR')
+        fen_board = Board.from_fen('r6Q/8/8/8/8/8/2k5/K7 w - - 0 1')
+        squares = [next(square for square in iter_bits(fen_board.occupied)
+                        if PIECE_SYMBOLS[fen_board.squares[square] - 1] == symbol)
+                   for symbol in material.pieces]
+        squares = list(material.canonical(squares))
+        board = Board('8/8/8/8/8/8/8/8 w - - 0 1')
+        for symbol, square in zip(material.pieces, squares):
+            piece = PIECE_CLASSES[symbol.upper()]('white' if symbol.isupper() else 'black')
+            piece.has_moved = True
+            board.set_piece_at(divmod(square, 8), piece)
+        scan = tablebase._scan_position(board, material, self.tablebase, squares, 'white')
+        self.assertEqual(scan[0], 0)
+        self.assertTrue(scan[1])
+        size = material.size
+        scans = {color: (array('l', [-1]) * size, array('H', bytes(2 * size)), array('H', bytes(2 * size)))
+                 for color in ('white', 'black')}
+        index = material.index_of(squares)
+        for values, value in zip(scans['white'], scan):
+            values[index] = value
+        stored = tablebase._solve(material, scans)['white'][index]
+        # An odd distance to mate is a win for the side to move
+        self.assertEqual(stored, scan[1])
+        self.assertEqual((stored - 1) % 2, 1)
+
+
+@unittest.skipUnless(features.np is not None, "NumPy is not installed")
+class TestFeatures(unittest.TestCase):
+    FENS = [
+        STARTING_FEN,
+        POSITIONS['kiwipete'][0],
+        'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+        '8/8/8/4k3/8/8/8/KQ6 b - - 0 1',
+    ]
+
+    def test_encode(self):
+        batch = features.encode(self.FENS)
+        self.assertEqual(batch.squares.shape, (4, 64))
+        self.assertEqual(list(batch.side), [0, 0, 0, 1])
+        self.assertEqual(batch.castling[0].tolist(), [1, 1, 1, 1])
+        self.assertEqual(batch.castling[3].tolist(), [0, 0, 0, 0])
+        self.assertEqual(list(batch.en_passant), [-1, -1, 5, -1])
+        self.assertEqual(bytes(batch.squares[1]), bytes(Board.from_fen(self.FENS[1]).squares))
+
+    def test_planes_match_bitboards(self):
+        boards = [Board.from_fen(fen) for fen in self.FENS]
+        batch_planes = features.planes(features.encode(boards))
+        self.assertEqual(batch_planes.shape, (4, 12, 64))
+        for board, board_planes in zip(boards, batch_planes):
+            for index, bitboard in enumerate(board.bitboards):
+                self.assertEqual(set(board_planes[index].nonzero()[0]), set(iter_bits(bitboard)))
+
+    def test_evaluation_matches_evaluate(self):
+        boards = [Board.from_fen(fen) for fen in self.FENS]
+        scores = features.evaluate_batch(features.encode(boards))
+        self.assertEqual(scores.tolist(), [evaluate(board) for board in boards])
+
+    def test_pgn_stream(self):
+        text = '[Event "a"]\n\n1. e4 e5 2. Nf3 Nc6 1-0\n\n[Event "b"]\n\n1. d4 Qxh7 0-1\n'
+        batch = features.encode(features.pgn_positions(StringIO(text)))
+        # The second game stops at its illegal move
+        self.assertEqual(len(batch.squares), 5)
+        self.assertEqual(list(batch.side), [1, 0, 1, 0, 1])
+        self.assertEqual(len(features.encode([]).squares), 0)
+
+
+@unittest.skipIf(features.np is not None, "NumPy is installed")
+class TestFeaturesWithoutNumpy(unittest.TestCase):
+    def test_requires_numpy(self):
+        with self.assertRaises(ImportError):
+            features.encode([STARTING_FEN])
+
+
+class TestArchive(unittest.TestCase):
+    GAMES = (
+        '[Result "1-0"]\n\n1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0\n\n'
+        '[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]\n[Result "*"]\n\n1. a8=N Kd7 *\n\n'
+    )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'games.pga')
+        self.pgn_path = os.path.join(directory.name, 'games.pgn')
+        with open(self.pgn_path, 'w') as handle:
+            handle.write(self.GAMES)
+
+    def open_reader(self):
+        reader = archive.ArchiveReader(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_position_round_trip(self):
+        for fen in ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 3"):
+            board = Board.from_fen(fen)
+            data = archive.pack_position(board)
+            self.assertEqual(len(data), archive.POSITION_SIZE)
+            self.assertEqual(archive.unpack_position(data).pack(), board.pack())
+
+    def test_games_and_positions(self):
+        played = Board()
+        for notation in ('e2e4', 'e7e5', 'g1f3'):
+            played.apply_move(notation)
+        position = Board.from_fen("8/8/8/4k3/8/8/8/KQ6 b - - 0 1")
+        with archive.ArchiveWriter(self.path) as writer:
+            writer.add_board(played, '1/2-1/2')
+            writer.add_position(position)
+        # add_board leaves the board as it was
+        self.assertEqual(len(played.undo_stack), 3)
+        reader = self.open_reader()
+        self.assertEqual(len(reader), 2)
+        game = reader[0]
+        self.assertIsNone(game.start)
+        self.assertEqual(game.result, '1/2-1/2')
+        self.assertEqual([decode_move(code) for code in game.moves],
+                         [record[0] for record in played.undo_stack])
+        boards = [board.pack() for board in reader.replay(0)]
+        self.assertEqual(len(boards), 4)
+        self.assertEqual(boards[-1], played.pack())
+        self.assertEqual(next(reader.replay(-1)).pack(), position.pack())
+        with self.assertRaises(IndexError):
+            reader[2]
+        with self.assertRaises(ValueError):
+            writer.add_game([], 'win')
+
+    def test_block_index(self):
+        moves = [notation_to_move(notation) for notation in ('g1f3', 'g8f6', 'f3g1', 'f6g8')]
+        count = 2 * archive.BLOCK_SIZE + 5
+        with archive.ArchiveWriter(self.path) as writer:
+            for number in range(count):
+                writer.add_game(moves[:number % 5])
+        reader = self.open_reader()
+        self.assertEqual(len(reader), count)
+        self.assertEqual([len(game.moves) for game in reader], [number % 5 for number in range(count)])
+        for number in (0, archive.BLOCK_SIZE - 1, archive.BLOCK_SIZE, count - 1):
+            self.assertEqual(len(reader[number].moves), number % 5)
+
+    def test_convert_pgn(self):
+        self.assertEqual(archive.convert_pgn(self.pgn_path, self.path), (2, 0))
+        reader = self.open_reader()
+        self.assertEqual([game.result for game in reader], ['1-0', '*'])
+        final = None
+        for final in reader.replay(0):
+            pass
+        self.assertEqual(final.game_status()[0], 'checkmate')
+        boards = [board.pack() for board in reader.replay(1)]
+        self.assertEqual(boards[0], Board.from_fen("4k3/P7/8/8/8/8/8/4K3 w - - 0 1").pack())
+        self.assertEqual(Board.unpack(boards[1]).get_piece_at((0, 0)).symbol, 'N')
+        # Header, two games of 7 and 2 moves (the second with its start position) and one index entry
+        self.assertEqual(os.path.getsize(self.path), 24 + (4 + 7 * 2) + (4 + archive.POSITION_SIZE + 2 * 2) + 8)
+
+    def test_games_outlive_the_reader(self):
+        with archive.ArchiveWriter(self.path) as writer:
+            writer.add_game([notation_to_move('e2e4')], '1-0', Board())
+        with archive.ArchiveReader(self.path) as reader:
+            games = list(reader)
+            game = reader[0]
+        self.assertEqual([decode_move(code) for code in games[0].moves], [notation_to_move('e2e4')])
+        self.assertEqual(archive.unpack_position(game.start).pack(), Board().pack())
+
+    def test_convert_skips_a_bad_fen(self):
+        with open(self.pgn_path, 'w') as handle:
+            handle.write('[FEN "not a position"]\n\n1. e4 *\n\n' + self.GAMES)
+        self.assertEqual(archive.convert_pgn(self.pgn_path, self.path), (2, 1))
+        self.assertEqual([game.result for game in self.open_reader()], ['1-0', '*'])
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as handle:
+            handle.write(b'not an archive at all, just some bytes')
+        with self.assertRaises(ValueError):
+            archive.ArchiveReader(self.path)
+
+
+class TestProfiling(unittest.TestCase):
+    KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+    def setUp(self):
+        self.addCleanup(profiling.disable)
+
+    def test_disable_restores_methods(self):
+        original = Board.__dict__['make_move']
+        profiling.enable()
+        self.assertTrue(profiling.is_enabled())
+        self.assertIsNot(Board.__dict__['make_move'], original)
+        profiling.disable()
+        self.assertFalse(profiling.is_enabled())
+        self.assertIs(Board.__dict__['make_move'], original)
+
+    def test_perft_counters(self):
+        board = Board.from_fen(self.KIWIPETE)
+        with profiling.profiled():
+            self.assertEqual(board.perft(2), 2039)
+        stats = profiling.snapshot()
+        self.assertFalse(profiling.is_enabled())
+        self.assertEqual(stats.calls['get_all_possible_moves'], 49)
+        # The 48 root moves and one en passant capture tried on the board
+        self.assertEqual(stats.calls['make_move'], 49)
+        # Pseudo-legal moves left out of the root and the 48 replies
+        self.assertEqual(stats.legality_rejections, 5)
+        self.assertEqual(stats.nodes, 0)
+        # Counting stops once disabled
+        board.perft(1)
+        self.assertEqual(profiling.snapshot().calls['get_all_possible_moves'], 49)
+        with profiling.profiled():
+            Board().perft(1)
+        self.assertEqual(profiling.snapshot().piece_moves,
+                         {'pawn': 16, 'knight': 4, 'bishop': 0, 'rook': 0, 'queen': 0, 'king': 0})
+
+    def test_search_counters(self):
+        engine = Engine()
+        evaluate = engine.evaluate
+        live = []
+
+        def on_iteration(result):
+            # Taken mid-search, as a SnapshotWriter would
+            live.append((profiling.snapshot().nodes, engine.nodes))
+
+        with profiling.profiled():
+            result = engine.search(Board.from_fen(self.KIWIPETE), depth=3, on_iteration=on_iteration)
+        stats = profiling.snapshot()
+        self.assertTrue(live)
+        for nodes, engine_nodes in live:
+            self.assertEqual(nodes, engine_nodes)
+            self.assertGreater(nodes, 0)
+        self.assertIs(engine.evaluate, evaluate)
+        self.assertEqual(stats.nodes, result.nodes)
+        self.assertEqual(stats.calls['search'], 1)
+        self.assertGreater(stats.calls['evaluate'], 0)
+        self.assertGreater(stats.legality_rejections, 0)
+        self.assertLessEqual(stats.tt_hits, stats.calls['probe'])
+        self.assertGreater(stats.piece_moves['queen'], 0)
+        self.assertEqual(set(stats.times), set(profiling.PHASES))
+        self.assertLessEqual(sum(stats.times.values()), stats.seconds)
+        self.assertGreater(stats.times['search'], 0)
+
+    def test_snapshot_writer(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'profile.json')
+        profiling.enable()
+        with profiling.SnapshotWriter(path, interval=0.01):
+            Board().perft(2)
+        with open(path) as handle:
+            data = json.load(handle)
+        self.assertEqual(data['calls']['get_all_possible_moves'], 21)
+        self.assertEqual(set(data), set(profiling.ProfileStats._fields))
+
+
 if __name__ == '__main__':
     unittest.main()
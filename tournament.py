@@ -0,0 +1,293 @@
+# tournament.py
+
+"""
+Self-play tournaments between two players in worker processes.
+
+A player is 'random' or an engine configuration such as 'engine:depth=2'
+or 'engine:nodes=2000,hash=4' (keys: depth, nodes, movetime in seconds,
+hash in MB, book for an opening book file). Games alternate colors and
+start with a few random plies so engine games differ. Every finished
+game is appended to a JSON-lines results file and a PGN file straight
+away, and a rerun with --resume skips the games already recorded there.
+
+    python tournament.py engine:depth=2 random --games 100 --out results.jsonl --pgn games.pgn
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from board import Board, DRAW_REASONS
+from book import OpeningBook
+from engine import Engine
+from pgn import format_game
+from san import move_to_san
+from pieces import King, Knight, Bishop
+
+# Adjudicated as a draw after this many plies
+MAX_PLIES = 400
+
+
+def parse_player(spec):
+    """
+    Split 'engine:depth=2,hash=4' into ('engine', {'depth': 2, 'hash': 4}).
+    Raises ValueError for unknown players or options.
+    """
+    kind, _, options_text = spec.partition(':')
+    if kind not in ('engine', 'random'):
+        raise ValueError(f"Unknown player: {spec!r}")
+    options = {}
+    for item in filter(None, options_text.split(',')):
+        name, _, value = item.partition('=')
+        if name in ('depth', 'nodes', 'hash'):
+            options[name] = int(value)
+        elif name == 'movetime':
+            options[name] = float(value)
+        elif name == 'book':
+            options[name] = value
+        else:
+            raise ValueError(f"Unknown option {name!r} in {spec!r}")
+    if kind == 'engine' and not {'depth', 'nodes', 'movetime'} & set(options):
+        options['depth'] = 2
+    return kind, options
+
+
+# Opening books by path, opened once per worker process and kept for all
+# of its games; every worker maps the same file, so its pages are shared
+_books = {}
+
+
+def _open_book(path):
+    if path not in _books:
+        _books[path] = OpeningBook(path)
+    return _books[path]
+
+
+def make_player(spec, rng):
+    """
+    A function board -> move for the side to move.
+    """
+    kind, options = parse_player(spec)
+    if kind == 'random':
+        return lambda board: rng.choice(board.get_all_possible_moves(board.side_to_move))
+    book = _open_book(options['book']) if 'book' in options else None
+    engine = Engine(hash_mb=options.get('hash', 4), book=book)
+    return lambda board: engine.search(board, depth=options.get('depth'),
+                                       movetime=options.get('movetime'),
+                                       nodes=options.get('nodes')).move
+
+
+def insufficient_material(board):
+    """
+    Bare kings, or king and a single knight or bishop against a bare king.
+    """
+    pieces = [piece for row in board.grid for piece in row if piece is not None]
+    minors = [piece for piece in pieces if not isinstance(piece, King)]
+    return len(minors) == 0 or (len(minors) == 1 and isinstance(minors[0], (Knight, Bishop)))
+
+
+def adjudicate(board, max_plies=MAX_PLIES):
+    """
+    (result, reason) if the game is over, else None. Threefold repetition
+    and the 50-move rule count as draws straight away.
+    """
+    status = board.game_status()
+    if status.state == 'checkmate':
+        return ('1-0' if status.winner == 'white' else '0-1'), 'checkmate'
+    if status.state != 'ongoing':
+        return '1/2-1/2', DRAW_REASONS[status.state]
+    if insufficient_material(board):
+        return '1/2-1/2', 'insufficient material'
+    if len(board.undo_stack) >= max_plies:
+        return '1/2-1/2', 'move limit'
+    return None
+
+
+def play_game(task):
+    """
+    Play one game; task is (index, white spec, black spec, seed, random
+    opening plies, max plies). Returns a result dict with the PGN text.
+    """
+    index, white_spec, black_spec, seed, opening_plies, max_plies = task
+    rng = random.Random(seed)
+    players = {'white': make_player(white_spec, rng), 'black': make_player(black_spec, rng)}
+    board = Board()
+    sans = []
+    start = time.perf_counter()
+    while True:
+        outcome = adjudicate(board, max_plies)
+        if outcome is not None:
+            break
+        legal = board.get_all_possible_moves(board.side_to_move)
+        if len(board.undo_stack) < opening_plies:
+            move = rng.choice(legal)
+        else:
+            move = players[board.side_to_move](board)
+        sans.append(move_to_san(board, move, legal))
+        board.make_move(move)
+
+    result, reason = outcome
+    headers = {
+        'Event': 'Self-play', 'Site': '?', 'Date': time.strftime('%Y.%m.%d'),
+        'Round': str(index + 1), 'White': white_spec, 'Black': black_spec,
+        'Result': result, 'Termination': reason,
+    }
+    return {
+        'index': index, 'white': white_spec, 'black': black_spec,
+        'result': result, 'reason': reason, 'plies': len(sans),
+        'seconds': round(time.perf_counter() - start, 3),
+        'pgn': format_game(headers, sans, result),
+    }
+
+
+def score_for(record):
+    """
+    Points scored by the first player of the match (1, 0.5 or 0) in a
+    result record. The first player has white in even-numbered games;
+    colors are told apart by the game index, not by the player specs,
+    which are the same when a player meets itself.
+    """
+    if record['result'] == '1/2-1/2':
+        return 0.5
+    white_won = record['result'] == '1-0'
+    return 1.0 if white_won == (record['index'] % 2 == 0) else 0.0
+
+
+def elo_difference(wins, draws, losses):
+    """
+    Elo difference implied by a score and the half-width of its 95%
+    confidence interval. The half-width is infinite when the interval
+    reaches a 0% or 100% score.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(p):
+        if p <= 0:
+            return -math.inf
+        if p >= 1:
+            return math.inf
+        return -400 * math.log10(1 / p - 1)
+
+    low, high = elo(score - margin), elo(score + margin)
+    if math.isinf(low) or math.isinf(high):
+        return elo(score), math.inf
+    return elo(score), (high - low) / 2
+
+
+def summarize(records, player_a, player_b):
+    wins = sum(1 for record in records if score_for(record) == 1.0)
+    draws = sum(1 for record in records if record['result'] == '1/2-1/2')
+    losses = len(records) - wins - draws
+    elo, margin = elo_difference(wins, draws, losses)
+    return {'player': player_a, 'opponent': player_b, 'games': len(records),
+            'wins': wins, 'draws': draws, 'losses': losses, 'elo': elo, 'error': margin}
+
+
+def _load_records(path):
+    """
+    Records already in a results file. A run killed mid-write leaves a
+    partial last line; it is cut off so that appending starts on a new
+    line.
+    """
+    records = []
+    if not path or not os.path.exists(path):
+        return records
+    with open(path, 'rb+') as handle:
+        data = handle.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            handle.truncate(complete)
+    for line in data[:complete].decode().splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def run_tournament(player_a, player_b, games, workers=None, out=None, pgn=None,
+                   resume=False, seed=0, opening_plies=4, max_plies=MAX_PLIES,
+                   on_result=None):
+    """
+    Play games between player_a and player_b (alternating colors) in worker
+    processes and return the summary of all recorded games. Results are
+    appended to out (JSON lines) and pgn as soon as each game finishes;
+    with resume, games already in out are not played again.
+    """
+    parse_player(player_a)
+    parse_player(player_b)
+    records = _load_records(out) if resume else []
+    done = {record['index'] for record in records}
+    tasks = []
+    for index in range(games):
+        if index in done:
+            continue
+        white, black = (player_a, player_b) if index % 2 == 0 else (player_b, player_a)
+        tasks.append((index, white, black, seed * 1000003 + index, opening_plies, max_plies))
+
+    mode = 'a' if resume else 'w'
+    results_file = open(out, mode) if out else None
+    pgn_file = open(pgn, mode) if pgn else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for future in as_completed([pool.submit(play_game, task) for task in tasks]):
+                record = future.result()
+                if pgn_file:
+                    pgn_file.write(record['pgn'])
+                    pgn_file.flush()
+                if results_file:
+                    results_file.write(json.dumps({k: v for k, v in record.items() if k != 'pgn'}) + '\n')
+                    results_file.flush()
+                records.append(record)
+                if on_result is not None:
+                    on_result(record)
+    finally:
+        for handle in (results_file, pgn_file):
+            if handle:
+                handle.close()
+    return summarize(records, player_a, player_b)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a self-play match in worker processes.")
+    parser.add_argument('player', help="e.g. engine:depth=3 or random")
+    parser.add_argument('opponent', help="e.g. engine:depth=2 or random")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=0, help="worker processes (default: CPUs)")
+    parser.add_argument('--out', help="append results as JSON lines to this file")
+    parser.add_argument('--pgn', help="append finished games to this PGN file")
+    parser.add_argument('--resume', action='store_true', help="skip games already in --out")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-plies', type=int, default=4, help="random plies at the start")
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    args = parser.parse_args(argv)
+
+    def progress(record):
+        print(f"game {record['index'] + 1}: {record['white']} - {record['black']}"
+              f" {record['result']} ({record['reason']}, {record['plies']} plies)")
+
+    try:
+        report = run_tournament(args.player, args.opponent, args.games, args.workers or None,
+                                args.out, args.pgn, args.resume, args.seed,
+                                args.opening_plies, args.max_plies, on_result=progress)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{report['player']} vs {report['opponent']}: +{report['wins']} ={report['draws']}"
+          f" -{report['losses']} in {report['games']} games,"
+          f" Elo {report['elo']:+.1f} +/- {report['error']:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# transposition.py
+
+"""
+Fixed-size transposition table keyed by Board.zobrist_key.
+
+Entries live in two preallocated array('Q') buffers (full key, packed
+data), so memory use is set once by the size in MB and never grows.
+Each bucket has two slots: the first keeps the deepest result of the
+current search, the second is always overwritten.
+"""
+
+from array import array
+from collections import namedtuple
+
+from utils import encode_move, decode_move
+
+EXACT = 1
+LOWER = 2  # score is a lower bound (fail high)
+UPPER = 3  # score is an upper bound (fail low)
+
+ENTRY_BYTES = 16
+_SCORE_OFFSET = 1 << 19
+
+# Packed data layout: move (16 bits) | score + offset (20) | depth (8) | bound (2) | age (8)
+_SCORE_SHIFT = 16
+_DEPTH_SHIFT = 36
+_BOUND_SHIFT = 44
+_AGE_SHIFT = 46
+
+TTEntry = namedtuple('TTEntry', ['depth', 'score', 'bound', 'move'])
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        """
+        Reallocate the table to size_mb megabytes. Clears all entries.
+        """
+        self.size_mb = size_mb
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        self.keys = array('Q', bytes(16 * self.buckets))
+        self.data = array('Q', bytes(16 * self.buckets))
+        self.age = 0
+        self.reset_stats()
+
+    def clear(self):
+        self.resize(self.size_mb)
+
+    def reset_stats(self):
+        self.stats = {'probes': 0, 'hits': 0, 'misses': 0, 'collisions': 0,
+                      'stores': 0, 'overwrites': 0}
+
+    def new_search(self):
+        """
+        Start a new search: entries from older searches become replaceable
+        regardless of depth.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key):
+        """
+        Return the TTEntry stored for key, or None.
+        """
+        stats = self.stats
+        stats['probes'] += 1
+        index = (key % self.buckets) * 2
+        keys = self.keys
+        for slot in (index, index + 1):
+            if keys[slot] == key:
+                data = self.data[slot]
+                if data:
+                    stats['hits'] += 1
+                    return TTEntry(
+                        (data >> _DEPTH_SHIFT) & 0xFF,
+                        ((data >> _SCORE_SHIFT) & 0xFFFFF) - _SCORE_OFFSET,
+                        (data >> _BOUND_SHIFT) & 3,
+                        decode_move(data & 0xFFFF) if data & 0xFFFF else None,
+                    )
+        stats['misses'] += 1
+        if self.data[index] or self.data[index + 1]:
+            # The bucket is in use by other positions
+            stats['collisions'] += 1
+        return None
+
+    def store(self, key, depth, score, bound, move=None):
+        """
+        Record a search result. The depth-preferred slot is replaced when it
+        holds the same position, a shallower result or a result from an
+        earlier search; otherwise the always-replace slot is used.
+        """
+        index = (key % self.buckets) * 2
+        keys, table = self.keys, self.data
+        first = table[index]
+        if (keys[index] == key or not first or ((first >> _DEPTH_SHIFT) & 0xFF) <= depth
+                or (first >> _AGE_SHIFT) != self.age):
+            slot = index
+        else:
+            slot = index + 1
+        old = table[slot]
+        move_code = encode_move(move) if move else 0
+        if keys[slot] == key and not move_code:
+            # Keep the previous best move for ordering
+            move_code = old & 0xFFFF
+        elif old and keys[slot] != key:
+            self.stats['overwrites'] += 1
+        self.stats['stores'] += 1
+        keys[slot] = key
+        table[slot] = (move_code
+                       | (score + _SCORE_OFFSET) << _SCORE_SHIFT
+                       | min(max(depth, 0), 0xFF) << _DEPTH_SHIFT
+                       | bound << _BOUND_SHIFT
+                       | self.age << _AGE_SHIFT)
+
+    def hashfull(self):
+        """
+        Permille of sampled entries written during the current search.
+        """
+        sample = min(1000, len(self.data))
+        used = sum(1 for data in self.data[:sample] if data and (data >> _AGE_SHIFT) == self.age)
+        return used * 1000 // sample
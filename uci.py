@@ -0,0 +1,233 @@
+# uci.py
+
+"""
+UCI (Universal Chess Interface) front end for tournament GUIs and tools.
+
+The search runs on a worker thread so that 'stop' and 'isready' are
+answered while the engine thinks.
+
+    python uci.py
+"""
+
+import sys
+import threading
+import time
+
+from board import Board
+from book import OpeningBook
+from engine import Engine, MATE_SCORE, MATE_BOUND, MAX_PLY
+from utils import move_to_notation
+
+ENGINE_NAME = 'PythonChess'
+ENGINE_AUTHOR = 'the PythonChess authors'
+
+# Milliseconds kept in reserve for process and GUI overhead
+MOVE_OVERHEAD = 50
+# Assumed number of moves left when the GUI sends no movestogo
+DEFAULT_MOVES_TO_GO = 30
+
+
+def allocate_time(remaining, increment=0, moves_to_go=None):
+    """
+    Budget in seconds for the next move given the time left on the clock
+    and the increment in milliseconds. Returns (soft, hard): no new
+    iteration is started after the soft limit, the search is cut at the
+    hard limit.
+    """
+    usable = max(1, remaining - MOVE_OVERHEAD)
+    moves = moves_to_go if moves_to_go else DEFAULT_MOVES_TO_GO
+    soft = min(usable / moves + increment * 0.75, usable * 0.5)
+    hard = min(soft * 3, usable * 0.8)
+    return soft / 1000, hard / 1000
+
+
+def format_score(score):
+    """
+    'cp N' or 'mate N' (moves, negative when getting mated).
+    """
+    if abs(score) >= MATE_BOUND:
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.engine = Engine()
+        self.board = Board()
+        self._thread = None
+        self._output_lock = threading.Lock()
+        # Set by 'stop' / 'ponderhit'; an infinite search waits for it before answering
+        self._stop_event = threading.Event()
+
+    def send(self, line):
+        with self._output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, input=sys.stdin):
+        for line in input:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line):
+        """
+        Process one command line. Returns False after 'quit'.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {self.engine.tt.size_mb} min 1 max 1024")
+            self.send("option name BookFile type string default <empty>")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'ucinewgame':
+            self.stop()
+            self.engine.tt.clear()
+            self.board = Board()
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command in ('stop', 'ponderhit'):
+            self.stop()
+        elif command == 'quit':
+            return False
+        return True
+
+    def set_option(self, args):
+        text = ' '.join(args)
+        if ' value ' not in text:
+            return
+        name, value = text.split(' value ', 1)
+        name = name.replace('name', '', 1).strip().lower()
+        if name == 'hash':
+            try:
+                size_mb = int(value)
+            except ValueError:
+                self.send(f"info string invalid Hash value {value}")
+                return
+            self.stop()
+            self.engine.tt.resize(max(1, min(size_mb, 1024)))
+        elif name == 'bookfile':
+            self.stop()
+            if self.engine.book is not None:
+                self.engine.book.close()
+                self.engine.book = None
+            path = value.strip()
+            if path and path != '<empty>':
+                try:
+                    self.engine.book = OpeningBook(path)
+                except (OSError, ValueError) as error:
+                    self.send(f"info string cannot open book {path}: {error}")
+
+    def set_position(self, args):
+        """
+        position [startpos | fen <fen>] [moves <move> ...]
+        """
+        moves = []
+        if 'moves' in args:
+            index = args.index('moves')
+            args, moves = args[:index], args[index + 1:]
+        try:
+            if args and args[0] == 'fen':
+                board = Board.from_fen(' '.join(args[1:]))
+            else:
+                board = Board()
+        except ValueError as error:
+            self.send(f"info string {error}")
+            return
+        for move in moves:
+            result = board.apply_move(move)
+            if not result.ok:
+                self.send(f"info string {result.error}: {move}")
+                break
+        self.board = board
+
+    def go(self, args):
+        """
+        Start searching on a worker thread. Supports depth, nodes, movetime,
+        wtime/btime/winc/binc/movestogo and infinite.
+        """
+        options = {}
+        infinite = 'infinite' in args or 'ponder' in args
+        for name, value in zip(args, args[1:]):
+            if name in ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+                try:
+                    options[name] = int(value)
+                except ValueError:
+                    pass
+
+        soft = hard = None
+        if 'movetime' in options:
+            hard = max(1, options['movetime'] - MOVE_OVERHEAD) / 1000
+        else:
+            white = self.board.side_to_move == 'white'
+            remaining = options.get('wtime' if white else 'btime')
+            if remaining is not None and not infinite:
+                soft, hard = allocate_time(remaining, options.get('winc' if white else 'binc', 0),
+                                           options.get('movestogo'))
+        depth = options.get('depth')
+        if depth is None and (infinite or (hard is None and 'nodes' not in options)):
+            depth = MAX_PLY
+        if infinite:
+            hard = None
+
+        self._stop_event.clear()
+        self.engine.stopped = False
+        self._thread = threading.Thread(
+            target=self._search, args=(self.board, depth, hard, options.get('nodes'), soft, infinite),
+            daemon=True)
+        self._thread.start()
+
+    def _search(self, board, depth, movetime, nodes, soft_limit, infinite):
+        start = time.perf_counter()
+
+        def report(result):
+            seconds = time.perf_counter() - start
+            nps = int(result.nodes / seconds) if seconds else 0
+            self.send(f"info depth {result.depth} score {format_score(result.score)}"
+                      f" nodes {result.nodes} nps {nps} time {int(seconds * 1000)}"
+                      f" pv {' '.join(move_to_notation(move) for move in result.pv)}")
+            if soft_limit is not None and seconds >= soft_limit:
+                # Another iteration would most likely not finish in time
+                self.engine.stop()
+
+        result = self.engine.search(board, depth=depth, movetime=movetime, nodes=nodes,
+                                    on_iteration=report)
+        if infinite:
+            # UCI forbids answering an infinite search before 'stop'
+            self._stop_event.wait()
+        self.send(f"bestmove {move_to_notation(result.move) if result.move else '0000'}")
+
+    def stop(self):
+        """
+        End a running search and wait for its bestmove.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        self.engine.stop()
+        thread.join()
+        self._thread = None
+        self.engine.stopped = False
+
+
+def main():
+    UciEngine().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -23,3 +23,52 @@ def index_to_notation(row, col):
         return f"{columns[col]}{rows[row]}"
     return None
 
+def move_to_notation(move):
+    """
+    Convert a (start, end[, promotion]) move to coordinate notation,
+    e.g. 'e2e4' or 'a7a8q'.
+    """
+    start, end = move[0], move[1]
+    notation = index_to_notation(*start) + index_to_notation(*end)
+    if len(move) > 2:
+        notation += move[2].lower()
+    return notation
+
+PROMOTION_CODES = {None: 0, 'Q': 1, 'R': 2, 'B': 3, 'N': 4}
+PROMOTION_LETTERS = (None, 'Q', 'R', 'B', 'N')
+
+def encode_move(move):
+    """
+    Pack a (start, end[, promotion]) move into 16 bits: start square in
+    bits 0-5, end square in bits 6-11 and promotion in bits 12-14.
+    Square = row * 8 + col. 0 never encodes a real move.
+    """
+    (start_row, start_col), (end_row, end_col) = move[0], move[1]
+    promotion = PROMOTION_CODES[move[2] if len(move) > 2 else None]
+    return (start_row * 8 + start_col) | (end_row * 8 + end_col) << 6 | promotion << 12
+
+def decode_move(code):
+    """
+    Inverse of encode_move.
+    """
+    start, end = code & 63, (code >> 6) & 63
+    move = ((start >> 3, start & 7), (end >> 3, end & 7))
+    promotion = PROMOTION_LETTERS[(code >> 12) & 7]
+    return move + (promotion,) if promotion else move
+
+def notation_to_move(notation):
+    """
+    Inverse of move_to_notation: 'e2e4' -> ((6, 4), (4, 4)) and
+    'a7a8q' -> ((1, 0), (0, 0), 'Q'). Returns None for malformed input.
+    """
+    if len(notation) not in (4, 5):
+        return None
+    start, end = notation_to_index(notation[:2]), notation_to_index(notation[2:4])
+    if start is None or end is None:
+        return None
+    if len(notation) == 5:
+        promotion = notation[4].upper()
+        if promotion not in 'QRBN':
+            return None
+        return start, end, promotion
+    return start, end
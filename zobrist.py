@@ -0,0 +1,27 @@
+# zobrist.py
+
+"""
+Zobrist keys for position hashing.
+
+The keys come from a fixed seed so that hashes are stable across runs and
+processes, which lets them be stored and compared between jobs.
+"""
+
+import random
+
+_rng = random.Random(0x5EED)
+
+# PIECE_KEYS[piece_index][square], piece_index as in bitboard.PIECE_SYMBOLS
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+# Xored in when black is to move
+SIDE_KEY = _rng.getrandbits(64)
+# CASTLING_KEYS[rights] for every combination of the four castling rights
+CASTLING_KEYS = [0] + [_rng.getrandbits(64) for _ in range(15)]
+# EN_PASSANT_KEYS[col] for the file of a capturable en passant square
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+# Castling right bits, as returned by Board.castling_rights
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8